@@ -0,0 +1,371 @@
+import os
+import sys
+import json
+import asyncio
+import argparse
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    # Windows has no fcntl, so the index is written without a lock there
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+
+from utils import get_extension
+from config import Config
+from svg import SVG
+from bezier import PolyBezier
+from coeff import Coefficient_calculator, get_sets_of_coeffs
+import coeff
+from cache import ResultCache
+from raster import Vectorizer
+import simplify
+import merger
+import wire
+
+
+class BatchStore:
+
+    """
+    Stores the drawing data of processed images in a directory, one file in the binary format of the wire module for
+    each drawing, named by its id. An index file maps the name of each image, which is its path relative to the working
+    directory when it's read from disk, to the id of its drawing, so identical images share one file.
+    The store can be shared by several server processes. Each one only writes the entries it added into the index,
+    merged with the index on disk under a file lock, so that no process overwrites the entries of another.
+    """
+
+    INDEX = "index.json"
+    LOCK = "index.lock"
+
+    def __init__(self, path: str, float_size: int = 4):
+        self.path = path
+        # The directory of the store
+        self.float_size = float_size
+        # The number of bytes of each float written
+        os.makedirs(self.path, exist_ok=True)
+        self.index = self._load_index()
+        # The id of the drawing of each image, keyed by the name of the image
+        self.added = {}
+        # The entries added to the index since it was last written
+
+    def _load_index(self) -> dict:
+        """
+        This function reads the index file of the store
+        @return: A dictionary of the ids of drawings, keyed by the names of images
+        """
+        try:
+            with open(os.path.join(self.path, self.INDEX), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def get_file_path(self, drawing_id: str) -> str:
+        """
+        This function gets the path of the file of a drawing
+        @param drawing_id: The id of the drawing
+        @return: The path of the file
+        """
+        return os.path.join(self.path, f"{drawing_id}.fdrw")
+
+    def has(self, drawing_id: str) -> bool:
+        """
+        This function checks if a drawing is in the store. The file is looked for on disk, so that a drawing written by
+        another process is found too.
+        @param drawing_id: The id of the drawing
+        @return: True if the drawing is in the store
+        """
+        return drawing_id.isalnum() and os.path.isfile(self.get_file_path(drawing_id))
+
+    def put(self, name: str, data: dict):
+        """
+        This function writes the drawing data of an image to the store
+        @param name: The name of the image
+        @param data: A dictionary of the id, the limits and the sets of coefficients
+        """
+        content = wire.encode(data["id"], data["lim"], data["sets_of_coeffs"], self.float_size)
+        self._write(self.get_file_path(data["id"]), content)
+        self.index[name] = data["id"]
+        self.added[name] = data["id"]
+
+    def save_index(self):
+        """
+        This function writes the index file of the store, merging the entries added by this process into the index on
+        disk, which may have been changed by other processes
+        """
+        with open(os.path.join(self.path, self.LOCK), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                # The lock is released when the file is closed
+            self.index = {**self._load_index(), **self.added}
+            self._write(os.path.join(self.path, self.INDEX), json.dumps(self.index, indent=1).encode())
+        self.added = {}
+
+    @staticmethod
+    def _write(file_path: str, content: bytes):
+        """
+        This function writes a file and renames it afterwards, so that a partially written file is never read
+        @param file_path: The path of the file
+        @param content: The content of the file
+        """
+        temp_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(content)
+        os.replace(temp_path, file_path)
+
+
+class BatchJob:
+
+    """
+    An image going through the pipeline. Each stage adds its result to the job.
+    If content is None, the image is read from path.
+    """
+
+    def __init__(self, name: str, path: str = None, content: bytes = None):
+        self.name = name
+        self.path = path
+        self.content = content
+        self.id = None
+        self.svg_data = None
+        self.polys = None
+        self.data = None
+        # The drawing data, as returned by the /image endpoint
+        self.error = None
+        self.stage = None
+        # The stage that failed, if any
+
+    def get_result(self) -> dict:
+        """
+        This function gets the outcome of the job for the report
+        @return: A dictionary of the name of the image and either the id of its drawing or the error
+        """
+        if self.error is not None:
+            return {"name": self.name, "stage": self.stage, "error": self.error}
+        return {"name": self.name, "id": self.id, "num_sets": len(self.data["sets_of_coeffs"])}
+
+
+class BatchPipeline:
+
+    """
+    Processes many images through the stages convert -> parse -> coeffs -> write. Each stage has its own workers, and
+    the stages are connected by bounded queues, so that an image is converted while the previous ones are parsed and
+    their coefficients computed, and no stage runs far ahead of the next one.
+    A failure only removes its image from the batch. The time spent and the number of images done and failed are
+    recorded for each stage.
+    """
+
+    STAGES = ("convert", "parse", "coeffs", "write")
+
+    def __init__(self, store: BatchStore, vectorizer: Vectorizer, executor=None, num: int = Config.NUM_VECTORS,
+                 by_dist: bool = Config.BY_DIST, queue_size: int = Config.BATCH_QUEUE_SIZE):
+        self.store = store
+        self.vectorizer = vectorizer
+        # Converts raster images. Its limit on conversions is also the number of workers of the convert stage.
+        self.executor = executor
+        # The worker processes that compute coefficients, or None to compute them in a thread of this process
+        self.num = num
+        self.by_dist = by_dist
+        self.queue_size = queue_size
+        self.stats = {stage: {"done": 0, "failed": 0, "seconds": 0.0} for stage in self.STAGES}
+
+    async def run(self, jobs: list) -> dict:
+        """
+        This function runs every job through the pipeline and writes the index of the store
+        @param jobs: A list of BatchJob objects
+        @return: A dictionary of the report, with the result of each job and the statistics of each stage
+        """
+        initial = perf_counter()
+        workers = {"convert": self.vectorizer.max_jobs, "parse": 1, "coeffs": 1, "write": 1}
+        queues = [asyncio.Queue(self.queue_size) for _ in self.STAGES]
+        # The input queue of each stage
+        handlers = [self._convert, self._parse, self._coeffs, self._write]
+        tasks = []
+        for index, (stage, handler) in enumerate(zip(self.STAGES, handlers)):
+            output = queues[index + 1] if index + 1 < len(queues) else None
+            for _ in range(workers[stage]):
+                tasks.append(asyncio.create_task(self._work(stage, handler, queues[index], output)))
+        for job in jobs:
+            await queues[0].put(job)
+            # This waits while the first stage is behind, so only a bounded number of jobs are held at once
+        for queue in queues:
+            await queue.join()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.to_thread(self.store.save_index)
+        return self.get_report(jobs, perf_counter() - initial)
+
+    async def _work(self, stage: str, handler, source: asyncio.Queue, output):
+        """
+        This function takes jobs from a queue, processes them and passes the successful ones on to the next stage
+        @param stage: The name of the stage
+        @param handler: The coroutine function that processes a job
+        @param source: The queue of the stage
+        @param output: The queue of the next stage, or None for the last stage
+        """
+        stats = self.stats[stage]
+        while True:
+            job = await source.get()
+            initial = perf_counter()
+            try:
+                await handler(job)
+            except Exception as e:
+                job.stage = stage
+                job.error = str(e) or type(e).__name__
+                stats["failed"] += 1
+            else:
+                stats["done"] += 1
+                if output is not None:
+                    await output.put(job)
+            finally:
+                stats["seconds"] += perf_counter() - initial
+                source.task_done()
+
+    async def _convert(self, job: BatchJob):
+        """
+        This function reads the image and converts it to an SVG image if needed
+        @param job: A BatchJob object
+        """
+        extension = get_extension(job.name).lower()
+        if extension not in Config.ACCEPTABLE_EXTENSIONS:
+            raise Exception("The input file is not an image file")
+        if job.content is None:
+            with open(job.path, "rb") as f:
+                job.content = f.read()
+        job.id = get_key(job.content, extension, self.num, self.by_dist)
+        # The same id as the /image endpoint gives the image
+        if extension == "svg":
+            job.svg_data = job.content.decode()
+            return
+        job.svg_data = await self.vectorizer.convert_content(job.content, extension)
+
+    async def _parse(self, job: BatchJob):
+        """
+        This function parses the SVG image to PolyBeziers, and simplifies and merges them if it's set in the Config
+        class. It runs in a thread, so that the event loop keeps the other stages running
+        @param job: A BatchJob object
+        """
+        def parse():
+            return merger.merge(simplify.simplify(SVG(job.svg_data).parse_polybeziers()))
+        job.polys = await asyncio.to_thread(parse)
+        if len(job.polys) == 0:
+            raise SyntaxError("The image has no paths")
+        job.svg_data = None
+        job.content = None
+
+    async def _coeffs(self, job: BatchJob):
+        """
+        This function computes the coefficients of every PolyBezier of the image
+        @param job: A BatchJob object
+        """
+        def compute():
+            calcs = [Coefficient_calculator(poly, self.num, self.by_dist) for poly in job.polys]
+            lims = PolyBezier.get_total_lims(job.polys)
+            return lims, get_sets_of_coeffs(calcs, lims, self.executor, Config.CHUNK_SEGMENTS)
+        (xlim, ylim), sets_of_coeffs = await asyncio.to_thread(compute)
+        job.data = {"id": job.id, "lim": {"x": xlim, "y": ylim}, "sets_of_coeffs": sets_of_coeffs}
+        job.polys = None
+
+    async def _write(self, job: BatchJob):
+        """
+        This function writes the drawing data to the store
+        @param job: A BatchJob object
+        """
+        await asyncio.to_thread(self.store.put, job.name, job.data)
+
+    def get_report(self, jobs: list, seconds: float) -> dict:
+        """
+        This function creates the report of the batch
+        @param jobs: A list of BatchJob objects
+        @param seconds: The time the whole batch took
+        @return: A dictionary of the result of each job, the statistics of each stage and the totals
+        """
+        stages = {}
+        for stage, stats in self.stats.items():
+            rate = stats["done"] / stats["seconds"] if stats["seconds"] > 0 else None
+            stages[stage] = {**stats, "per_second": rate}
+            # The throughput of one worker of the stage, as the time is summed over its workers
+        done = sum(job.error is None for job in jobs)
+        return {
+            "files": [job.get_result() for job in jobs],
+            "stages": stages,
+            "done": done,
+            "failed": len(jobs) - done,
+            "seconds": seconds,
+        }
+
+
+def get_key(content: bytes, extension: str, num: int = Config.NUM_VECTORS, by_dist: bool = Config.BY_DIST) -> str:
+    """
+    This function creates the key of the result of an image, from its content and every setting that changes its
+    drawing data. It's the id of the drawing, both for the /image endpoint and for a batch.
+    @param content: The content of the file
+    @param extension: The extension of the file, in any case
+    @param num: The number of vectors
+    @param by_dist: If the tip of the pen moves at a constant speed in the animation
+    @return: The key, which is also the id of the drawing
+    """
+    return ResultCache.get_key(content, extension.lower(), num, by_dist, *simplify.get_settings(),
+                               *merger.get_settings(), *coeff.get_settings())
+
+
+def get_jobs(paths: list) -> list:
+    """
+    This function creates a job for each image in the input paths. Directories are searched for images, but not
+    recursively. Each job is named by the relative path of its image, so that images with the same name in different
+    directories are kept apart in the index of the store.
+    @param paths: A list of paths to images or directories
+    @return: A list of BatchJob objects
+    """
+    jobs = []
+    for path in paths:
+        if not os.path.isdir(path):
+            jobs.append(BatchJob(os.path.relpath(path), path))
+            continue
+        for name in sorted(os.listdir(path)):
+            if get_extension(name).lower() in Config.ACCEPTABLE_EXTENSIONS:
+                file_path = os.path.join(path, name)
+                jobs.append(BatchJob(os.path.relpath(file_path), file_path))
+    return jobs
+
+
+def print_report(report: dict):
+    """
+    This function prints the failures, the statistics of each stage and the totals of a batch
+    @param report: The report returned by BatchPipeline.run
+    """
+    for result in report["files"]:
+        if "error" in result:
+            print(f"FAILED {result['name']} ({result['stage']}): {result['error']}", file=sys.stderr)
+    for stage, stats in report["stages"].items():
+        rate = "-" if stats["per_second"] is None else f"{stats['per_second']:.2f}/s"
+        print(f"{stage:>8}: {stats['done']} done, {stats['failed']} failed, {stats['seconds']:.2f}s, {rate}")
+    total = len(report["files"]) / report["seconds"] if report["seconds"] > 0 else 0
+    print(f"{report['done']} done, {report['failed']} failed in {report['seconds']:.2f}s ({total:.2f} images/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process many images to drawing data")
+    parser.add_argument("paths", nargs="+", help="Image files, or directories of images")
+    parser.add_argument("-o", "--output", default=Config.BATCH_PATH, help="The directory of the output store")
+    parser.add_argument("--vectors", type=int, default=Config.NUM_VECTORS)
+    parser.add_argument("--conversions", type=int, default=Config.MAX_CONVERSIONS)
+    parser.add_argument("--workers", type=int, default=Config.NUM_WORKERS)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+    executor = ProcessPoolExecutor(args.workers) if args.workers > 0 else None
+    try:
+        pipeline = BatchPipeline(BatchStore(args.output), Vectorizer(args.conversions, Config.CONVERSION_TIMEOUT),
+                                 executor, args.vectors)
+        report = asyncio.run(pipeline.run(get_jobs(args.paths)))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    if args.json:
+        print(json.dumps(report, indent=1))
+    else:
+        print_report(report)
+    sys.exit(1 if report["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+import os
+import sys
+import json
+import argparse
+import platform
+from time import perf_counter
+from statistics import median, mean
+
+import numpy as np
+
+from utils import get_extension, get_file_content, get_frequencies
+from config import Config
+from svg import SVG
+from bezier import PolyBezier
+from coeff import Coefficient_calculator
+from complex_vector import ComplexVector, RotatingVectors
+
+
+"""
+Benchmarks each stage of the pipeline over the SVG images of a directory, and checks the coefficients against the
+scalar implementation of Coefficient_calculator.get_coefficient. The FFT engine is timed too, and its error against
+the closed form is reported, so that COEFF_MODE can be chosen for a deployment. The cost of evaluating the vectors of
+consecutive frames is timed with an exponential for each vector and with RotatingVectors, whose drift is reported.
+The closed-form coefficients of the first paths of each image are written to the results as well, and a run given a
+baseline fails if they differ from the baseline's, so that a change to the numbers is caught even when the scalar
+implementation changes with it.
+
+Usage:
+    python benchmark.py [--images example_pictures] [--output results.json] [--baseline baseline.json]
+"""
+
+
+def load_corpus(path: str) -> list:
+    """
+    This function reads every SVG image in a directory. Raster images are left out, as their conversion depends on
+    ImageMagick and Potrace rather than on this code.
+    @param path: The path to a directory of images
+    @return: A list of tuples of the name and the content of each SVG image
+    """
+    names = sorted(name for name in os.listdir(path) if get_extension(name).lower() == "svg")
+    return [(name, get_file_content(os.path.join(path, name))) for name in names]
+
+
+def time_stage(function, repeat: int, warmup: int) -> dict:
+    """
+    This function times a stage, running it warmup times before the timed runs
+    @param function: A function with no arguments that runs the stage over the whole corpus
+    @param repeat: The number of timed runs
+    @param warmup: The number of runs that are not timed
+    @return: A dictionary of the minimum, median and mean time and the time of every run, in seconds
+    """
+    for _ in range(warmup):
+        function()
+    times = []
+    for _ in range(repeat):
+        initial = perf_counter()
+        function()
+        times.append(perf_counter() - initial)
+    return {"min": min(times), "median": median(times), "mean": mean(times), "runs": times}
+
+
+def run_benchmarks(corpus: list, vector_counts: list, repeat: int, warmup: int, frames: int) -> dict:
+    """
+    This function times each stage over the corpus. The coefficients and the JSON encoding are timed for each number
+    of vectors.
+    @param corpus: A list of tuples of the name and the content of each SVG image
+    @param vector_counts: A list of the numbers of vectors
+    @param repeat: The number of timed runs of each stage
+    @param warmup: The number of runs of each stage that are not timed
+    @param frames: The number of consecutive frames the evaluation of the vectors is timed over
+    @return: A dictionary of the timings, keyed by the name of the stage
+    """
+    results = {}
+    contents = [data for _, data in corpus]
+    results["parse_path"] = time_stage(lambda: [SVG(data).parse_path() for data in contents], repeat, warmup)
+    paths = [SVG(data).parse_path() for data in contents]
+    results["polybezier"] = time_stage(lambda: [[PolyBezier(path) for path in image] for image in paths], repeat,
+                                       warmup)
+    polys = [[PolyBezier(path) for path in image] for image in paths]
+    for num in vector_counts:
+        def compute():
+            return [Coefficient_calculator.main_batch([Coefficient_calculator(poly, num, Config.BY_DIST)
+                                                       for poly in image]) for image in polys]
+        # New calculators are created for every run, as they keep the coefficients they have computed
+        results[f"coeffs@{num}"] = time_stage(compute, repeat, warmup)
+        sets = compute()
+        results[f"json@{num}"] = time_stage(lambda: [json.dumps({"sets_of_coeffs": image}) for image in sets], repeat,
+                                            warmup)
+        calcs = [[Coefficient_calculator(poly, num, Config.BY_DIST) for poly in image] for image in polys]
+        ns = get_frequencies(num)
+        results[f"fft@{num}"] = time_stage(
+            lambda: [Coefficient_calculator.get_coefficients_fft(image, ns, Config.FFT_SAMPLES) for image in calcs],
+            repeat, warmup)
+        sets_of_vectors = [get_vectors(image) for image in sets]
+        results[f"frames_func@{num}"] = time_stage(lambda: sum_frames_func(sets_of_vectors, frames), repeat, warmup)
+        engines = [RotatingVectors(image, Config.DT) for image in sets_of_vectors]
+        results[f"frames_exp@{num}"] = time_stage(lambda: sum_frames_exp(engines, frames), repeat, warmup)
+        results[f"frames_rotor@{num}"] = time_stage(lambda: sum_frames_rotor(engines, frames), repeat, warmup)
+    return results
+
+
+def get_vectors(sets_of_coeffs: list) -> list:
+    """
+    This function creates the ComplexVector objects of each set of coefficients of an image
+    @param sets_of_coeffs: A list of dictionaries of the coefficients of each path, keyed by frequency
+    @return: A list of the lists of ComplexVector objects of each path
+    """
+    return [[ComplexVector(complex(*coeff), n) for n, coeff in coeffs.items()] for coeffs in sets_of_coeffs]
+
+
+def sum_frames_func(sets_of_vectors: list, frames: int):
+    """
+    This function finds the point each path draws in consecutive frames, computing an exponential for each vector
+    @param sets_of_vectors: A list of the lists of ComplexVector objects of the paths of each image
+    @param frames: The number of frames
+    """
+    for step in range(frames):
+        t = step * Config.DT
+        for image in sets_of_vectors:
+            for vectors in image:
+                sum(vector.func(t) for vector in vectors)
+
+
+def sum_frames_exp(engines: list, frames: int):
+    """
+    This function finds the point each path draws in consecutive frames, computing the exponentials of all vectors
+    of an image at once
+    @param engines: A RotatingVectors object for each image
+    @param frames: The number of frames
+    """
+    for step in range(frames):
+        for engine in engines:
+            engine.seek(step)
+            (engine.coefficients * engine.phasors).sum(axis=1)
+
+
+def sum_frames_rotor(engines: list, frames: int):
+    """
+    This function finds the point each path draws in consecutive frames, turning the phasors of each image by one
+    step at a time
+    @param engines: A RotatingVectors object for each image
+    @param frames: The number of frames
+    """
+    for engine in engines:
+        engine.seek(0)
+        for step in range(frames):
+            engine.tips(step)
+
+
+def check_coefficients(corpus: list, num: int, max_paths: int, tolerance: float) -> dict:
+    """
+    This function compares the coefficients of the batched engine with the ones of the scalar implementation, which
+    integrates each Bezier curve on its own. The error is relative to the largest reference coefficient of the path.
+    @param corpus: A list of tuples of the name and the content of each SVG image
+    @param num: The number of vectors checked for each path
+    @param max_paths: The number of paths checked in each image
+    @param tolerance: The largest relative error allowed
+    @return: A dictionary of the number of paths checked, the largest error and the paths with errors over tolerance
+    """
+    ns = get_frequencies(num)
+    checked = 0
+    max_error = 0.0
+    failures = []
+    for name, data in corpus:
+        for index, poly in enumerate(SVG(data).parse_polybeziers()[:max_paths]):
+            calc = Coefficient_calculator(poly, num, Config.BY_DIST)
+            values = Coefficient_calculator.get_coefficients_exact([calc], ns)[0]
+            reference = np.array([calc.get_coefficient(n) for n in ns])
+            scale = max(np.abs(reference).max(), np.finfo(np.float64).tiny)
+            error = float(np.abs(values - reference).max() / scale)
+            checked += 1
+            max_error = max(max_error, error)
+            if not error <= tolerance:
+                failures.append({"image": name, "path": index, "error": error})
+    return {"checked": checked, "max_error": max_error, "tolerance": tolerance, "failures": failures}
+
+
+def check_fft(corpus: list, vector_counts: list, samples: int) -> dict:
+    """
+    This function compares the coefficients of the FFT engine with the ones of the closed form, for every path. The
+    error is relative to the largest coefficient of the path.
+    @param corpus: A list of tuples of the name and the content of each SVG image
+    @param vector_counts: A list of the numbers of vectors
+    @param samples: The smallest number of points sampled from each path
+    @return: A dictionary of the largest and the mean error of the paths, keyed by the number of vectors
+    """
+    polys = [SVG(data).parse_polybeziers() for _, data in corpus]
+    errors = {}
+    for num in vector_counts:
+        ns = get_frequencies(num)
+        path_errors = []
+        for image in polys:
+            calcs = [Coefficient_calculator(poly, num, Config.BY_DIST) for poly in image]
+            reference = Coefficient_calculator.get_coefficients_exact(calcs, ns)
+            values = Coefficient_calculator.get_coefficients_fft(calcs, ns, samples)
+            scale = np.maximum(np.abs(reference).max(axis=1), np.finfo(np.float64).tiny)
+            path_errors.extend((np.abs(values - reference).max(axis=1) / scale).tolist())
+        errors[num] = {"max_error": max(path_errors, default=0.0), "mean_error": mean(path_errors or [0.0])}
+    return {"samples": samples, "errors": errors}
+
+
+def check_phasors(corpus: list, num: int, steps: int) -> dict:
+    """
+    This function advances RotatingVectors over the paths of every image and compares its vectors with the ones
+    computed directly at the last step. The error is relative to the largest coefficient.
+    @param corpus: A list of tuples of the name and the content of each SVG image
+    @param num: The number of vectors of each path
+    @param steps: The number of steps the phasors are advanced by
+    @return: A dictionary of the number of steps and the largest error
+    """
+    sets_of_vectors = []
+    for _, data in corpus:
+        calcs = [Coefficient_calculator(poly, num, Config.BY_DIST) for poly in SVG(data).parse_polybeziers()]
+        sets_of_vectors.extend(get_vectors(Coefficient_calculator.main_batch(calcs)))
+    engine = RotatingVectors(sets_of_vectors, Config.DT)
+    # The paths of all images are packed together, so that each step is one multiplication
+    for _ in range(steps):
+        engine.advance()
+    values = engine.coefficients * engine.phasors
+    engine.seek(steps)
+    reference = engine.coefficients * engine.phasors
+    scale = max(np.abs(engine.coefficients).max(initial=0.0), np.finfo(np.float64).tiny)
+    max_error = float(np.abs(values - reference).max(initial=0.0) / scale)
+    return {"steps": steps, "max_error": max_error}
+
+
+def get_references(corpus: list, num: int, max_paths: int) -> dict:
+    """
+    This function computes the coefficients of the first paths of every image in closed form, so that they can be
+    written to the results and checked by a later run
+    @param corpus: A list of tuples of the name and the content of each SVG image
+    @param num: The number of coefficients of each path
+    @param max_paths: The number of paths of each image
+    @return: A dictionary of the coefficients of each path as real and imaginary pairs, keyed by the name of the image
+    """
+    ns = get_frequencies(num)
+    references = {}
+    for name, data in corpus:
+        calcs = [Coefficient_calculator(poly, num, Config.BY_DIST) for poly in SVG(data).parse_polybeziers()[:max_paths]]
+        values = Coefficient_calculator.get_coefficients_exact(calcs, ns)
+        references[name] = [np.stack((row.real, row.imag), axis=1).tolist() for row in values]
+    return references
+
+
+def compare(report: dict, baseline: dict, threshold: float, tolerance: float) -> dict:
+    """
+    This function finds the stages whose median time is slower than the baseline by more than the threshold, and the
+    paths whose coefficients moved from the ones of the baseline by more than the tolerance. The error of a path is
+    relative to its largest baseline coefficient, and only the frequencies in both runs are compared.
+    @param report: The report of this run
+    @param baseline: The report of the baseline
+    @param threshold: The fraction of the baseline time a stage can be slower by
+    @param tolerance: The largest relative error allowed between the coefficients of this run and the baseline
+    @return: A dictionary of a list of the regressed stages, with both times and their ratio, and a list of the paths
+    whose coefficients changed, with their error
+    """
+    timings = []
+    for stage, timing in report["results"].items():
+        if stage not in baseline["results"] or baseline["results"][stage]["median"] <= 0:
+            continue
+            # A stage the baseline timed as 0 has no ratio to compare
+        ratio = timing["median"] / baseline["results"][stage]["median"]
+        if ratio > 1 + threshold:
+            timings.append({"stage": stage, "median": timing["median"], "baseline": baseline["results"][stage]["median"],
+                            "ratio": ratio})
+    coefficients = []
+    for name, paths in baseline.get("references", {}).items():
+        for index, (expected, actual) in enumerate(zip(paths, report["references"].get(name, []))):
+            count = min(len(expected), len(actual))
+            expected = np.array(expected[:count]).reshape(-1, 2)
+            actual = np.array(actual[:count]).reshape(-1, 2)
+            scale = max(np.hypot(*expected.T).max(initial=0.0), np.finfo(np.float64).tiny)
+            error = float(np.hypot(*(actual - expected).T).max(initial=0.0) / scale)
+            if not error <= tolerance:
+                coefficients.append({"image": name, "path": index, "error": error})
+    return {"timings": timings, "coefficients": coefficients}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the stages of the pipeline over a directory of images")
+    parser.add_argument("--images", default="example_pictures", help="The directory of images")
+    parser.add_argument("--vectors", type=int, nargs="+", default=Config.BENCHMARK_VECTORS)
+    parser.add_argument("--repeat", type=int, default=Config.BENCHMARK_REPEAT)
+    parser.add_argument("--warmup", type=int, default=Config.BENCHMARK_WARMUP)
+    parser.add_argument("--frames", type=int, default=Config.BENCHMARK_FRAMES)
+    parser.add_argument("--output", help="The file the results are written to as JSON")
+    parser.add_argument("--baseline", help="The results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=Config.BENCHMARK_THRESHOLD)
+    args = parser.parse_args()
+    corpus = load_corpus(args.images)
+    if len(corpus) == 0:
+        raise Exception(f"There are no SVG images in {args.images}")
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+        },
+        "settings": {"images": len(corpus), "vectors": args.vectors, "repeat": args.repeat, "warmup": args.warmup,
+                     "frames": args.frames, "by_dist": Config.BY_DIST, "coeff_mode": Config.COEFF_MODE},
+        "results": run_benchmarks(corpus, args.vectors, args.repeat, args.warmup, args.frames),
+        "correctness": check_coefficients(corpus, Config.BENCHMARK_CHECK_VECTORS, Config.BENCHMARK_CHECK_PATHS,
+                                          Config.BENCHMARK_TOLERANCE),
+        "fft": check_fft(corpus, args.vectors, Config.FFT_SAMPLES),
+        "phasors": check_phasors(corpus, Config.BENCHMARK_CHECK_VECTORS, Config.BENCHMARK_DRIFT_STEPS),
+        "references": get_references(corpus, Config.BENCHMARK_CHECK_VECTORS, Config.BENCHMARK_CHECK_PATHS),
+        # The coefficients are kept with the timings, so that a run compared with these results also checks that
+        # they have not changed
+    }
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        if "references" not in baseline:
+            print(f"{args.baseline} has no reference coefficients, so only the timings are compared", file=sys.stderr)
+        report["regressions"] = compare(report, baseline, args.threshold, Config.BENCHMARK_TOLERANCE)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    for stage, timing in report["results"].items():
+        print(f"{stage:>16}: median {timing['median'] * 1000:9.2f} ms, min {timing['min'] * 1000:9.2f} ms")
+    correctness = report["correctness"]
+    print(f"coefficients: {correctness['checked']} paths checked, max relative error {correctness['max_error']:.2e}")
+    for num, error in report["fft"]["errors"].items():
+        print(f"fft@{num}: max relative error {error['max_error']:.2e}, mean {error['mean_error']:.2e}")
+    phasors = report["phasors"]
+    print(f"phasors: max relative error {phasors['max_error']:.2e} after {phasors['steps']} steps")
+    for failure in correctness["failures"]:
+        print(f"MISMATCH {failure['image']} path {failure['path']}: {failure['error']:.2e}", file=sys.stderr)
+    regressions = report.get("regressions", {"timings": [], "coefficients": []})
+    for regression in regressions["timings"]:
+        print(f"REGRESSION {regression['stage']}: {regression['median'] * 1000:.2f} ms vs "
+              f"{regression['baseline'] * 1000:.2f} ms ({regression['ratio']:.2f}x)", file=sys.stderr)
+    for change in regressions["coefficients"]:
+        print(f"CHANGED {change['image']} path {change['path']}: {change['error']:.2e} from the baseline", file=sys.stderr)
+    sys.exit(1 if correctness["failures"] or regressions["timings"] or regressions["coefficients"] else 0)
+
+
+if __name__ == "__main__":
+    main()
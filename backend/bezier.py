@@ -1,9 +1,73 @@
+import numpy as np
+
 from utils import *
 from config import Config
 
 
+GAUSS_NODES, GAUSS_WEIGHTS = np.polynomial.legendre.leggauss(Config.DIST_GAUSS_POINTS)
+# The nodes and weights of Gauss-Legendre quadrature on [-1, 1]
+
+
+def get_arc_lengths(points) -> np.ndarray:
+    """
+    This function computes the lengths of cubic Bezier curves by integrating the speed |B'(t)| from 0 to 1 with
+    Gauss-Legendre quadrature. Each interval is split in half until the estimate of the two halves agrees with the
+    estimate of the whole interval within the tolerance specified in the Config class. All curves are computed at the
+    same time, and only the intervals that have not converged are split further.
+    @param points: The points of the curves as a sequence of four complex numbers for each curve
+    @return: The lengths of the curves as an array
+    """
+    points = np.asarray(points, dtype=np.complex128).reshape(-1, 4)
+    derivative = 3 * np.diff(points, axis=1)
+    # The derivative of a cubic Bezier curve is a quadratic Bezier curve of these three points
+    lengths = np.zeros(len(points))
+    index = np.arange(len(points))
+    # The curve of each interval that has not converged
+    lower = np.zeros(len(points))
+    upper = np.ones(len(points))
+    whole = _integrate_speed(derivative, index, lower, upper)
+    allowed = Config.DIST_TOLERANCE * np.maximum(whole, np.finfo(np.float64).tiny)
+    # The error allowed for each curve. Each interval is allowed the part of it proportional to its width.
+    for _ in range(Config.DIST_MAX_DEPTH):
+        middle = (lower + upper) / 2
+        left = _integrate_speed(derivative, index, lower, middle)
+        right = _integrate_speed(derivative, index, middle, upper)
+        halves = left + right
+        converged = np.abs(halves - whole) <= allowed[index] * (upper - lower)
+        np.add.at(lengths, index[converged], halves[converged])
+        split = ~converged
+        index = np.concatenate((index[split], index[split]))
+        lower, upper = np.concatenate((lower[split], middle[split])), np.concatenate((middle[split], upper[split]))
+        whole = np.concatenate((left[split], right[split]))
+        if len(index) == 0:
+            break
+    np.add.at(lengths, index, whole)
+    # Any interval that has not converged at the maximum depth uses its last estimate
+    return lengths
+
+
+def _integrate_speed(derivative: np.ndarray, index: np.ndarray, lower: np.ndarray, upper: np.ndarray) -> np.ndarray:
+    """
+    This function integrates the speed of each curve over an interval of t with Gauss-Legendre quadrature
+    @param derivative: The three points of the derivative of each curve
+    @param index: The curve of each interval
+    @param lower: The lower limit of each interval
+    @param upper: The upper limit of each interval
+    @return: The integral over each interval as an array
+    """
+    half = (upper - lower) / 2
+    t = ((lower + upper) / 2)[:, None] + half[:, None] * GAUSS_NODES
+    # The nodes mapped from [-1, 1] to each interval
+    d = derivative[index]
+    speed = np.abs((1 - t) ** 2 * d[:, :1] + 2 * (1 - t) * t * d[:, 1:2] + t ** 2 * d[:, 2:])
+    return half * (speed @ GAUSS_WEIGHTS)
+
+
 class Bezier:
 
+    __slots__ = ("degree", "points", "_dist")
+    # Segments of a PolyBezier are created on access, so they have no __dict__ to keep them light
+
     degrees = {
         1: "Linear",
         2: "Quadratic",
@@ -14,6 +78,19 @@ class Bezier:
     def __init__(self, points):
         self.degree = None
         self.points = points
+        self._dist = None
+        # The length of the curve, computed the first time it's needed
+
+    @property
+    def dist(self) -> float:
+        """
+        This function returns the length of the Bezier curve. It's only computed when it's first needed, so that
+        the lengths are not computed unless the curves are parametrized by distance.
+        @return: The length of the Bezier curve
+        """
+        if self._dist is None:
+            self._dist = self.get_dist()
+        return self._dist
 
     def p(self, index: int):
         """
@@ -36,10 +113,11 @@ class Bezier:
 
 class LinearBezier(Bezier):
 
+    __slots__ = ()
+
     def __init__(self, points):
         super().__init__(points)
         self.degree = 1
-        self.dist = self.get_dist()
 
     def func(self, t: float):
         """
@@ -72,10 +150,11 @@ class LinearBezier(Bezier):
 
 class CubicBezier(Bezier):
 
+    __slots__ = ()
+
     def __init__(self, points):
         super().__init__(points)
         self.degree = 3
-        self.dist = self.get_dist()
 
     def func(self, t: float) -> complex:
         """
@@ -90,7 +169,7 @@ class CubicBezier(Bezier):
         This function gets the minimum and maximum values of real and imaginary coordinates
         @return: A tuple consisting of xlim and ylim, which are tuples consisting of minimum and maximum x and y values
         """
-        possible_maxima_minima = [self.p(0), self.p(1), *self._get_solutions_to_derivatives()]
+        possible_maxima_minima = [self.p(0), self.p(3), *self._get_solutions_to_derivatives()]
         # In this case, the possible maxima and minima are solutions to derivatives of real and imaginary components
         # of the Bezier curve that reside between 0 and 1
         xs = [p.real for p in possible_maxima_minima]
@@ -101,21 +180,12 @@ class CubicBezier(Bezier):
 
     def get_dist(self) -> float:
         """
-        This function computes the distance of the Bezier curve between the start and end point. It's done by
-        approximating it by stepping through values of t from 0 to 1 by a step specified in the config file,
-        and calculating the straight line distance between each t value and summing all values together.
+        This function computes the distance of the Bezier curve between the start and end point, using adaptive
+        Gauss-Legendre quadrature to the tolerance specified in the config file.
         @return: The distance of the Bezier curve
         between the start and end point
         """
-        t_steps = arange(0, 1 + Config.DT, Config.DT)
-        points = []
-        dist = 0
-        for t in t_steps:
-            points.append(self.func(t))
-            if len(points) == 2:
-                dist += two_d_dist(points[0], points[1])
-                points.pop(0)
-        return dist
+        return float(get_arc_lengths(self.points)[0])
 
     def _get_solutions_to_derivatives(self) -> list:
         """
@@ -141,24 +211,130 @@ class CubicBezier(Bezier):
 
 class PolyBezier:
 
+    """
+    A sequence of linear and cubic Bezier curves. The points of all curves are held in one (num x 4) complex array with
+    the degree of each curve, and the points of a linear Bezier curve are followed by zeros. The curves can still be
+    accessed as LinearBezier and CubicBezier objects, which are created from the array on access.
+    """
+
+    __slots__ = ("points", "degrees", "num", "_dists", "_dist")
+
+    SEGMENTS = {1: LinearBezier, 3: CubicBezier}
+    # The class of the curves of each degree
+
     def __init__(self, beziers: list):
-        self.beziers = beziers
-        # This is a list of Bezier curves that define the PolyBezier
-        self.num = len(self.beziers)
-        self.dist = self.get_dist()
+        points = np.zeros((len(beziers), 4), dtype=np.complex128)
+        for index, bez in enumerate(beziers):
+            if bez.degree not in PolyBezier.SEGMENTS:
+                raise ValueError("Only Linear and Cubic bezier is supported")
+            points[index, :bez.degree + 1] = bez.points
+        self._set_arrays(points, np.array([bez.degree for bez in beziers], dtype=np.int8))
+        if len(beziers) > 0 and all(bez._dist is not None for bez in beziers):
+            self._dists = np.array([bez._dist for bez in beziers], dtype=np.float64)
+            # Lengths that have already been computed are kept
+
+    @classmethod
+    def from_arrays(cls, points: np.ndarray, degrees: np.ndarray):
+        """
+        This function creates a PolyBezier straight from the arrays of points and degrees, without creating a Bezier
+        curve object for each curve
+        @param points: A (num x 4) complex array of the points of each curve, followed by zeros for linear curves
+        @param degrees: An array of the degree of each curve, which is 1 or 3
+        @return: A PolyBezier object
+        """
+        poly = cls.__new__(cls)
+        poly._set_arrays(np.asarray(points, dtype=np.complex128), np.asarray(degrees, dtype=np.int8))
+        return poly
+
+    def _set_arrays(self, points: np.ndarray, degrees: np.ndarray):
+        """
+        This function sets the arrays of the PolyBezier
+        @param points: A (num x 4) complex array of the points of each curve
+        @param degrees: An array of the degree of each curve
+        """
+        self.points = points
+        self.degrees = degrees
+        self.num = len(degrees)
+        self._dists = None
+        # The lengths of the curves, computed the first time they're needed
+        self._dist = None
+
+    @property
+    def beziers(self) -> list:
+        """
+        This function returns the Bezier curves of the PolyBezier as objects, which are created from the array
+        each time they're accessed
+        @return: A list of LinearBezier and CubicBezier objects
+        """
+        return [self.get_bezier(index) for index in range(self.num)]
+
+    def get_bezier(self, index: int):
+        """
+        This function creates an object of a single Bezier curve of the PolyBezier
+        @param index: The index of the curve
+        @return: A LinearBezier or CubicBezier object
+        """
+        degree = int(self.degrees[index])
+        bez = PolyBezier.SEGMENTS[degree](self.points[index, :degree + 1].tolist())
+        # The points are converted to Python complex numbers, so that the curve behaves the same as one from parse_path
+        if self._dists is not None:
+            bez._dist = float(self._dists[index])
+        return bez
 
     def get_lims(self):
         """
         This function gets the minimum and maximum values of real and imaginary coordinates
         @return: A tuple consisting of xlim and ylim, which are tuples consisting of minimum and maximum x and y values
         """
-        lims = [bez.get_lims() for bez in self.beziers]
-        xs = [lim[0] for lim in lims]
-        ys = [lim[1] for lim in lims]
-        xlim = (min(xs, key=lambda item: item[0])[0], max(xs, key=lambda item: item[1])[1])
-        ylim = (min(ys, key=lambda item: item[0])[0], max(ys, key=lambda item: item[1])[1])
+        return PolyBezier.get_total_lims([self])
+
+    @staticmethod
+    def get_total_lims(polys: list):
+        """
+        This function gets the minimum and maximum values of real and imaginary coordinates of all input PolyBeziers,
+        computing the extrema of every curve at once
+        @param polys: A list of PolyBezier curve objects
+        @return: A tuple consisting of xlim and ylim, which are tuples consisting of minimum and maximum x and y values
+        """
+        points = np.concatenate([poly.points for poly in polys])
+        cubic = np.concatenate([poly.degrees for poly in polys]) == 3
+        ends = np.where(cubic, points[:, 3], points[:, 1])
+        p = points[cubic].T
+        a = -3 * p[0] + 9 * p[1] - 9 * p[2] + 3 * p[3]
+        b = 6 * p[0] - 12 * p[1] + 6 * p[2]
+        c = -3 * p[0] + 3 * p[1]
+        # The coefficients of the derivative of each cubic Bezier curve, of which roots are the possible maxima
+        # and minima of the real and imaginary components
+        ts = np.concatenate([get_roots(a.real, b.real, c.real), get_roots(a.imag, b.imag, c.imag)])
+        ts = np.where((ts >= 0) & (ts <= 1), ts, 0)
+        # Roots outside the curve are replaced by t = 0, which is the start point
+        curve = (1 - ts) ** 3 * p[0] + 3 * (1 - ts) ** 2 * ts * p[1] + 3 * (1 - ts) * ts ** 2 * p[2] + ts ** 3 * p[3]
+        possible_maxima_minima = np.concatenate([points[:, 0], ends, curve.ravel()])
+        xlim = (float(possible_maxima_minima.real.min()), float(possible_maxima_minima.real.max()))
+        ylim = (float(possible_maxima_minima.imag.min()), float(possible_maxima_minima.imag.max()))
         return xlim, ylim
 
+    @property
+    def dists(self) -> np.ndarray:
+        """
+        This function returns the length of each Bezier curve, computing them the first time they're needed
+        @return: The lengths as an array
+        """
+        if self._dists is None:
+            PolyBezier.compute_dists([self])
+        return self._dists
+
+    @property
+    def dist(self) -> float:
+        """
+        This function returns the length of the PolyBezier. It's only computed when it's first needed, which is when
+        the curves are parametrized by distance.
+        @return: The length of the PolyBezier
+        """
+        if self._dist is None:
+            self._dist = self.get_dist()
+        return self._dist
+
     def get_dist(self):
         """
         This function computes the distance of the PolyBezier curve between the start and end point.
@@ -166,7 +342,26 @@ class PolyBezier:
         @return: The distance of the Bezier curve
         between the start and end point
         """
-        return sum([bez.dist for bez in self.beziers])
+        return float(self.dists.sum())
+
+    @staticmethod
+    def compute_dists(polys: list):
+        """
+        This function computes the lengths of the curves of all input PolyBeziers that have not been computed yet.
+        The lengths of all cubic Bezier curves are computed in a single call of get_arc_lengths.
+        @param polys: A list of PolyBezier curve objects
+        """
+        polys = [poly for poly in polys if poly._dists is None]
+        if len(polys) == 0:
+            return
+        points = np.concatenate([poly.points for poly in polys])
+        cubic = np.concatenate([poly.degrees for poly in polys]) == 3
+        dists = np.abs(points[:, 1] - points[:, 0])
+        # The length of a linear Bezier curve is the distance between its two points
+        if cubic.any():
+            dists[cubic] = get_arc_lengths(points[cubic])
+        for poly, poly_dists in zip(polys, np.split(dists, np.cumsum([poly.num for poly in polys])[:-1])):
+            poly._dists = poly_dists
 
     def __repr__(self) -> str:
         """
@@ -181,3 +376,19 @@ class PolyBezier:
         @return: The number of Bezier curves
         """
         return self.num
+
+
+def get_roots(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """
+    This function solves the quadratic equations a t^2 + b t + c = 0 for arrays of coefficients. If a is 0, the
+    equation is linear. Equations that have no real solution get nan.
+    @param a: The coefficients of t squared
+    @param b: The coefficients of t
+    @param c: The constants
+    @return: A (2 x num) array of the solutions
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        root = np.sqrt(b ** 2 - 4 * a * c)
+        quadratic = np.array([(-b + root) / (2 * a), (-b - root) / (2 * a)])
+        linear = -c / b
+    return np.where(a != 0, quadratic, linear)
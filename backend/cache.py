@@ -0,0 +1,227 @@
+import os
+import pickle
+from hashlib import sha256
+from collections import OrderedDict
+
+from utils import get_filename
+
+
+class ResultCache:
+
+    """
+    Caches the drawing data of processed images, keyed by the hash of the file content and the settings used.
+    The most recently used results are kept in memory, and every result is also written to a directory on disk,
+    so that results survive restarts. The oldest files are removed when the directory exceeds its size limit.
+    The directory can be shared by several server processes, so that a result computed by one of them is a hit for the
+    others. A result in memory is only used while its file exists, so that removing it in one process removes it for
+    all of them.
+    """
+
+    SUFFIX = ".json"
+    # The extension of the files of the disk tier
+
+    def __init__(self, path: str, max_entries: int, max_bytes: int):
+        self.path = path
+        # The directory of the disk tier
+        self.max_entries = max_entries
+        # The number of results kept in memory
+        self.max_bytes = max_bytes
+        # The maximum total size of the files in the disk tier
+        self.memory = OrderedDict()
+        # The memory tier. The least recently used result is at the start.
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def get_key(content: bytes, *settings) -> str:
+        """
+        This function creates the key of a result from the content of the file and the settings used to process it
+        @param content: The content of the file as bytes
+        @param settings: Any values that change the result, such as the number of vectors
+        @return: The key as a hexadecimal string
+        """
+        digest = sha256(content)
+        for setting in settings:
+            digest.update(f"|{setting}".encode())
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        """
+        This function looks up a result, first in memory and then on disk
+        @param key: The key of the result
+        @return: The result as a string, or None if it is not cached
+        """
+        file_path = self._get_file_path(key)
+        try:
+            os.utime(file_path)
+            # The modification time records when the file was last used, so that the oldest files are evicted first
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                return self.memory[key]
+            value = self._load(file_path)
+        except FileNotFoundError:
+            self.memory.pop(key, None)
+            # The result was removed by another process
+            self.misses += 1
+            return None
+        self.disk_hits += 1
+        self._put_memory(key, value)
+        return value
+
+    def put(self, key: str, value: str):
+        """
+        This function stores a result in both tiers
+        @param key: The key of the result
+        @param value: The result as a string
+        """
+        self._put_memory(key, value)
+        file_path = self._get_file_path(key)
+        temp_path = f"{file_path}.{os.getpid()}.tmp"
+        self._dump(temp_path, value)
+        os.replace(temp_path, file_path)
+        # The file is renamed after it is written, so that a partially written file is never read
+        self._evict_disk()
+
+    def invalidate(self, key: str = None):
+        """
+        This function removes a result from both tiers. If no key is given, every result is removed.
+        @param key: The key of the result
+        """
+        keys = [key] if key is not None else [get_filename(name) for name in self._get_file_names()]
+        if key is None:
+            self.memory.clear()
+        for k in keys:
+            self.memory.pop(k, None)
+            try:
+                os.remove(self._get_file_path(k))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        """
+        This function returns the counters and sizes of the cache
+        @return: A dictionary of the statistics
+        """
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_entries": len(self.memory),
+            "disk_entries": len(self._get_file_names()),
+            "disk_bytes": sum(size for _, size, _ in self._get_files()),
+        }
+
+    def _load(self, file_path: str):
+        """
+        This function reads a result from its file
+        @param file_path: The path to the file
+        @return: The result as a string
+        """
+        with open(file_path, "r") as f:
+            return f.read()
+
+    def _dump(self, file_path: str, value):
+        """
+        This function writes a result to a file
+        @param file_path: The path to the file
+        @param value: The result as a string
+        """
+        with open(file_path, "w") as f:
+            f.write(value)
+
+    def _put_memory(self, key: str, value: str):
+        """
+        This function stores a result in memory, removing the least recently used results if there are too many
+        @param key: The key of the result
+        @param value: The result as a string
+        """
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _evict_disk(self):
+        """
+        This function removes the least recently used files until the disk tier fits within its size limit
+        """
+        files = sorted(self._get_files(), key=lambda item: item[2])
+        total = sum(size for _, size, _ in files)
+        for file_path, size, _ in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _get_file_path(self, key: str) -> str:
+        """
+        This function gets the path to the file of a result
+        @param key: The key of the result
+        @return: The path as a string
+        """
+        return os.path.join(self.path, f"{key}{self.SUFFIX}")
+
+    def _get_file_names(self) -> list:
+        """
+        This function lists the names of the files in the disk tier
+        @return: A list of file names
+        """
+        return [name for name in os.listdir(self.path) if name.endswith(self.SUFFIX)]
+
+    def _get_files(self) -> list:
+        """
+        This function lists the files in the disk tier with their size and the time they were last used
+        @return: A list of tuples of path, size and modification time
+        """
+        files = []
+        for name in self._get_file_names():
+            file_path = os.path.join(self.path, name)
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            files.append((file_path, stat.st_size, stat.st_mtime))
+        return files
+
+
+
+class DrawingStore(ResultCache):
+
+    """
+    Keeps the coefficient calculators of processed drawings, keyed by drawing id, so that more vectors can be added to
+    a drawing in any server process, or after a restart. The calculators are pickled without their coefficients, so the
+    coefficients of each calculator are written next to them, and are given back to the calculators when the drawing
+    is read. The drawing is written again whenever it's extended, so no process computes those frequencies again.
+    """
+
+    SUFFIX = ".pickle"
+
+    def _load(self, file_path: str) -> list:
+        """
+        This function reads the calculators of a drawing from its file
+        @param file_path: The path to the file
+        @return: A list of Coefficient_calculator objects
+        """
+        with open(file_path, "rb") as f:
+            value = pickle.load(f)
+        if isinstance(value, list):
+            return value
+            # A drawing written before the coefficients were stored with it only has the calculators
+        calcs, sets_of_coeffs = value
+        for calc, coeffs in zip(calcs, sets_of_coeffs):
+            calc.coeffs = coeffs
+        return calcs
+
+    def _dump(self, file_path: str, value: list):
+        """
+        This function writes the calculators of a drawing to a file
+        @param file_path: The path to the file
+        @param value: A list of Coefficient_calculator objects
+        """
+        with open(file_path, "wb") as f:
+            pickle.dump((value, [dict(calc.coeffs) for calc in value]), f, protocol=pickle.HIGHEST_PROTOCOL)
@@ -1,5 +1,11 @@
-from math import e, pi
+from math import e, pi, hypot
+from itertools import islice
 
+import numpy as np
+
+from utils import get_frequencies
+from bezier import PolyBezier
+from config import Config
 
 
 class Coefficient_calculator:
@@ -8,6 +14,30 @@ class Coefficient_calculator:
     Calculates coefficients for rotating vectors whose sum draws the shape of input polybezier
     """
 
+    CHUNK_SIZE = 2 ** 20
+    # The maximum number of (frequency, boundary) pairs evaluated at once by the batched engine
+    TWIDDLE_SIZE = 16
+    # The number of twiddle factors e^(-2*pi*i*k*u), for k from 0, kept for each boundary. The exponential for any
+    # frequency is the product of one of them and an exponential for a multiple of TWIDDLE_SIZE.
+
+    BASES = {
+        3: np.array([[-1, 3, -3, 1], [3, -6, 3, 0], [-3, 3, 0, 0], [1, 0, 0, 0]], dtype=np.float64).T,
+        1: np.array([[0, 0, 0, 0], [0, 0, 0, 0], [-1, 1, 0, 0], [1, 0, 0, 0]], dtype=np.float64).T,
+    }
+    # Matrices that turn the control points of a Bezier curve into the coefficients a, b, c and d of the polynomial
+    # a*t^3 + b*t^2 + c*t + d. A linear Bezier curve is a cubic polynomial with a = b = 0.
+    UPPER = np.array([[1, 3, 6, 6], [1, 2, 2, 0], [1, 1, 0, 0], [1, 0, 0, 0]], dtype=np.float64)
+    # The derivatives of the polynomial at t = 1
+    LOWER = np.array([[0, 0, 0, 6], [0, 0, 2, 0], [0, 1, 0, 0], [1, 0, 0, 0]], dtype=np.float64)
+    # The derivatives of the polynomial at t = 0
+    MEAN = np.array([1 / 4, 1 / 3, 1 / 2, 1], dtype=np.float64)
+    # The integral of the polynomial between t = 0 and t = 1
+    ENERGY_NODES, ENERGY_WEIGHTS = np.polynomial.legendre.leggauss(4)
+    ENERGY_POWERS = ((ENERGY_NODES + 1) / 2) ** np.arange(3, -1, -1)[:, None]
+    ENERGY_WEIGHTS = ENERGY_WEIGHTS / 2
+    # The powers t^3, t^2, t and 1 at the nodes of Gauss-Legendre quadrature on [0, 1], and their weights. Four nodes
+    # integrate the square of the absolute value of a cubic polynomial exactly.
+
     def __init__(self, poly_bezier, num: int, by_dist: bool = False):
         self.poly_bezier = poly_bezier
         # PolyBezier object
@@ -17,6 +47,427 @@ class Coefficient_calculator:
         self.by_dist = by_dist
         # If this is true, each Bezier curve in the PolyBezier gets the range of t that is proportional to its distance.
         # If this is false, each Bezier curve gets the equal range of t.
+        self.coeffs = {}
+        # The coefficients computed so far, in the order 0, 1, -1, 2, -2, .... More can be added by calling extend.
+
+    def __getstate__(self) -> dict:
+        """
+        This function returns the state that is pickled when the calculator is sent to a worker process.
+        The coefficients computed so far are left out, as the workers only need the PolyBezier.
+        @return: A dictionary of attributes
+        """
+        state = self.__dict__.copy()
+        state["coeffs"] = {}
+        return state
+
+    @staticmethod
+    def _get_segments(calculators: list):
+        """
+        This function gets the polynomial of every segment of all input calculators, with the range of u it gets
+        @param calculators: A list of Coefficient_calculator objects
+        @return: A tuple of a (num x 4) complex array of the coefficients a, b, c and d of each segment, the range of u
+        of each segment and the index of the calculator each segment belongs to
+        """
+        counts = np.array([calc.num_bez for calc in calculators], dtype=np.int64)
+        owner = np.repeat(np.arange(len(calculators)), counts)
+        # The index of the PolyBezier that each segment belongs to
+        points = np.concatenate([calc.poly_bezier.points for calc in calculators] + [np.zeros((0, 4), np.complex128)])
+        degrees = np.concatenate([calc.poly_bezier.degrees for calc in calculators] + [np.zeros(0, np.int8)])
+        # The points of linear Bezier curves are followed by zeros, so every row can be multiplied by a 4 x 4 basis
+        if not np.isin(degrees, list(Coefficient_calculator.BASES)).all():
+            raise SyntaxError("Only cubic and linear bezier curves are supported.")
+        polys = np.empty((len(points), 4), dtype=np.complex128)
+        for degree, basis in Coefficient_calculator.BASES.items():
+            rows = degrees == degree
+            polys[rows] = points[rows] @ basis
+        PolyBezier.compute_dists([calc.poly_bezier for calc in calculators if calc.by_dist])
+        # The lengths of all segments are computed together, and only if they are needed
+        widths = np.concatenate([calc.poly_bezier.dists / calc.poly_bezier.dist if calc.by_dist
+                                 else np.full(calc.num_bez, 1 / calc.num_bez) for calc in calculators] + [np.zeros(0)])
+        # The range of u that each segment gets
+        return polys, widths, owner
+
+    @staticmethod
+    def _pack(calculators: list):
+        """
+        This function packs the PolyBeziers of all input calculators into contiguous arrays, so that every segment can
+        be integrated at once. Both linear and cubic Bezier curves are written as a cubic polynomial, so they share the
+        closed form of _get_integral_cubic. The four rows of the integration by parts are weighted by powers of du/dt
+        and accumulated on the boundaries between segments, as the upper limit of one segment is the lower limit of
+        the next.
+        @param calculators: A list of Coefficient_calculator objects
+        @return: A tuple of the buckets of PolyBeziers and the coefficient for n = 0 of each PolyBezier. Each bucket
+        holds the indices of its PolyBeziers, their padded boundaries and the padded weights on each boundary
+        """
+        polys, widths, owner = Coefficient_calculator._get_segments(calculators)
+        keep = widths > 0
+        # A segment with no length gets no range of u, so it does not contribute to any coefficient
+        polys, widths, owner = polys[keep], widths[keep], owner[keep]
+        counts = np.bincount(owner, minlength=len(calculators))
+        starts = np.concatenate(([0], np.cumsum(counts + 1)[:-1]))
+        # Each PolyBezier has one more boundary than it has segments, as it also has the lower limit 0
+        lower_index = np.arange(len(widths)) + owner
+        boundaries = np.zeros(len(widths) + len(calculators), dtype=np.float64)
+        for start, count, first in zip(np.cumsum(counts) - counts, counts, starts):
+            boundaries[first + 1:first + 1 + count] = np.cumsum(widths[start:start + count])
+            # The upper limit of each segment is the sum of the ranges of all segments up to it
+        powers = (1 / widths)[:, None] ** np.arange(4)
+        # Powers of du/dt
+        weights = np.zeros((len(boundaries), 4), dtype=np.complex128)
+        weights[lower_index + 1] += (polys @ Coefficient_calculator.UPPER) * powers
+        # The part multiplied by e at the upper limit
+        weights[lower_index] -= (polys @ Coefficient_calculator.LOWER) * powers
+        # The part multiplied by e at the lower limit
+        means = (polys @ Coefficient_calculator.MEAN) * widths
+        zeroth = np.bincount(owner, means.real, len(calculators)) + 1j * np.bincount(owner, means.imag, len(calculators))
+        buckets = []
+        lengths = counts + 1
+        sizes = np.ceil(np.log2(lengths)).astype(np.int64)
+        for size in np.unique(sizes):
+            members = np.flatnonzero(sizes == size)
+            # PolyBeziers with a similar number of boundaries are padded to the same length, so that each of them is
+            # summed with a single matrix product
+            columns = np.arange(lengths[members].max())
+            valid = columns < lengths[members][:, None]
+            index = np.where(valid, starts[members][:, None] + columns, 0)
+            padded_weights = np.where(valid[:, :, None], weights[index], 0).transpose(0, 2, 1)
+            buckets.append((members, boundaries[index], np.concatenate((padded_weights.real, padded_weights.imag), axis=1)))
+            # The real and imaginary parts are stacked, so that they can be multiplied by cos and sin with real arithmetic
+        return buckets, zeroth
+
+    @staticmethod
+    def get_coefficients_batch(calculators: list, ns) -> np.ndarray:
+        """
+        This function computes the coefficients of all input calculators for all input frequencies at once, with the
+        engine specified by COEFF_MODE in the Config class
+        @param calculators: A list of Coefficient_calculator objects
+        @param ns: A sequence of frequencies
+        @return: A complex array of coefficients, with a row for each calculator and a column for each frequency
+        """
+        if Config.COEFF_MODE == "fft":
+            return Coefficient_calculator.get_coefficients_fft(calculators, ns, Config.FFT_SAMPLES)
+        if Config.COEFF_MODE != "exact":
+            raise ValueError(f"Unknown coefficient mode {Config.COEFF_MODE}")
+        return Coefficient_calculator.get_coefficients_exact(calculators, ns)
+
+    @staticmethod
+    def get_coefficients_exact(calculators: list, ns) -> np.ndarray:
+        """
+        This function computes the coefficients of all input calculators for all input frequencies at once. It evaluates
+        the same closed form as _get_integral_cubic, but for the whole (frequency x boundary) matrix with numpy.
+        As e to the power of -n is the conjugate of e to the power of n, the exponentials are only computed for |n|.
+        @param calculators: A list of Coefficient_calculator objects
+        @param ns: A sequence of frequencies
+        @return: A complex array of coefficients, with a row for each calculator and a column for each frequency
+        """
+        buckets, zeroth = Coefficient_calculator._pack(calculators)
+        ns = np.asarray(ns, dtype=np.int64)
+        magnitudes, inverse = np.unique(np.abs(ns), return_inverse=True)
+        denom = -2j * pi * magnitudes
+        denom[magnitudes == 0] = 1
+        reciprocals = 1 / denom
+        # The reciprocal of the denominator for each positive frequency, so that its powers are taken by multiplying.
+        # n = 0 is replaced with zeroth at the end.
+        results = np.empty((2, len(calculators), len(magnitudes)), dtype=np.complex128)
+        # The coefficients for the positive and negative frequencies
+        for members, boundaries, weights in buckets:
+            step = max(1, Coefficient_calculator.CHUNK_SIZE // boundaries.size)
+            size = max(1, min(Coefficient_calculator.TWIDDLE_SIZE, step))
+            twiddles = np.exp(boundaries[:, :, None] * (-2j * pi * np.arange(size)))
+            # The twiddle factors of every boundary, shared by all blocks of frequencies
+            for start in range(0, len(magnitudes), step):
+                block = slice(start, start + step)
+                high, low = np.divmod(magnitudes[block], size)
+                anchors, which = np.unique(high, return_inverse=True)
+                phasors = np.exp(boundaries[:, :, None] * (-2j * pi * size * anchors))[:, :, which] * twiddles[:, :, low]
+                # e to the power of -2*pi*i*|n|*u for every boundary and frequency, which is cos - i*sin of
+                # 2*pi*|n|*u. Only one exponential in size is computed, and the rest are products of two of them.
+                cos = weights @ phasors.real
+                sin = weights @ -phasors.imag
+                cos = cos[:, :4] + 1j * cos[:, 4:]
+                sin = sin[:, :4] + 1j * sin[:, 4:]
+                for sign, sums in enumerate((cos - 1j * sin, cos + 1j * sin)):
+                    # The negative frequencies use the conjugate of e and the negated denominator, as cos and sin are real
+                    first, second, third, fourth = sums.transpose(1, 0, 2)
+                    r = reciprocals[block] * (1 - 2 * sign)
+                    results[sign, members, block] = (first - (second - (third - fourth * r) * r) * r) * r
+                    # Each corresponds to a row of the quick technique of integration by parts.
+        out = np.ascontiguousarray(results[(ns < 0).astype(np.int64), :, inverse].T)
+        out[:, ns == 0] = zeroth[:, None]
+        return out
+
+    @staticmethod
+    def get_coefficients_fft(calculators: list, ns, samples: int) -> np.ndarray:
+        """
+        This function approximates the coefficients of all input calculators by sampling each PolyBezier at K points
+        evenly spaced in u, and taking one FFT of each. The segments get the same ranges of u as in
+        get_coefficients_exact, so this approximates the same integrals by the trapezoidal rule, and its cost does not
+        grow with the number of frequencies times the number of segments.
+        K is the smallest power of two that is at least samples and more than twice the largest |n|, so that no two
+        frequencies share a bin of the FFT.
+        A PolyBezier with no length has no segment left to sample, so all of its coefficients are 0, as they are in
+        get_coefficients_exact.
+        @param calculators: A list of Coefficient_calculator objects
+        @param ns: A sequence of frequencies
+        @param samples: The smallest number of points sampled from each PolyBezier
+        @return: A complex array of coefficients, with a row for each calculator and a column for each frequency
+        """
+        ns = np.asarray(ns, dtype=np.int64)
+        out = np.zeros((len(calculators), len(ns)), dtype=np.complex128)
+        if len(calculators) == 0 or len(ns) == 0:
+            return out
+        num_samples = 1 << (max(samples, 2 * int(np.abs(ns).max()) + 1) - 1).bit_length()
+        polys, widths, owner = Coefficient_calculator._get_segments(calculators)
+        keep = widths > 0
+        polys, widths, owner = polys[keep], widths[keep], owner[keep]
+        present = np.flatnonzero(np.bincount(owner, minlength=len(calculators)) > 0)
+        # The PolyBeziers that have a length. The others keep coefficients of 0.
+        if len(present) == 0:
+            return out
+        owner = np.searchsorted(present, owner)
+        # The segments are numbered by their PolyBezier among the ones that have a length
+        first = np.flatnonzero(np.append(True, owner[1:] != owner[:-1]))
+        last = np.append(first[1:] - 1, len(owner) - 1)
+        # The first and last segment of each PolyBezier
+        lowers = np.cumsum(widths) - widths
+        lowers -= lowers[first][owner]
+        lowers[first] = 0
+        # The lower limit of u of each segment. The first one is set to exactly 0, as the subtraction of the sums can
+        # round it above 0, and the sample at u = 0 would then be taken from the previous PolyBezier.
+        starts = owner + lowers
+        # The lower limits are shifted by the index of their PolyBezier, so that the segment of every sample is found
+        # with one search
+        ends = polys[last].sum(axis=1)
+        # The end point of each PolyBezier, which is the polynomial at t = 1 of its last segment
+        u = np.arange(num_samples) / num_samples
+        step = max(1, Coefficient_calculator.CHUNK_SIZE // num_samples)
+        for start in range(0, len(present), step):
+            rows = np.arange(start, min(start + step, len(present)))
+            positions = (rows[:, None] + u).ravel()
+            segment = np.clip(np.searchsorted(starts, positions, side="right") - 1, 0, len(starts) - 1)
+            t = (positions - starts[segment]) / widths[segment]
+            a, b, c, d = polys[segment].T
+            values = (((a * t + b) * t + c) * t + d).reshape(len(rows), num_samples)
+            values[:, 0] = (values[:, 0] + ends[rows]) / 2
+            # The curve jumps from its end back to its start at u = 1 unless it's closed, and the trapezoidal rule
+            # takes the mean of both sides of the jump
+            spectrum = np.fft.fft(values, axis=1) / num_samples
+            out[present[rows]] = spectrum[:, ns % num_samples]
+            # The coefficient for -n is in the bin K - n
+        return out
+
+    @staticmethod
+    def get_groups(calculators: list, chunk_segments: int) -> list:
+        """
+        This function splits the input calculators into groups of consecutive calculators with about chunk_segments
+        segments in total. A calculator with more segments than chunk_segments gets a group of its own.
+        @param calculators: A list of Coefficient_calculator objects
+        @param chunk_segments: The number of segments in each group
+        @return: A list of tuples of the index of the first calculator, the index after the last calculator and the
+        number of segments in the group
+        """
+        groups = []
+        start = 0
+        segments = 0
+        for index, calc in enumerate(calculators):
+            if segments > 0 and segments + calc.num_bez > chunk_segments:
+                groups.append((start, index, segments))
+                start = index
+                segments = 0
+            segments += calc.num_bez
+        if calculators:
+            groups.append((start, len(calculators), segments))
+        return groups
+
+    @staticmethod
+    def store_coefficients(calculators: list, ns: list, values: np.ndarray) -> list:
+        """
+        This function stores the computed coefficients in each input calculator, skipping the ones already stored
+        @param calculators: A list of Coefficient_calculator objects
+        @param ns: A list of frequencies
+        @param values: A complex array with a row for each calculator and a column for each frequency
+        @return: A list of dictionaries of the coefficients that were added to each calculator
+        """
+        rows = values.view(np.float64).reshape(len(calculators), len(ns), 2).tolist()
+        # The complex coefficient is decomposed to its real and imaginary part as JavaScript does not support
+        # complex numbers
+        added = []
+        for calc, row in zip(calculators, rows):
+            new = {n: value for n, value in zip(ns, row) if n not in calc.coeffs}
+            calc.coeffs.update(new)
+            added.append(new)
+        return added
+
+    @staticmethod
+    def get_coefficients_parallel(calculators: list, ns, executor, chunk_segments: int) -> np.ndarray:
+        """
+        This function computes the same array as get_coefficients_batch, but splits the work into jobs of about
+        chunk_segments segments each and runs them on the input executor. Consecutive PolyBeziers are grouped into the
+        same job, and a PolyBezier with more segments than chunk_segments has its frequencies split across several jobs,
+        so that one huge outline does not dominate. The results are placed back in the input order.
+        In the "fft" mode, each job computes every frequency of its PolyBeziers, as one FFT gives all of them and
+        splitting the frequencies would sample and transform the same PolyBezier again for every job.
+        @param calculators: A list of Coefficient_calculator objects
+        @param ns: A sequence of frequencies
+        @param executor: A concurrent.futures executor, such as a ProcessPoolExecutor
+        @param chunk_segments: The number of segments in each job
+        @return: A complex array of coefficients, with a row for each calculator and a column for each frequency
+        """
+        ns = list(ns)
+        groups = Coefficient_calculator.get_groups(calculators, chunk_segments)
+        jobs = []
+        for start, stop, segments in groups:
+            if Config.COEFF_MODE == "fft":
+                future = executor.submit(
+                    Coefficient_calculator.get_coefficients_fft, calculators[start:stop], ns, Config.FFT_SAMPLES)
+                jobs.append((start, stop, 0, future))
+                continue
+            parts = -(-segments // chunk_segments)
+            # The number of jobs the frequencies of the group are split into
+            step = -(-len(ns) // parts)
+            for first in range(0, len(ns), step):
+                future = executor.submit(
+                    Coefficient_calculator.get_coefficients_batch, calculators[start:stop], ns[first:first + step])
+                jobs.append((start, stop, first, future))
+        out = np.empty((len(calculators), len(ns)), dtype=np.complex128)
+        for start, stop, first, future in jobs:
+            values = future.result()
+            out[start:stop, first:first + values.shape[1]] = values
+        return out
+
+    @staticmethod
+    def extend_batch(calculators: list, num: int, executor=None, chunk_segments: int = 1000) -> list:
+        """
+        This function extends the coefficients of each input calculator to num vectors, computing only the frequencies
+        that are not stored yet. The frequencies keep the order 0, 1, -1, 2, -2, 3, -3, ....
+        @param calculators: A list of Coefficient_calculator objects
+        @param num: The number of vectors each calculator should have
+        @param executor: If given, the work is split into jobs of chunk_segments segments that run on this executor
+        @param chunk_segments: The number of segments in each job
+        @return: A list of dictionaries of the coefficients that were added to each calculator
+        """
+        for calc in calculators:
+            calc.num_coeff = max(calc.num_coeff, num)
+        start = min([len(calc.coeffs) for calc in calculators], default=num)
+        ns = get_frequencies(num, start)
+        # Only the frequencies after the ones already stored by every calculator are computed
+        if not ns:
+            return [{} for _ in calculators]
+        total_segments = sum(calc.num_bez for calc in calculators)
+        if executor is not None and total_segments > chunk_segments:
+            values = Coefficient_calculator.get_coefficients_parallel(calculators, ns, executor, chunk_segments)
+        else:
+            values = Coefficient_calculator.get_coefficients_batch(calculators, ns)
+            # Small drawings are computed in this process, as sending them to the workers would take longer
+        return Coefficient_calculator.store_coefficients(calculators, ns, values)
+
+    @staticmethod
+    def get_energies(calculators: list) -> np.ndarray:
+        """
+        This function computes the mean of |z(u)|^2 over the curve of each calculator, which by Parseval's theorem is the
+        sum of |c_n|^2 over every frequency. The energy left after some coefficients is the mean square distance
+        between the curve and the curve those coefficients draw.
+        @param calculators: A list of Coefficient_calculator objects
+        @return: An array of the energy of each calculator
+        """
+        polys, widths, owner = Coefficient_calculator._get_segments(calculators)
+        squares = np.abs(polys @ Coefficient_calculator.ENERGY_POWERS) ** 2 @ Coefficient_calculator.ENERGY_WEIGHTS
+        # The integral of |z|^2 over each segment, with t from 0 to 1
+        return np.bincount(owner, squares * widths, len(calculators))
+
+    @staticmethod
+    def main_truncated(calculators: list, tolerance: float, budget: int, executor=None, chunk_segments: int = 1000,
+                       step: int = 16) -> list:
+        """
+        This function gets a dictionary of coefficients for each input calculator, with only as many vectors as it takes
+        for the root mean square distance between the curve and the drawing to fall below tolerance, up to the
+        num_coeff of the calculator. The coefficients are computed step frequencies at a time, and a calculator stops
+        as soon as it is within tolerance, so small paths only get a few vectors.
+        If the drawing needs more than budget vectors in total, a larger error is allowed for every path, the same for
+        all of them, so that it fits in the budget. Each path always gets at least one vector.
+        @param calculators: A list of Coefficient_calculator objects
+        @param tolerance: The largest root mean square distance allowed for each path
+        @param budget: The maximum total number of vectors
+        @param executor: If given, the work is split into jobs of chunk_segments segments that run on this executor
+        @param chunk_segments: The number of segments in each job
+        @param step: The number of frequencies computed at a time
+        @return: A list of dictionaries of coefficients
+        """
+        energies = Coefficient_calculator.get_energies(calculators)
+        limit = tolerance ** 2
+        residuals = [None] * len(calculators)
+        # The energy left after each number of coefficients, for each calculator
+        active = list(range(len(calculators)))
+        count = 0
+        while active:
+            count = min(count + step, max(calculators[index].num_coeff for index in active))
+            Coefficient_calculator.extend_batch([calculators[index] for index in active], count, executor,
+                                                chunk_segments)
+            remaining = []
+            for index in active:
+                calc = calculators[index]
+                values = np.array(list(calc.coeffs.values()))
+                residuals[index] = energies[index] - np.cumsum(values[:, 0] ** 2 + values[:, 1] ** 2)
+                if residuals[index][-1] > limit and len(calc.coeffs) < calc.num_coeff:
+                    remaining.append(index)
+            active = remaining
+        counts = Coefficient_calculator._get_counts(residuals, limit, [calc.num_coeff for calc in calculators])
+        if counts.sum() > budget:
+            levels = np.unique(np.concatenate(residuals))
+            low, high = 0, len(levels) - 1
+            # The smallest error level at which the paths fit in the budget is searched for
+            while low < high:
+                middle = (low + high) // 2
+                if Coefficient_calculator._get_counts(residuals, max(levels[middle], limit)).sum() > budget:
+                    low = middle + 1
+                else:
+                    high = middle
+            counts = Coefficient_calculator._get_counts(residuals, max(levels[low], limit))
+        sets_of_coeffs = []
+        for calc, count in zip(calculators, counts):
+            calc.coeffs = dict(islice(calc.coeffs.items(), int(count)))
+            # Coefficients beyond the count are dropped, so that extending the drawing later sends them too
+            sets_of_coeffs.append(dict(calc.coeffs))
+        return sets_of_coeffs
+
+    @staticmethod
+    def _get_counts(residuals: list, limit: float, maxima: list = None) -> np.ndarray:
+        """
+        This function gets the smallest number of coefficients for each calculator that leaves at most limit energy
+        @param residuals: A list of arrays of the energy left after each number of coefficients, for each calculator
+        @param limit: The energy allowed to be left
+        @param maxima: The number of coefficients used if no number is within the limit, for each calculator. If it's
+        None, all computed coefficients are used.
+        @return: An array of the number of coefficients for each calculator
+        """
+        counts = np.empty(len(residuals), dtype=np.int64)
+        for index, residual in enumerate(residuals):
+            within = np.flatnonzero(residual <= limit)
+            counts[index] = within[0] + 1 if len(within) else len(residual)
+            if maxima is not None:
+                counts[index] = min(counts[index], maxima[index])
+        return counts
+
+    @staticmethod
+    def main_batch(calculators: list, executor=None, chunk_segments: int = 1000) -> list:
+        """
+        This function gets a dictionary of coefficients for each input calculator, computing all of them at once.
+        @param calculators: A list of Coefficient_calculator objects
+        @param executor: If given, the work is split into jobs of chunk_segments segments that run on this executor
+        @param chunk_segments: The number of segments in each job
+        @return: A list of dictionaries of coefficients
+        """
+        num = max([calc.num_coeff for calc in calculators], default=0)
+        Coefficient_calculator.extend_batch(calculators, num, executor, chunk_segments)
+        return [dict(calc.coeffs) for calc in calculators]
+
+    def get_coefficients(self, ns) -> np.ndarray:
+        """
+        This function computes the coefficients of self.poly_bezier for all input frequencies at once.
+        @param ns: A sequence of frequencies
+        @return: A complex array of coefficients in the same order as ns
+        """
+        return self.get_coefficients_batch([self], ns)[0]
 
     def get_coefficient(self, n: int):
         """
@@ -118,17 +569,45 @@ class Coefficient_calculator:
         This function gets a dictionary of coefficients, with keys of frequency and values of coefficients
         @return: A dictionary of coefficients
         """
-        n = 0
-        coeffs = {}
-        for i in range(self.num_coeff):
-            coeff = self.get_coefficient(n)
-            coeffs.update({n: [coeff.real, coeff.imag]})
-            # The complex coefficient is decomposed to its real and imaginary part as JavaScript does not support
-            # complex numbers
-            if i % 2 == 0:
-                n += i+1
-            else:
-                n *= -1
-            # By doing this operation, n progresses like: 0, 1, -1, 2, -2, 3, -3, ....
-        return coeffs
+        return self.main_batch([self])[0]
+
+    def extend(self, num: int) -> dict:
+        """
+        This function extends the coefficients to num vectors, computing only the frequencies that are not stored yet
+        @param num: The number of vectors
+        @return: A dictionary of the coefficients that were added
+        """
+        return self.extend_batch([self], num)[0]
 
+
+def get_settings() -> tuple:
+    """
+    This function gets the settings of the coefficient mode and of truncation specified in the Config class, which
+    change the drawing data and so are part of the key of a result in the result cache
+    @return: A tuple of the settings, which is empty if every path gets the same number of vectors computed exactly
+    """
+    settings = ()
+    if Config.COEFF_MODE != "exact":
+        settings += (Config.COEFF_MODE, Config.FFT_SAMPLES)
+    if Config.TRUNCATE:
+        settings += (Config.TRUNCATE_TOLERANCE, Config.VECTOR_BUDGET)
+    return settings
+
+
+def get_sets_of_coeffs(calculators: list, lims: tuple, executor=None, chunk_segments: int = 1000) -> list:
+    """
+    This function gets a dictionary of coefficients for each input calculator. If truncation is on in the Config
+    class, each path only gets the vectors it needs to be within the tolerance, which is relative to the diagonal of
+    the drawing, and all paths share the budget of vectors.
+    @param calculators: A list of Coefficient_calculator objects
+    @param lims: A tuple of the xlim and ylim of the drawing
+    @param executor: If given, the work is split into jobs of chunk_segments segments that run on this executor
+    @param chunk_segments: The number of segments in each job
+    @return: A list of dictionaries of coefficients
+    """
+    if not Config.TRUNCATE:
+        return Coefficient_calculator.main_batch(calculators, executor, chunk_segments)
+    (x_min, x_max), (y_min, y_max) = lims
+    tolerance = Config.TRUNCATE_TOLERANCE * hypot(x_max - x_min, y_max - y_min)
+    return Coefficient_calculator.main_truncated(calculators, tolerance, Config.VECTOR_BUDGET, executor, chunk_segments,
+                                                 Config.TRUNCATE_STEP)
@@ -1,5 +1,9 @@
 from math import e, pi
 
+import numpy as np
+
+from config import Config
+
 
 class ComplexVector:
 
@@ -12,3 +16,70 @@ class ComplexVector:
 
     def __repr__(self):
         return f"n: {self.n} coeff: {self.coefficient}"
+
+
+class RotatingVectors:
+
+    """
+    Holds the vectors of several sets packed in one array and evaluates them at the steps t = step * dt. Instead of
+    computing e^(2*pi*i*n*t) for every vector at every step, the phasor of each vector is multiplied by its rotor
+    e^(2*pi*i*n*dt), which is computed once. The rounding errors of the multiplications slowly change the magnitudes of
+    the phasors, so they are scaled back to 1 every renormalize steps.
+    """
+
+    def __init__(self, sets_of_vectors: list, dt: float, renormalize: int = Config.PHASOR_RENORMALIZE):
+        num = max((len(vectors) for vectors in sets_of_vectors), default=0)
+        self.coefficients = np.zeros((len(sets_of_vectors), num), dtype=np.complex128)
+        self.ns = np.zeros((len(sets_of_vectors), num), dtype=np.int64)
+        # Sets with fewer vectors are padded with vectors of coefficient 0
+        for index, vectors in enumerate(sets_of_vectors):
+            self.coefficients[index, :len(vectors)] = [vector.coefficient for vector in vectors]
+            self.ns[index, :len(vectors)] = [vector.n for vector in vectors]
+        self.dt = dt
+        self.renormalize = renormalize
+        self.rotors = np.exp(2j * np.pi * self.ns * dt)
+        self.phasors = None
+        self.step = None
+        self.since_renormalized = 0
+        self.seek(0)
+
+    def seek(self, step: int):
+        """
+        This function computes the phasors at a step directly
+        @param step: The step, at t = step * dt
+        """
+        self.phasors = np.exp(2j * np.pi * self.ns * (step * self.dt))
+        self.step = step
+        self.since_renormalized = 0
+
+    def advance(self):
+        """
+        This function moves the phasors on by one step with one complex multiplication each
+        """
+        self.phasors *= self.rotors
+        self.step += 1
+        self.since_renormalized += 1
+        if self.since_renormalized >= self.renormalize:
+            self.phasors /= np.abs(self.phasors)
+            self.since_renormalized = 0
+
+    def at(self, step: int) -> np.ndarray:
+        """
+        This function evaluates the vectors at a step. Moving on to the next step only takes one multiplication for
+        each vector, and any other step is computed directly.
+        @param step: The step, at t = step * dt
+        @return: An array of the vectors of each set, with a row for each set
+        """
+        if step == self.step + 1:
+            self.advance()
+        elif step != self.step:
+            self.seek(step)
+        return self.coefficients * self.phasors
+
+    def tips(self, step: int) -> np.ndarray:
+        """
+        This function computes the sum of the vectors of each set at a step
+        @param step: The step, at t = step * dt
+        @return: An array of the point each set draws
+        """
+        return self.at(step).sum(axis=1)
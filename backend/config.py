@@ -6,24 +6,161 @@ class Config:
     NUM_VECTORS = 200
     DT = 0.01
     BY_DIST = True
+    DIST_TOLERANCE = 1e-9
+    # The relative error allowed in the length of each Bezier curve
+    DIST_GAUSS_POINTS = 8
+    # The number of nodes of Gauss-Legendre quadrature used on each interval when computing lengths
+    DIST_MAX_DEPTH = 12
+    # The maximum number of times an interval is split in half when computing lengths
+    PHASOR_RENORMALIZE = 64
+    # The number of steps after which the rotating phasors of the vectors are scaled back to a magnitude of 1
 
 
     """
     Backend config
     """
-    IMAGE_PATH = "images"
     ACCEPTABLE_EXTENSIONS = ["jpeg", "jpg", "png", "pnm", "svg"]
+    MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+    # The maximum size of an uploaded file. A larger file is refused with 413 as soon as it's seen to be too large.
+    UPLOAD_CHUNK_BYTES = 64 * 1024
+    # The number of bytes of an uploaded file read at a time
+    MAX_VECTORS = 1000
+    # The maximum number of vectors a drawing can be extended to
+    MAX_DRAWINGS = 32
+    # The number of processed drawings kept in memory so that more vectors can be added to them
+    CACHE_PATH = "cache"
+    # The directory of the on-disk tier of the result cache
+    CACHE_MEMORY_ENTRIES = 64
+    # The number of results kept in memory
+    CACHE_DISK_BYTES = 256 * 1024 * 1024
+    # The maximum total size of the on-disk tier of the result cache
+    MAX_CONVERSIONS = 4
+    # The number of raster images that can be converted to SVG images at the same time
+    CONVERSION_TIMEOUT = 60
+    # The number of seconds a conversion can take before it is stopped
+    NUM_WORKERS = 4
+    # The number of worker processes that compute coefficients. If it's 0, they are computed in the server process.
+    CHUNK_SEGMENTS = 1000
+    # The number of segments in each job sent to the worker processes
+    SIMPLIFY = False
+    # If this is true, tiny subpaths are dropped and short curves are merged before the coefficients are computed
+    SIMPLIFY_TOLERANCE = 1e-3
+    # The largest distance a merged curve can be from the curves it replaces, relative to the diagonal of the image
+    SIMPLIFY_MIN_LENGTH = 5e-3
+    # Subpaths shorter than this, relative to the diagonal of the image, are dropped
+    SIMPLIFY_MIN_AREA = 1e-5
+    # Closed subpaths enclosing less than this area, relative to the square of the diagonal, are dropped
+    COEFF_MODE = "exact"
+    # "exact" integrates each Bezier curve in closed form, and "fft" samples each path and takes one FFT of it, which
+    # is faster for many vectors on paths with many curves but only approximates the coefficients
+    FFT_SAMPLES = 4096
+    # The smallest number of points sampled from each path in the "fft" mode. More are used for more vectors.
+    TRUNCATE = False
+    # If this is true, each path only gets as many vectors as it needs to be within TRUNCATE_TOLERANCE,
+    # up to NUM_VECTORS
+    TRUNCATE_TOLERANCE = 1e-3
+    # The root mean square distance allowed between each path and its drawing, relative to the diagonal of the image
+    VECTOR_BUDGET = 20000
+    # The maximum total number of vectors of a drawing when truncating. A larger error is allowed if it's exceeded.
+    TRUNCATE_STEP = 16
+    # The number of frequencies computed at a time when truncating
+    NUM_TOURS = 0
+    # The number of closed tours the subpaths are joined into, each drawn by one set of vectors.
+    # If it's 0, each subpath is drawn by its own set of vectors.
+    TRACE_SAMPLES = 1000
+    # The number of points sampled from each curve for the pen path, one for each frame of the frontend animation
+    MAX_TRACE_SAMPLES = 8192
+    # The maximum number of points that can be sampled from each curve
+    BATCH_PATH = "batch"
+    # The directory of the store that batches of images are written to
+    BATCH_QUEUE_SIZE = 8
+    # The number of images that can wait between two stages of a batch
+    MAX_BATCH_FILES = 64
+    # The maximum number of files in a request to the /batch endpoint
+    JOB_DATABASE = "jobs.sqlite3"
+    # The SQLite database that keeps the jobs of the /jobs endpoints across restarts
+    JOB_WORKERS = 2
+    # The number of jobs run at the same time
+    MAX_PENDING_JOBS = 16
+    # The number of jobs that can be queued or running before new jobs are refused with 429
+    JOB_POLL_SECONDS = 1.0
+    # How often the workers of each server process look for jobs submitted to the other processes
+    HOST = "127.0.0.1"
+    # The address the server listens on
+    PORT = 3000
+    # The port the server listens on
+    SERVER_WORKERS = 1
+    # The number of server processes started by serve.py. Each has its own NUM_WORKERS worker processes, and they
+    # share the result cache, the drawing store and the job database on disk.
+    DRAWING_PATH = "drawings"
+    # The directory of the drawing store, which keeps the coefficient calculators of processed images on disk
+    DRAWING_DISK_BYTES = 256 * 1024 * 1024
+    # The maximum total size of the drawing store
+    METRICS_SECONDS_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+    # The upper bounds of the buckets of the histograms of the time each stage takes
+    METRICS_COUNT_BUCKETS = [1, 10, 100, 1000, 10000, 100000, 1000000]
+    # The upper bounds of the buckets of the histograms of the paths, segments and vectors each stage handles
+
+
+    """
+    Benchmark configs:
+    """
+    BENCHMARK_VECTORS = [50, 200, 1000]
+    # The numbers of vectors the coefficients are benchmarked with
+    BENCHMARK_REPEAT = 5
+    # The number of timed runs of each stage
+    BENCHMARK_WARMUP = 1
+    # The number of runs of each stage before the timed runs
+    BENCHMARK_THRESHOLD = 0.1
+    # The fraction of the baseline time a stage can be slower by before it is reported as a regression
+    BENCHMARK_CHECK_VECTORS = 50
+    # The number of coefficients of each path checked against the scalar implementation
+    BENCHMARK_CHECK_PATHS = 3
+    # The number of paths of each image checked against the scalar implementation
+    BENCHMARK_TOLERANCE = 1e-9
+    # The largest relative error allowed between the batched and the scalar coefficients
+    BENCHMARK_FRAMES = 10
+    # The number of consecutive frames the evaluation of the vectors is timed over
+    BENCHMARK_DRIFT_STEPS = 100000
+    # The number of steps the rotating phasors are advanced by before their error is checked
 
 
     """
     test display configs:
     """
-    # MARGIN_FACTOR = 0.1
-    # VEC_WIDTH = 0.5
-    # PATH_WIDTH = 2
-    # NUM_FRAME = 300
-    # FIG_SIZE = (19, 10)
-    # STYLE = "dark_background"
-    # PATH_COLOURS = ["purple"]
-    # AXIS = "off"
-    # VEC_DISPLAY_THRESHOLD = 10
+    MARGIN_FACTOR = 0.1
+    VEC_WIDTH = 0.5
+    PATH_WIDTH = 2
+    NUM_FRAME = 300
+    # The number of frames it takes to draw the whole image
+    FIG_SIZE = (19, 10)
+    STYLE = "dark_background"
+    PATH_COLOURS = ["purple"]
+    AXIS = "off"
+    VEC_DISPLAY_THRESHOLD = 10
+    # The vectors are only drawn if the image has fewer paths than this
+
+
+    """
+    Export configs:
+    """
+    EXPORT_PATH = "videos"
+    # The directory the videos are written to when a directory of images is exported
+    EXPORT_SIZE = (1280, 720)
+    # The width and height of the videos in pixels
+    EXPORT_FPS = 60
+    EXPORT_NUM_FRAME = 300
+    # The number of frames it takes to draw the whole image
+    EXPORT_MARGIN_FACTOR = 0.05
+    # The margin around the drawing as a fraction of the width and height of the video
+    EXPORT_BACKGROUND = (0, 0, 0)
+    EXPORT_PATH_COLOUR = (0, 255, 255)
+    EXPORT_VECTOR_COLOUR = (255, 255, 255)
+    EXPORT_PATH_WIDTH = 2
+    # The width of the path in pixels
+    EXPORT_VEC_DISPLAY_THRESHOLD = 10
+    # The vectors are only drawn if the image has fewer paths than this
+    EXPORT_WORKERS = 4
+    # The number of worker processes that render frames
+    EXPORT_CHUNK_FRAMES = 16
+    # The number of frames each worker renders at a time
@@ -0,0 +1,242 @@
+"""
+Standard Library
+"""
+import os
+import sys
+import asyncio
+import argparse
+import subprocess
+import multiprocessing
+from time import time
+from concurrent.futures import ProcessPoolExecutor
+
+"""
+Third Party
+"""
+import numpy as np
+
+"""
+My modules
+"""
+from coeff import Coefficient_calculator, get_sets_of_coeffs
+from svg import SVG
+from bezier import PolyBezier
+from utils import *
+from config import Config
+from raster import Vectorizer
+from tracer import get_traces
+from simplify import simplify
+from merger import merge
+
+
+"""
+Renders the animation of an image to a video without a display.
+Frames are drawn into NumPy buffers by worker processes, and the raw RGB frames are piped to ffmpeg.
+
+Usage:
+    python export.py "path to an image file" [-o output.mp4]
+    python export.py "path to a directory of images" [-o output directory]
+"""
+
+
+def get_sets_coeffs(file_path: str, num: int, executor=None) -> list:
+    """
+    This function converts the image to an SVG image if needed, parses it and computes a set of coefficients for each
+    path
+    @param file_path: The path to an image file
+    @param num: The number of vectors
+    @param executor: A process pool used to compute the coefficients, or None
+    @return: A tuple of the list of sets of coefficients and the xlim and ylim of the image
+    """
+    if get_extension(file_path) != "svg":
+        data = asyncio.run(Vectorizer(1, Config.CONVERSION_TIMEOUT).convert(file_path))
+    else:
+        data = get_file_content(file_path)
+    polys = merge(simplify(SVG(data).parse_polybeziers()))
+    if len(polys) == 0:
+        raise SyntaxError("The image has no paths")
+    calcs = [Coefficient_calculator(poly, num, Config.BY_DIST) for poly in polys]
+    lims = PolyBezier.get_total_lims(polys)
+    return get_sets_of_coeffs(calcs, lims, executor, Config.CHUNK_SEGMENTS), lims
+
+
+def get_endpoints(sets_of_coeffs: list, num_frame: int) -> np.ndarray:
+    """
+    This function computes the end point of every vector of every set in every frame as one array.
+    The end point of a vector is the sum of it and all vectors before it.
+    @param sets_of_coeffs: A list of dictionaries of coefficients
+    @param num_frame: The number of frames
+    @return: A (num_frame x number of sets x number of vectors + 1) complex array, starting with the origin
+    """
+    num = max(len(coeffs) for coeffs in sets_of_coeffs)
+    ns = np.array(get_frequencies(num))
+    values = np.zeros((len(sets_of_coeffs), num), dtype=np.complex128)
+    for row, coeffs in enumerate(sets_of_coeffs):
+        pairs = np.array(list(coeffs.values()), dtype=np.float64).reshape(-1, 2)
+        values[row, :len(pairs)] = pairs[:, 0] + 1j * pairs[:, 1]
+    ts = np.arange(num_frame) / num_frame
+    vectors = np.exp(2j * np.pi * ts[:, None, None] * ns) * values
+    # The value of each vector in each frame
+    endpoints = np.zeros((num_frame, len(sets_of_coeffs), num + 1), dtype=np.complex128)
+    np.cumsum(vectors, axis=2, out=endpoints[:, :, 1:])
+    return endpoints
+
+
+def get_transform(xlim: tuple, ylim: tuple, size: tuple):
+    """
+    This function gets the scale and offset that map the coordinates of the image to the pixels of the video,
+    fitting the drawing in the middle of the video with a margin. The y axis is flipped, as rows go downwards.
+    @param xlim: The minimum and maximum x values
+    @param ylim: The minimum and maximum y values
+    @param size: The width and height of the video
+    @return: A tuple of the scale and the offset. A point z is drawn at scale * conj(z) + offset.
+    """
+    width, height = size
+    x_range = max(xlim[1] - xlim[0], 1e-9)
+    y_range = max(ylim[1] - ylim[0], 1e-9)
+    scale = min(width / x_range, height / y_range) * (1 - 2 * Config.EXPORT_MARGIN_FACTOR)
+    centre = complex((xlim[0] + xlim[1]) / 2, -(ylim[0] + ylim[1]) / 2)
+    offset = complex(width / 2, height / 2) - scale * centre
+    return scale, offset
+
+
+def draw_segments(buffer: np.ndarray, starts: np.ndarray, ends: np.ndarray, colour: tuple, width: int = 1):
+    """
+    This function draws straight lines on the frame by sampling points along every line at once
+    @param buffer: The frame as a (height x width x 3) array
+    @param starts: The start points of the lines in pixels, as complex numbers of column and row
+    @param ends: The end points of the lines in pixels
+    @param colour: The RGB colour of the lines
+    @param width: The width of the lines in pixels
+    """
+    height, buffer_width = buffer.shape[:2]
+    lengths = np.abs(ends - starts)
+    counts = np.minimum(np.ceil(lengths * 2), 2 * (height + buffer_width)).astype(np.int64) + 1
+    # Two points are sampled for each pixel of the length, so that the lines have no gaps
+    index = np.repeat(np.arange(len(starts)), counts)
+    steps = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    points = starts[index] + (ends - starts)[index] * (steps / np.maximum(counts - 1, 1)[index])
+    columns = np.rint(points.real).astype(np.int64)
+    rows = np.rint(points.imag).astype(np.int64)
+    for dx in range(-(width // 2), width - width // 2):
+        for dy in range(-(width // 2), width - width // 2):
+            x, y = columns + dx, rows + dy
+            inside = (x >= 0) & (x < buffer_width) & (y >= 0) & (y < height)
+            buffer[y[inside], x[inside]] = colour
+
+
+def render_frames(start: int, stop: int, tips: np.ndarray, endpoints, size: tuple) -> bytes:
+    """
+    This function renders a range of frames. The path drawn before the first frame is drawn at once, and then one
+    line is added to the path for each frame. The vectors are drawn on a copy of the path, as they change every frame.
+    @param start: The index of the first frame
+    @param stop: The index after the last frame
+    @param tips: A (num_frame x number of sets) complex array of the tip of the pen of each set in pixels
+    @param endpoints: A (stop - start x number of sets x number of vectors + 1) complex array of the end points of the
+    vectors in pixels, or None if the vectors are not drawn
+    @param size: The width and height of the video
+    @return: The raw RGB frames as bytes
+    """
+    width, height = size
+    path = np.empty((height, width, 3), dtype=np.uint8)
+    path[:] = Config.EXPORT_BACKGROUND
+    if start > 1:
+        draw_segments(path, tips[:start - 1].ravel(), tips[1:start].ravel(), Config.EXPORT_PATH_COLOUR,
+                      Config.EXPORT_PATH_WIDTH)
+    frames = []
+    for frame in range(start, stop):
+        if frame > 0:
+            draw_segments(path, tips[frame - 1], tips[frame], Config.EXPORT_PATH_COLOUR, Config.EXPORT_PATH_WIDTH)
+        if endpoints is None:
+            frames.append(path.tobytes())
+            continue
+        image = path.copy()
+        points = endpoints[frame - start]
+        draw_segments(image, points[:, :-1].ravel(), points[:, 1:].ravel(), Config.EXPORT_VECTOR_COLOUR)
+        frames.append(image.tobytes())
+    return b"".join(frames)
+
+
+def export(file_path: str, output: str, executor, num_frame: int = Config.EXPORT_NUM_FRAME,
+           size: tuple = Config.EXPORT_SIZE, fps: int = Config.EXPORT_FPS, num: int = Config.NUM_VECTORS):
+    """
+    This function renders the animation of an image to a video file
+    @param file_path: The path to an image file
+    @param output: The path of the video file
+    @param executor: The process pool that computes the coefficients and renders the frames
+    @param num_frame: The number of frames
+    @param size: The width and height of the video
+    @param fps: The number of frames per second
+    @param num: The number of vectors
+    """
+    sets_of_coeffs, (xlim, ylim) = get_sets_coeffs(file_path, num, executor)
+    scale, offset = get_transform(xlim, ylim, size)
+    tips = np.conj(get_traces(sets_of_coeffs, num_frame).T) * scale + offset
+    # The tip of the pen of every set in every frame, computed with an inverse FFT
+    endpoints = None
+    if len(sets_of_coeffs) < Config.EXPORT_VEC_DISPLAY_THRESHOLD:
+        endpoints = np.conj(get_endpoints(sets_of_coeffs, num_frame)) * scale + offset
+    command = ["ffmpeg", "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{size[0]}x{size[1]}",
+               "-r", str(fps), "-i", "-", "-c:v", "libx264", "-pix_fmt", "yuv420p", output]
+    ffmpeg = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    starts = range(0, num_frame, Config.EXPORT_CHUNK_FRAMES)
+    stops = [min(start + Config.EXPORT_CHUNK_FRAMES, num_frame) for start in starts]
+    chunks = [endpoints[start:stop] if endpoints is not None else None for start, stop in zip(starts, stops)]
+    try:
+        for frames in executor.map(render_frames, starts, stops, [tips] * len(stops), chunks, [size] * len(stops)):
+            ffmpeg.stdin.write(frames)
+            # The chunks are written in order, while the workers render the following chunks
+        ffmpeg.stdin.close()
+    except BrokenPipeError:
+        pass
+        # ffmpeg has exited, and its error is reported below
+    if ffmpeg.wait() != 0:
+        raise Exception(f"ffmpeg exited with code {ffmpeg.returncode}: {ffmpeg.stderr.read().decode(errors='replace').strip()}")
+
+
+def get_jobs(path: str, output: str) -> list:
+    """
+    This function lists the images to export and the paths of their videos. If the path is a directory, every image
+    in it is exported to the output directory.
+    @param path: The path to an image file or a directory
+    @param output: The path of the video file or the output directory
+    @return: A list of tuples of the path to an image and the path to its video
+    """
+    if not os.path.isdir(path):
+        return [(path, output or get_output_name())]
+    output = output or os.path.join(path, Config.EXPORT_PATH)
+    os.makedirs(output, exist_ok=True)
+    names = sorted(name for name in os.listdir(path) if get_extension(name).lower() in Config.ACCEPTABLE_EXTENSIONS)
+    return [(os.path.join(path, name), os.path.join(output, name + ".mp4")) for name in names]
+    # The extension is kept in the name of the video, as an image and its SVG version often share a name
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the Fourier drawing of images to videos without a display")
+    parser.add_argument("path", help="An image file, or a directory of images to export in bulk")
+    parser.add_argument("-o", "--output", help="The video file, or the output directory for a directory of images")
+    parser.add_argument("--frames", type=int, default=Config.EXPORT_NUM_FRAME)
+    parser.add_argument("--fps", type=int, default=Config.EXPORT_FPS)
+    parser.add_argument("--size", default="x".join(map(str, Config.EXPORT_SIZE)), help="WIDTHxHEIGHT")
+    parser.add_argument("--vectors", type=int, default=Config.NUM_VECTORS)
+    parser.add_argument("--workers", type=int, default=Config.EXPORT_WORKERS)
+    args = parser.parse_args()
+    size = tuple(int(value) for value in args.size.lower().split("x"))
+    failed = 0
+    with ProcessPoolExecutor(max(args.workers, 1), mp_context=multiprocessing.get_context("spawn")) as executor:
+        # The same worker processes are used for every image. They are spawned rather than forked, as forked workers
+        # would inherit the stdin of ffmpeg and it would never see the end of the frames.
+        for file_path, output in get_jobs(args.path, args.output):
+            initial = time()
+            try:
+                export(file_path, output, executor, args.frames, size, args.fps, args.vectors)
+            except Exception as e:
+                failed += 1
+                print(f"{file_path}: {e}", file=sys.stderr)
+                continue
+            print(f"{file_path} -> {output} ({time() - initial:.1f}s)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+import asyncio
+import sqlite3
+import threading
+from time import time
+from uuid import uuid4
+
+
+RECOVERED = "FOURIER_JOBS_RECOVERED"
+# The environment variable set by a launcher that has already called JobStore.recover before starting several server
+# processes, so that none of them queues again a job another one is running
+
+
+class QueueFullError(Exception):
+
+    """
+    Raised when a job is submitted while the queue already holds its maximum number of jobs
+    """
+
+
+class JobStore:
+
+    """
+    Keeps jobs in an SQLite database, so that they survive restarts. The content of the uploaded file is kept until the
+    job has finished, so that a job that was queued or running when the server stopped can be run again.
+    The database can be shared by several server processes. A job is claimed, and the pending jobs are counted before a
+    job is added, in a transaction that holds the write lock of the database, so no job runs twice and the limit on
+    pending jobs holds across the processes.
+    """
+
+    FIELDS = ("id", "filename", "state", "stage", "done", "total", "error", "created", "updated")
+    # The columns returned as the status of a job
+    COUNT_PENDING = "SELECT COUNT(*) FROM jobs WHERE state IN ('queued', 'running')"
+
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        # The connection is shared by the threads of the server, and self.lock makes them use it one at a time.
+        # Each statement is committed on its own unless it runs in a transaction started by _transaction.
+        self.lock = threading.Lock()
+        self._execute("PRAGMA journal_mode=WAL")
+        # Readers in other processes are not blocked while a job is updated
+        self._execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                state TEXT NOT NULL,
+                stage TEXT,
+                done INTEGER NOT NULL DEFAULT 0,
+                total INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL,
+                content BLOB,
+                result TEXT
+            )""")
+        self._execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created)")
+
+    def create(self, filename: str, content: bytes, result: str = None, max_pending: int = None):
+        """
+        This function adds a job
+        @param filename: The name of the uploaded file
+        @param content: The content of the uploaded file
+        @param result: The drawing data if it's already known, in which case the job is created as done
+        @param max_pending: If it's given, the job is only added if fewer jobs than this have not finished
+        @return: The id of the job, or None if there were already max_pending jobs that had not finished
+        """
+        job_id = uuid4().hex
+        now = time()
+        if result is None:
+            row = (job_id, filename, "queued", None, content, None, now, now)
+        else:
+            row = (job_id, filename, "done", "done", None, result, now, now)
+
+        def insert(connection):
+            if max_pending is not None and connection.execute(self.COUNT_PENDING).fetchone()[0] >= max_pending:
+                return None
+            connection.execute(
+                "INSERT INTO jobs (id, filename, state, stage, content, result, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row)
+            return job_id
+        return self._transaction(insert)
+
+    def get(self, job_id: str):
+        """
+        This function gets the status of a job
+        @param job_id: The id of the job
+        @return: A dictionary of the status, or None if the job does not exist
+        """
+        row = self._execute(f"SELECT {', '.join(self.FIELDS)} FROM jobs WHERE id = ?", (job_id,))
+        return None if row is None else dict(zip(self.FIELDS, row))
+
+    def get_column(self, job_id: str, column: str):
+        """
+        This function gets the content or the result of a job
+        @param job_id: The id of the job
+        @param column: "content" or "result"
+        @return: The value, or None if the job does not exist
+        """
+        if column not in ("content", "result"):
+            raise ValueError(f"Unknown column {column}")
+        row = self._execute(f"SELECT {column} FROM jobs WHERE id = ?", (job_id,))
+        return None if row is None else row[0]
+
+    def update(self, job_id: str, **fields):
+        """
+        This function changes the state, the stage, the progress, the error or the result of a job
+        @param job_id: The id of the job
+        @param fields: The new values, keyed by column
+        """
+        fields["updated"] = time()
+        columns = ", ".join(f"{column} = ?" for column in fields)
+        self._execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def claim(self):
+        """
+        This function marks the oldest queued job as running and returns it
+        @return: A tuple of the id, the filename and the content of the job, or None if no job is queued
+        """
+        def claim(connection):
+            job = connection.execute(
+                "SELECT id, filename, content FROM jobs WHERE state = 'queued' ORDER BY created LIMIT 1").fetchone()
+            if job is not None:
+                connection.execute("UPDATE jobs SET state = 'running', updated = ? WHERE id = ?", (time(), job[0]))
+            return job
+        return self._transaction(claim)
+
+    def recover(self):
+        """
+        This function queues the jobs that were running when the server stopped, so that they are run again. It has to
+        be called before any server process starts running jobs.
+        """
+        self._execute("UPDATE jobs SET state = 'queued', stage = NULL, done = 0, total = 0 WHERE state = 'running'")
+
+    def count_pending(self) -> int:
+        """
+        This function counts the jobs that have not finished
+        @return: The number of jobs
+        """
+        return self._execute(self.COUNT_PENDING)[0]
+
+    def _execute(self, statement: str, parameters: tuple = (), fetch_all: bool = False):
+        """
+        This function runs an SQL statement and commits it
+        @param statement: The SQL statement
+        @param parameters: The values of the placeholders in the statement
+        @param fetch_all: If this is true, every row is returned instead of the first one
+        @return: The first row or a list of the rows
+        """
+        with self.lock:
+            rows = self.connection.execute(statement, parameters).fetchall()
+            # Every row is fetched, so that the statement has finished and released the database
+        return rows if fetch_all else next(iter(rows), None)
+
+    def _transaction(self, function):
+        """
+        This function runs SQL statements in a transaction that takes the write lock of the database before its first
+        statement, so that no other process changes the jobs between them. The transaction is rolled back if the
+        function raises an exception.
+        @param function: A function that runs the statements on the connection it's given and returns a value
+        @return: The value returned by function
+        """
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                value = function(self.connection)
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+        return value
+
+
+class JobQueue:
+
+    """
+    Runs jobs in the background with a fixed number of worker tasks. At most max_pending jobs can be queued or running
+    at the same time, and submitting another one raises a QueueFullError, so that a burst of uploads is turned away
+    instead of piling up.
+    The workers take jobs from the store, so a job submitted to one server process can be run by another. A worker
+    waits poll_seconds for a job before looking again, unless a job is submitted to its own process.
+    """
+
+    def __init__(self, store: JobStore, handler, num_workers: int, max_pending: int, poll_seconds: float = 1.0):
+        self.store = store
+        self.handler = handler
+        # The coroutine function that runs a job. It's called with the id, the filename, the content and a coroutine
+        # function that reports the progress, and returns the result as a string.
+        self.num_workers = num_workers
+        self.max_pending = max_pending
+        self.poll_seconds = poll_seconds
+        self.submitted = None
+        # Set when a job is submitted to this process, so that the workers look for it straight away
+        self.workers = []
+
+    def start(self):
+        """
+        This function starts the workers. It has to be called from a running event loop.
+        """
+        self.submitted = asyncio.Event()
+        self.workers = [asyncio.create_task(self._work()) for _ in range(self.num_workers)]
+
+    async def stop(self):
+        """
+        This function stops the workers. A running job is left as running and is run again once JobStore.recover is
+        called.
+        """
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def submit(self, filename: str, content: bytes) -> str:
+        """
+        This function adds a job to the queue
+        @param filename: The name of the uploaded file
+        @param content: The content of the uploaded file
+        @return: The id of the job
+        """
+        job_id = self.store.create(filename, content, max_pending=self.max_pending)
+        # The jobs are counted in the same transaction as the job is added, so that another server process cannot
+        # add one in between
+        if job_id is None:
+            raise QueueFullError(f"There are already {self.max_pending} jobs waiting")
+        self.submitted.set()
+        return job_id
+
+    async def _work(self):
+        """
+        This function runs the queued jobs one at a time, recording the result or the error of each
+        """
+        while True:
+            self.submitted.clear()
+            job = await asyncio.to_thread(self.store.claim)
+            if job is None:
+                try:
+                    await asyncio.wait_for(self.submitted.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            job_id, filename, content = job
+
+            async def progress(stage: str, done: int = 0, total: int = 0):
+                await asyncio.to_thread(self.store.update, job_id, stage=stage, done=done, total=total)
+                # The database may be locked by another server process, so it's written from a thread, so that the
+                # event loop is not blocked
+
+            try:
+                result = await self.handler(job_id, filename, content, progress)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = getattr(e, "detail", None) or str(e) or type(e).__name__
+                # HTTPException keeps its message in detail
+                await asyncio.to_thread(self.store.update, job_id, state="failed", error=str(error), content=None)
+            else:
+                await asyncio.to_thread(self.store.update, job_id, state="done", stage="done", result=result,
+                                        content=None)
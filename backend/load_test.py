@@ -0,0 +1,135 @@
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+from uuid import uuid4
+from time import perf_counter, sleep
+from statistics import median
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+
+
+"""
+Measures how the throughput of the server scales with the number of server processes. For each number, serve.py is
+started in a temporary directory, so that it has an empty result cache, and the same SVG image is uploaded many times
+at once. A comment with a different number is added to each upload, so that every request is a cache miss and is
+computed in full.
+
+Usage:
+    python load_test.py [--workers 1 2 4] [--requests 40] [--concurrency 8] [--image example_pictures/einstein.svg]
+"""
+
+
+def encode_multipart(filename: str, content: bytes):
+    """
+    This function encodes a file as the body of a multipart/form-data request with a single field named file
+    @param filename: The name of the file
+    @param content: The content of the file
+    @return: A tuple of the body and the Content-Type header
+    """
+    boundary = uuid4().hex
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: application/octet-stream\r\n\r\n").encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def post_image(url: str, filename: str, content: bytes) -> float:
+    """
+    This function uploads an image to the /image endpoint and waits for the drawing data
+    @param url: The base URL of the server
+    @param filename: The name of the image
+    @param content: The content of the image
+    @return: The time the request took, in seconds
+    """
+    body, content_type = encode_multipart(filename, content)
+    request = urllib.request.Request(f"{url}/image", body, {"Content-Type": content_type}, method="POST")
+    initial = perf_counter()
+    with urllib.request.urlopen(request, timeout=600) as response:
+        response.read()
+    return perf_counter() - initial
+
+
+def wait_until_ready(url: str, process, timeout: float):
+    """
+    This function waits until the server answers requests
+    @param url: The base URL of the server
+    @param process: The process of the server
+    @param timeout: The number of seconds to wait
+    """
+    deadline = perf_counter() + timeout
+    while perf_counter() < deadline:
+        if process.poll() is not None:
+            raise Exception(f"The server exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"{url}/cache", timeout=1):
+                return
+        except OSError:
+            sleep(0.2)
+    raise Exception(f"The server did not start within {timeout} seconds")
+
+
+def run(workers: int, port: int, filename: str, content: bytes, num_requests: int, concurrency: int) -> dict:
+    """
+    This function starts the server with a number of server processes and sends it the requests
+    @param workers: The number of server processes
+    @param port: The port the server listens on
+    @param filename: The name of the image
+    @param content: The content of the image
+    @param num_requests: The number of requests
+    @param concurrency: The number of requests sent at the same time
+    @return: A dictionary of the throughput and the latencies
+    """
+    url = f"http://127.0.0.1:{port}"
+    serve = os.path.join(os.path.dirname(os.path.abspath(__file__)), "serve.py")
+    with tempfile.TemporaryDirectory() as directory:
+        process = subprocess.Popen([sys.executable, serve, "--workers", str(workers), "--port", str(port)],
+                                   cwd=directory, stdout=subprocess.DEVNULL)
+        try:
+            wait_until_ready(url, process, 60)
+            uploads = [content + f"\n<!-- {uuid4().hex} -->\n".encode() for _ in range(num_requests)]
+            # Each upload has a different hash, so none of them is a cache hit
+            initial = perf_counter()
+            with ThreadPoolExecutor(concurrency) as pool:
+                latencies = sorted(pool.map(lambda upload: post_image(url, filename, upload), uploads))
+            seconds = perf_counter() - initial
+        finally:
+            process.terminate()
+            process.wait()
+    return {
+        "workers": workers,
+        "seconds": seconds,
+        "per_second": num_requests / seconds,
+        "median": median(latencies),
+        "p95": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the throughput of the server for numbers of processes")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--image", default="example_pictures/einstein.svg", help="An SVG image")
+    parser.add_argument("--port", type=int, default=Config.PORT + 100)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+    with open(args.image, "rb") as f:
+        content = f.read()
+    results = [run(workers, args.port, os.path.basename(args.image), content, args.requests, args.concurrency)
+               for workers in args.workers]
+    if args.json:
+        print(json.dumps(results, indent=1))
+        return
+    print(f"{os.cpu_count()} cores, {args.requests} requests, {args.concurrency} at a time")
+    for result in results:
+        speedup = result["per_second"] / results[0]["per_second"]
+        print(f"{result['workers']:>3} workers: {result['per_second']:7.2f} requests/s ({speedup:.2f}x), "
+              f"median {result['median'] * 1000:8.1f} ms, p95 {result['p95'] * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+from math import hypot
+
+import numpy as np
+
+from bezier import PolyBezier
+from config import Config
+
+
+class Merger:
+
+    """
+    Joins the subpaths of a drawing into a given number of closed tours, so that the drawing needs that many sets of
+    vectors instead of one set for each subpath.
+    The subpaths are ordered by a nearest neighbour tour, which is improved with 2-opt. A closed subpath can be
+    entered at the start of any of its curves, and an open subpath can be drawn in either direction. The tour is cut
+    at its longest jumps, and consecutive subpaths of each tour are joined by linear Bezier curves.
+    """
+
+    MAX_PASSES = 20
+    # The maximum number of passes of 2-opt over the tour
+    CLOSED_TOLERANCE = 1e-6
+    # A subpath is closed if its end is this close to its start, relative to the diagonal of the drawing
+
+    def __init__(self, paths: list, num_set: int):
+        self.polys = [path if isinstance(path, PolyBezier) else PolyBezier(path) for path in paths]
+        # The subpaths, which can be PolyBeziers or lists of Bezier curve objects
+        self.num_set = num_set
+        # The number of tours
+        self.bridge_length = 0.0
+        # The total length of the linear Bezier curves added to join the subpaths
+
+    def main(self) -> list:
+        """
+        This function joins the subpaths into tours
+        @return: A list of num_set PolyBezier objects, or the subpaths as they are if there are not more of them
+        """
+        if self.num_set <= 0 or len(self.polys) <= self.num_set:
+            return self.polys
+        xlim, ylim = PolyBezier.get_total_lims(self.polys)
+        self.tolerance = self.CLOSED_TOLERANCE * hypot(xlim[1] - xlim[0], ylim[1] - ylim[0])
+        self.starts = [poly.points[:, 0] for poly in self.polys]
+        self.ends = [np.where(poly.degrees == 3, poly.points[:, 3], poly.points[:, 1]) for poly in self.polys]
+        self.closed = np.array([abs(ends[-1] - starts[0]) <= self.tolerance
+                                for starts, ends in zip(self.starts, self.ends)])
+        order, entries, reverse = self._get_nearest_neighbour_tour()
+        order, entries, reverse = self._improve(order, entries, reverse)
+        order, entries, reverse, bounds = self._cut(order, entries, reverse)
+        return [self._join(order[start:stop], entries[start:stop], reverse[start:stop])
+                for start, stop in zip(bounds[:-1], bounds[1:])]
+
+    def _get_point(self, path: int, entry: int, reverse: bool, end: bool) -> complex:
+        """
+        This function gets the point where a subpath is entered or left
+        @param path: The index of the subpath
+        @param entry: The index of the curve the subpath is entered at, which is only used for closed subpaths
+        @param reverse: If the subpath is drawn backwards
+        @param end: If this is true, the point where the subpath is left is returned
+        @return: The point
+        """
+        if self.closed[path]:
+            return complex(self.starts[path][entry])
+            # A closed subpath is left where it is entered
+        if reverse != end:
+            return complex(self.ends[path][-1])
+        return complex(self.starts[path][0])
+
+    def _get_nearest_neighbour_tour(self):
+        """
+        This function creates a tour starting from the first subpath, going to the nearest point where an unvisited
+        subpath can be entered each time
+        @return: A tuple of the order of the subpaths, the curve each one is entered at, and if each one is reversed
+        """
+        candidates = []
+        owners = []
+        entries = []
+        reverses = []
+        # Every point a subpath can be entered at, with the subpath, the curve and the direction it is entered in
+        for path, (starts, ends) in enumerate(zip(self.starts, self.ends)):
+            if self.closed[path]:
+                candidates.append(starts)
+                owners.append(np.full(len(starts), path))
+                entries.append(np.arange(len(starts)))
+                reverses.append(np.zeros(len(starts), dtype=bool))
+            else:
+                candidates.append([starts[0], ends[-1]])
+                owners.append([path, path])
+                entries.append([0, 0])
+                reverses.append([False, True])
+        candidates = np.concatenate(candidates)
+        owners = np.concatenate(owners)
+        entries = np.concatenate(entries)
+        reverses = np.concatenate(reverses)
+        visited = np.zeros(len(self.polys), dtype=bool)
+        order, tour_entries, tour_reverse = [0], [0], [False]
+        visited[0] = True
+        point = self._get_point(0, 0, False, True)
+        for _ in range(len(self.polys) - 1):
+            distances = np.where(visited[owners], np.inf, np.abs(candidates - point))
+            best = int(np.argmin(distances))
+            path = int(owners[best])
+            visited[path] = True
+            order.append(path)
+            tour_entries.append(int(entries[best]))
+            tour_reverse.append(bool(reverses[best]))
+            point = self._get_point(path, tour_entries[-1], tour_reverse[-1], True)
+        return order, tour_entries, tour_reverse
+
+    def _improve(self, order: list, entries: list, reverse: list):
+        """
+        This function shortens the jumps of the closed tour with 2-opt. Reversing a part of the tour also reverses the
+        direction of each subpath in it, so that the subpaths are entered where they were left before.
+        @param order: The order of the subpaths
+        @param entries: The curve each subpath is entered at
+        @param reverse: If each subpath is reversed
+        @return: A tuple of the improved order, entries and directions
+        """
+        num = len(order)
+        order, entries, reverse = np.array(order), np.array(entries), np.array(reverse)
+        for _ in range(self.MAX_PASSES):
+            improved = False
+            heads = np.array([self._get_point(p, e, r, False) for p, e, r in zip(order, entries, reverse)])
+            tails = np.array([self._get_point(p, e, r, True) for p, e, r in zip(order, entries, reverse)])
+            # The points where each subpath of the tour is entered and left
+            for i in range(1, num):
+                j = np.arange(i, num)
+                following = np.append(heads, heads[0])[j + 1]
+                # The head of the subpath after j, which is the first subpath for the last j
+                gain = (np.abs(tails[i - 1] - heads[i]) + np.abs(tails[j] - following)
+                        - np.abs(tails[i - 1] - tails[j]) - np.abs(heads[i] - following))
+                best = int(np.argmax(gain))
+                if gain[best] <= self.tolerance:
+                    continue
+                stop = int(j[best]) + 1
+                order[i:stop] = order[i:stop][::-1].copy()
+                entries[i:stop] = entries[i:stop][::-1].copy()
+                reverse[i:stop] = ~reverse[i:stop][::-1]
+                heads[i:stop], tails[i:stop] = tails[i:stop][::-1].copy(), heads[i:stop][::-1].copy()
+                improved = True
+            if not improved:
+                break
+        return order.tolist(), entries.tolist(), reverse.tolist()
+
+    def _cut(self, order: list, entries: list, reverse: list):
+        """
+        This function cuts the closed tour at its num_set longest jumps
+        @param order: The order of the subpaths
+        @param entries: The curve each subpath is entered at
+        @param reverse: If each subpath is reversed
+        @return: A tuple of the order, entries and directions, rotated so that a tour starts at the first subpath, and
+        the index in the order where each tour starts, followed by the length of the order
+        """
+        num = len(order)
+        tails = np.array([self._get_point(p, e, r, True) for p, e, r in zip(order, entries, reverse)])
+        heads = np.array([self._get_point(p, e, r, False) for p, e, r in zip(order, entries, reverse)])
+        jumps = np.abs(np.roll(heads, -1) - tails)
+        # The jump after each subpath, with the last one going back to the first subpath
+        cuts = (np.sort(np.argsort(-jumps, kind="stable")[:self.num_set]) + 1) % num
+        # The index of the subpath after each of the longest jumps, where a tour starts
+        offset = int(cuts[-1]) if cuts[0] != 0 else 0
+        bounds = sorted((int(cut) - offset) % num for cut in cuts) + [num]
+        # The tour that wraps around the end of the order is rotated to the start
+        order = order[offset:] + order[:offset]
+        entries = entries[offset:] + entries[:offset]
+        reverse = reverse[offset:] + reverse[:offset]
+        return order, entries, reverse, bounds
+
+    def _join(self, order: list, entries: list, reverse: list):
+        """
+        This function joins subpaths into one closed tour, adding a linear Bezier curve wherever one subpath does not
+        end where the next starts
+        @param order: The order of the subpaths
+        @param entries: The curve each subpath is entered at
+        @param reverse: If each subpath is reversed
+        @return: A PolyBezier object
+        """
+        points = []
+        degrees = []
+        for path, entry, backwards in zip(order, entries, reverse):
+            poly = self.polys[path]
+            path_points = poly.points
+            path_degrees = poly.degrees
+            if self.closed[path] and abs(self.ends[path][-1] - self.starts[path][0]) > 0:
+                path_points = np.vstack((path_points, [[self.ends[path][-1], self.starts[path][0], 0, 0]]))
+                path_degrees = np.append(path_degrees, 1)
+                # A closed subpath that does not meet exactly is closed, so it can be entered at any curve
+            path_points = np.roll(path_points, -entry, axis=0)
+            path_degrees = np.roll(path_degrees, -entry)
+            if backwards:
+                path_points, path_degrees = self._reverse(path_points, path_degrees)
+            self._bridge(points, degrees, path_points[0, 0])
+            points.append(path_points)
+            degrees.append(path_degrees)
+        self._bridge(points, degrees, points[0][0, 0])
+        # The tour is closed, as the curve drawn by the vectors is periodic
+        return PolyBezier.from_arrays(np.concatenate(points), np.concatenate(degrees))
+
+    def _bridge(self, points: list, degrees: list, target: complex):
+        """
+        This function adds a linear Bezier curve from the end of the last curve to the target point, if they differ
+        @param points: A list of arrays of the points of the curves of the tour so far
+        @param degrees: A list of arrays of the degrees of the curves of the tour so far
+        @param target: The point the next curve starts at
+        """
+        if len(points) == 0:
+            return
+        last = points[-1][-1]
+        end = last[3] if degrees[-1][-1] == 3 else last[1]
+        if abs(target - end) > 0:
+            points.append(np.array([[end, target, 0, 0]]))
+            degrees.append(np.array([1], dtype=np.int8))
+            self.bridge_length += abs(target - end)
+
+    @staticmethod
+    def _reverse(points: np.ndarray, degrees: np.ndarray):
+        """
+        This function reverses the direction of a sequence of curves
+        @param points: A (num x 4) complex array of the points of the curves
+        @param degrees: An array of the degrees of the curves
+        @return: A tuple of the reversed points and degrees
+        """
+        reversed_points = points[::-1].copy()
+        reversed_degrees = degrees[::-1].copy()
+        cubic = reversed_degrees == 3
+        reversed_points[cubic] = reversed_points[cubic][:, ::-1]
+        reversed_points[~cubic, :2] = reversed_points[~cubic][:, 1::-1]
+        return reversed_points, reversed_degrees
+
+
+def get_settings() -> tuple:
+    """
+    This function gets the number of tours specified in the Config class, which changes the drawing data and so is part
+    of the key of a result in the result cache
+    @return: A tuple of the setting, which is empty if subpaths are not merged
+    """
+    if Config.NUM_TOURS <= 0:
+        return ()
+    return f"tours={Config.NUM_TOURS}",
+
+
+def merge(polys: list) -> list:
+    """
+    This function joins PolyBeziers into the number of tours specified in the Config class, if it's more than 0
+    @param polys: A list of PolyBezier objects
+    @return: A list of PolyBezier objects
+    """
+    if Config.NUM_TOURS <= 0:
+        return polys
+    return Merger(polys, Config.NUM_TOURS).main()
@@ -0,0 +1,177 @@
+from time import perf_counter
+from bisect import bisect_left
+from threading import Lock
+from contextvars import ContextVar
+
+import numpy as np
+
+from config import Config
+
+
+class Histogram:
+
+    """
+    Counts observed values in cumulative buckets, in the way Prometheus histograms do
+    """
+
+    def __init__(self, bounds: list):
+        self.bounds = list(bounds)
+        # The upper bounds of the buckets, in increasing order. The last bucket, +Inf, is implicit.
+        self.counts = [0] * (len(self.bounds) + 1)
+        # The number of values in each bucket, not cumulative
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """
+        This function adds a value to the histogram
+        @param value: The observed value
+        """
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def get_lines(self, name: str, labels: str) -> list:
+        """
+        This function formats the histogram in the Prometheus text format
+        @param name: The name of the metric
+        @param labels: The labels of the histogram, such as 'stage="parse_svg"'
+        @return: A list of lines
+        """
+        lines = []
+        total = 0
+        for bound, count in zip(self.bounds + ["+Inf"], self.counts):
+            total += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {total}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class Span:
+
+    """
+    Times a stage of the pipeline. It is used as a context manager, and the counts of what the stage handled can be
+    added to it while it runs.
+    """
+
+    def __init__(self, metrics, stage: str):
+        self.metrics = metrics
+        self.stage = stage
+        self.counts = {}
+        # The number of paths, segments, vectors and so on that the stage handled
+        self.start = None
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.record(self.stage, perf_counter() - self.start, self.counts)
+        return False
+
+    def count(self, **counts):
+        """
+        This function records counts of what the stage handled
+        @param counts: The counts, keyed by what is counted
+        """
+        self.counts.update(counts)
+
+    def count_polys(self, polys: list):
+        """
+        This function records the number of paths and the number of segments of each degree in a list of PolyBeziers
+        @param polys: A list of PolyBezier objects
+        """
+        degrees = np.concatenate([poly.degrees for poly in polys] + [np.zeros(0, np.int8)])
+        self.count(paths=len(polys), segments=len(degrees), cubic=int(np.count_nonzero(degrees == 3)),
+                   linear=int(np.count_nonzero(degrees == 1)))
+
+
+class Metrics:
+
+    """
+    Collects the duration and the counts of each stage of the image pipeline as histograms, and the durations of the
+    stages of the current request for the Server-Timing header.
+    """
+
+    PREFIX = "fourier"
+
+    def __init__(self, seconds_buckets: list, count_buckets: list):
+        self.seconds_buckets = seconds_buckets
+        self.count_buckets = count_buckets
+        self.seconds = {}
+        # The histogram of durations of each stage, keyed by the stage
+        self.counts = {}
+        # The histogram of each count of each stage, keyed by the stage and what is counted
+        self.lock = Lock()
+        # Stages can run in threads, such as the parse stage of a batch
+        self.timings = ContextVar("timings", default=None)
+        # The list of stages and durations of the current request
+
+    def span(self, stage: str) -> Span:
+        """
+        This function creates a span that times a stage
+        @param stage: The name of the stage
+        @return: A Span object
+        """
+        return Span(self, stage)
+
+    def record(self, stage: str, seconds: float, counts: dict):
+        """
+        This function adds the duration and the counts of a stage to the histograms, and to the timings of the current
+        request if there is one
+        @param stage: The name of the stage
+        @param seconds: The time the stage took
+        @param counts: The counts of what the stage handled
+        """
+        with self.lock:
+            if stage not in self.seconds:
+                self.seconds[stage] = Histogram(self.seconds_buckets)
+            self.seconds[stage].observe(seconds)
+            for item, value in counts.items():
+                if (stage, item) not in self.counts:
+                    self.counts[(stage, item)] = Histogram(self.count_buckets)
+                self.counts[(stage, item)].observe(value)
+        timings = self.timings.get()
+        if timings is not None:
+            timings.append((stage, seconds))
+
+    def start_request(self) -> list:
+        """
+        This function starts collecting the timings of a request. It has to be called in the context the request is
+        handled in.
+        @return: The list that the timings of the request are appended to
+        """
+        timings = []
+        self.timings.set(timings)
+        return timings
+
+    @staticmethod
+    def get_server_timing(timings: list) -> str:
+        """
+        This function formats the timings of a request as the value of a Server-Timing header
+        @param timings: A list of tuples of stages and durations in seconds
+        @return: The value of the header, with the durations in milliseconds
+        """
+        return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings)
+
+    def export(self) -> str:
+        """
+        This function formats every histogram in the Prometheus text format
+        @return: The metrics as a string
+        """
+        name = f"{self.PREFIX}_stage_seconds"
+        lines = [f"# HELP {name} The time each stage of the image pipeline took", f"# TYPE {name} histogram"]
+        with self.lock:
+            for stage, histogram in sorted(self.seconds.items()):
+                lines += histogram.get_lines(name, f'stage="{stage}"')
+            name = f"{self.PREFIX}_stage_items"
+            lines += [f"# HELP {name} The number of paths, segments and vectors each stage handled",
+                      f"# TYPE {name} histogram"]
+            for (stage, item), histogram in sorted(self.counts.items()):
+                lines += histogram.get_lines(name, f'stage="{stage}",item="{item}"')
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics(Config.METRICS_SECONDS_BUCKETS, Config.METRICS_COUNT_BUCKETS)
+# The metrics of this process
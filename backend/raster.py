@@ -0,0 +1,132 @@
+import os
+import asyncio
+from asyncio.subprocess import PIPE
+
+from utils import get_extension
+
+
+class ConversionError(Exception):
+
+    """
+    Raised when a raster image cannot be converted to an SVG image
+    """
+
+
+class Vectorizer:
+
+    """
+    Converts raster images to SVG images with ImageMagick and Potrace.
+    The image is read from a file or written to the stdin of convert, the PNM output of convert is piped straight into
+    potrace, and the SVG image is read from the stdout of potrace, so no temporary file is written. At most max_jobs
+    conversions run at the same time, and the others wait for a free slot without blocking the event loop.
+    """
+
+    def __init__(self, max_jobs: int, timeout: float):
+        self.max_jobs = max_jobs
+        # The number of conversions that can run in parallel
+        self.timeout = timeout
+        # The number of seconds a single conversion can take before it is killed
+        self.slots = asyncio.Semaphore(max_jobs)
+
+    async def convert(self, file_path: str) -> str:
+        """
+        This function converts the image on the input path to an SVG image
+        @param file_path: The path to a raster image
+        @return: The content of the SVG image as a string
+        """
+        return await self._convert(file_path, None, get_extension(file_path))
+
+    async def convert_content(self, content: bytes, extension: str) -> str:
+        """
+        This function converts a raster image held in memory to an SVG image. The image is written to the stdin of
+        convert, or of potrace for a PNM image, so it's never saved to a file.
+        @param content: The content of a raster image
+        @param extension: The extension of the image, which tells convert its format
+        @return: The content of the SVG image as a string
+        """
+        return await self._convert("-", content, extension)
+
+    async def _convert(self, source: str, content, extension: str) -> str:
+        """
+        This function runs a conversion once a slot is free, killing it if it takes longer than the timeout
+        @param source: The path to a raster image, or "-" if the image is given as content
+        @param content: The content of the image, or None if it's read from source
+        @param extension: The extension of the image
+        @return: The content of the SVG image as a string
+        """
+        async with self.slots:
+            processes = []
+            try:
+                return await asyncio.wait_for(self._run(source, content, extension, processes), self.timeout)
+            except asyncio.TimeoutError:
+                raise ConversionError(f"The conversion took longer than {self.timeout} seconds")
+            finally:
+                for process in processes:
+                    if process.returncode is None:
+                        process.kill()
+                        await process.wait()
+                # Any process still running after a timeout or an error is killed
+
+    async def _run(self, source: str, content, extension: str, processes: list) -> str:
+        """
+        This function runs convert and potrace, connecting the stdout of convert to the stdin of potrace
+        @param source: The path to a raster image, or "-" if the image is given as content
+        @param content: The content of the image, or None if it's read from source
+        @param extension: The extension of the image
+        @param processes: A list to which the started processes are appended, so that they can be killed
+        @return: The content of the SVG image as a string
+        """
+        potrace_command = ["potrace", "--flat", "-s", "-o", "-"]
+        stdin = None if content is None else PIPE
+        if extension == "pnm":
+            potrace = await self._start("potrace", *potrace_command, source, stdin=stdin, stdout=PIPE, stderr=PIPE)
+            processes.append(potrace)
+            svg, error = await potrace.communicate(content)
+            self._check("potrace", potrace, error)
+            return svg.decode()
+        if content is not None:
+            source = f"{extension}:-"
+            # The format is given with the stdin, as convert cannot tell it from a file name
+        read_fd, write_fd = os.pipe()
+        try:
+            convert = await self._start(
+                "convert", "convert", source, "-background", "white", "-alpha", "remove", "-alpha", "off", "pnm:-",
+                stdin=stdin, stdout=write_fd, stderr=PIPE)
+            processes.append(convert)
+            potrace = await self._start("potrace", *potrace_command, "-", stdin=read_fd, stdout=PIPE, stderr=PIPE)
+            processes.append(potrace)
+        finally:
+            os.close(read_fd)
+            os.close(write_fd)
+            # The pipe is only held by the two processes, so potrace sees the end of the file when convert exits
+        (_, convert_error), (svg, potrace_error) = await asyncio.gather(convert.communicate(content),
+                                                                        potrace.communicate())
+        self._check("convert", convert, convert_error)
+        self._check("potrace", potrace, potrace_error)
+        return svg.decode()
+
+    @staticmethod
+    async def _start(name: str, *command, **kwargs):
+        """
+        This function starts a process, raising a ConversionError if it cannot be started, such as when the command is
+        not installed
+        @param name: The name of the command
+        @param command: The command and its arguments
+        @param kwargs: The keyword arguments of asyncio.create_subprocess_exec
+        @return: The started process
+        """
+        try:
+            return await asyncio.create_subprocess_exec(*command, **kwargs)
+        except OSError as e:
+            raise ConversionError(f"{name} could not be started: {e.strerror or e}")
+
+    @staticmethod
+    def _check(name: str, process, error: bytes):
+        """
+        This function raises a ConversionError if the process did not exit successfully
+        @param name: The name of the command
+        @param process: The finished process
+        @param error: The stderr of the process
+        """
+        if process.returncode != 0:
+            raise ConversionError(f"{name} exited with code {process.returncode}: {error.decode(errors='replace').strip()}")
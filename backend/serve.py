@@ -0,0 +1,36 @@
+import os
+import argparse
+
+import uvicorn
+
+from config import Config
+from jobs import JobStore, RECOVERED
+
+
+"""
+Runs the server for production with several server processes, each with its own event loop and worker processes.
+They share the result cache, the drawing store and the job database on disk, so a drawing processed by one of them can
+be fetched from the cache, extended and traced by any other.
+
+Usage:
+    python serve.py [--workers 4] [--host 0.0.0.0] [--port 3000]
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the server with several processes")
+    parser.add_argument("--host", default=Config.HOST)
+    parser.add_argument("--port", type=int, default=Config.PORT)
+    parser.add_argument("--workers", type=int, default=Config.SERVER_WORKERS, help="The number of server processes")
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+    JobStore(Config.JOB_DATABASE).recover()
+    os.environ[RECOVERED] = "1"
+    # The jobs left running by the last run are queued once here, as every server process starts its own job workers
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} server processes and "
+          f"{args.workers * Config.NUM_WORKERS} coefficient worker processes")
+    uvicorn.run("server:app", host=args.host, port=args.port, workers=args.workers, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,30 @@
 import os
 import json
+import asyncio
+from weakref import WeakValueDictionary
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
 
-from fastapi import FastAPI, UploadFile
+from fastapi import FastAPI, UploadFile, HTTPException, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response, PlainTextResponse
 import uvicorn
+import numpy as np
 
 from utils import *
 from config import Config
 from svg import SVG
 from bezier import PolyBezier
-from coeff import Coefficient_calculator
+from coeff import Coefficient_calculator, get_sets_of_coeffs
+from cache import ResultCache, DrawingStore
+from raster import Vectorizer, ConversionError
+import wire
+from tracer import get_traces
+from batch import BatchStore, BatchJob, BatchPipeline, get_key
+from metrics import metrics
+from jobs import JobStore, JobQueue, QueueFullError, RECOVERED
+from simplify import Simplifier
+from merger import Merger
 
 app = FastAPI()
 # This initialises the FastAPI
@@ -29,98 +44,628 @@ app.add_middleware(
 )
 # This allows requests to be sent on the same device between the frontend and backend
 
+drawings = DrawingStore(Config.DRAWING_PATH, Config.MAX_DRAWINGS, Config.DRAWING_DISK_BYTES)
+# The coefficient calculators of processed images, keyed by drawing id, so that more vectors can be added in any
+# server process
+
+drawing_locks = WeakValueDictionary()
+# A lock for each drawing whose calculators are being extended, so that only one request changes them at a time.
+# A lock is dropped once no request holds it.
+
+cache = ResultCache(Config.CACHE_PATH, Config.CACHE_MEMORY_ENTRIES, Config.CACHE_DISK_BYTES)
+# The drawing data of processed images, keyed by the hash of the file content and the settings used
+
+vectorizer = Vectorizer(Config.MAX_CONVERSIONS, Config.CONVERSION_TIMEOUT)
+# Converts raster images to SVG images in subprocesses, with a limit on how many run at the same time
+
+executor = ProcessPoolExecutor(Config.NUM_WORKERS) if Config.NUM_WORKERS > 0 else None
+# The worker processes that compute coefficients. They are started on the first large drawing and reused afterwards.
+
+batch_store = BatchStore(Config.BATCH_PATH)
+# The drawing data of the images processed by the /batch endpoint
+
+job_store = JobStore(Config.JOB_DATABASE)
+# The jobs of the /jobs endpoints, kept on disk so that they survive restarts
+
+
+async def run_job(job_id: str, filename: str, content: bytes, progress) -> str:
+    """
+    This function processes an image for the job queue, in the same way as process_image, reporting the stage and the
+    number of sets of coefficients computed so far
+    @param job_id: The id of the job
+    @param filename: The name of the uploaded file
+    @param content: The content of the uploaded file
+    @param progress: A coroutine function that records the stage and the number of sets done and in total
+    @return: The drawing data as a JSON string
+    """
+    key = get_key(content, get_extension(filename))
+    await progress("convert" if get_extension(filename).lower() != "svg" else "parse")
+    poly_beziers = await get_poly_beziers(filename, content)
+    xlim, ylim = get_lims(poly_beziers)
+    calcs = get_calculators(poly_beziers, Config.NUM_VECTORS, Config.BY_DIST)
+    await progress("coeffs", 0, len(calcs))
+    if Config.TRUNCATE:
+        sets_of_coeffs = await asyncio.to_thread(get_sets_of_coeffs, calcs, (xlim, ylim), executor,
+                                                 Config.CHUNK_SEGMENTS)
+    else:
+        ns = get_frequencies(Config.NUM_VECTORS)
+        done = 0
+        groups = Coefficient_calculator.get_groups(calcs, Config.CHUNK_SEGMENTS)
+        for group in asyncio.as_completed([compute_group(calcs, start, stop, ns) for start, stop, _ in groups]):
+            start, values = await group
+            Coefficient_calculator.store_coefficients(calcs[start:start + len(values)], ns, values)
+            done += len(values)
+            await progress("coeffs", done, len(calcs))
+        sets_of_coeffs = [dict(calc.coeffs) for calc in calcs]
+    store_drawing(key, calcs)
+    result = json.dumps({"id": key, "lim": {"x": xlim, "y": ylim}, "sets_of_coeffs": sets_of_coeffs})
+    cache.put(key, result)
+    return result
+
+
+job_queue = JobQueue(job_store, run_job, Config.JOB_WORKERS, Config.MAX_PENDING_JOBS, Config.JOB_POLL_SECONDS)
+# Runs the jobs in the background with a bounded number of pending jobs
+
+
+@app.on_event("startup")
+async def start_jobs():
+    """
+    This function starts the workers of the job queue, after queueing the jobs left unfinished by the last run unless
+    the launcher has already done it
+    """
+    if RECOVERED not in os.environ:
+        job_store.recover()
+    job_queue.start()
+
+
+@app.on_event("shutdown")
+async def stop_jobs():
+    """
+    This function stops the workers of the job queue and the worker processes that compute coefficients
+    """
+    await job_queue.stop()
+    if executor is not None:
+        executor.shutdown(cancel_futures=True)
+
+
+@app.middleware("http")
+async def add_server_timing(request: Request, call_next):
+    """
+    This function collects the timings of the stages run for a request and sends them in the Server-Timing header.
+    The header of a streamed response only has the stages run before the stream starts.
+    @param request: The request
+    @param call_next: The function that handles the request
+    @return: The response
+    """
+    timings = metrics.start_request()
+    response = await call_next(request)
+    if timings:
+        response.headers["Server-Timing"] = metrics.get_server_timing(timings)
+    return response
+
 
 @app.post("/image")
-async def process_image(file: UploadFile):
+async def process_image(file: UploadFile, accept: str = Header(None)):
     """
     This function processes the input image file and returns a JSON data of the drawing data.
+    If the same file has already been processed with the same settings, the cached drawing data is returned.
+    If the Accept header asks for the binary format of the wire module, the drawing data is sent in that format instead.
     @param file: image file
-    @return: json
+    @param accept: The Accept header of the request
+    @return: json, or the drawing data in the binary format
     """
-    save_image(file)
-    file_path = os.path.join(Config.IMAGE_PATH, file.filename)
-    # get the absolute path to the image file
+    content = await read_upload(file)
     extension = get_extension(file.filename)
-    if extension != "svg" and extension in Config.ACCEPTABLE_EXTENSIONS:
-        svg_path = convert_to_svg(file_path)
-        # if the file is not an SVG image, convert to SVG
-    elif extension not in Config.ACCEPTABLE_EXTENSIONS:
-        raise Exception("The input file is not an image file")
-    else:
-        svg_path = file_path
-    paths = parse_svg(svg_path)
-    poly_beziers = compile_polybeziers(paths)
+    key = get_key(content, extension)
+    # The drawing id is the key, so that identical uploads share the same drawing
+    cached = cache.get(key)
+    if cached is not None:
+        if wire.accepts_binary(accept):
+            return encode_response(json.loads(cached), accept)
+        return cached
+    poly_beziers = await get_poly_beziers(file.filename, content)
     xlim, ylim = get_lims(poly_beziers)
-    sets_of_coeffs = get_sets_coeffs(poly_beziers, Config.NUM_VECTORS, Config.BY_DIST)
+    calcs = get_calculators(poly_beziers, Config.NUM_VECTORS, Config.BY_DIST)
+    with metrics.span("get_sets_coeffs") as span:
+        sets_of_coeffs = await asyncio.to_thread(get_sets_of_coeffs, calcs, (xlim, ylim), executor,
+                                                 Config.CHUNK_SEGMENTS)
+        # It runs in a thread, so that the server keeps handling other requests while it waits for the workers
+        span.count(paths=len(calcs), vectors=sum(len(coeffs) for coeffs in sets_of_coeffs))
+    store_drawing(key, calcs)
     data = {
+        "id": key,
         "lim": {"x": xlim, "y": ylim},
         "sets_of_coeffs": sets_of_coeffs,
     }
+    result = json.dumps(data)
+    cache.put(key, result)
+    if wire.accepts_binary(accept):
+        return encode_response(data, accept)
+    return result
+
+
+@app.post("/image/stream")
+async def process_image_stream(file: UploadFile):
+    """
+    This function processes the input image file like process_image, but streams the drawing data as newline
+    delimited JSON. The first line holds the id, the limits and the number of sets, and each following line holds the
+    index and the coefficients of one set, sent as soon as it is computed.
+    @param file: image file
+    @return: A streaming response of newline delimited JSON
+    """
+    content = await read_upload(file)
+    extension = get_extension(file.filename)
+    key = get_key(content, extension)
+    cached = cache.get(key)
+    if cached is not None:
+        return StreamingResponse(stream_cached(cached), media_type="application/x-ndjson")
+    poly_beziers = await get_poly_beziers(file.filename, content)
+    xlim, ylim = get_lims(poly_beziers)
+    calcs = get_calculators(poly_beziers, Config.NUM_VECTORS, Config.BY_DIST)
+    if Config.TRUNCATE:
+        sets_of_coeffs = await asyncio.to_thread(get_sets_of_coeffs, calcs, (xlim, ylim), executor,
+                                                 Config.CHUNK_SEGMENTS)
+        store_drawing(key, calcs)
+        result = json.dumps({"id": key, "lim": {"x": xlim, "y": ylim}, "sets_of_coeffs": sets_of_coeffs})
+        cache.put(key, result)
+        return StreamingResponse(stream_cached(result), media_type="application/x-ndjson")
+        # The number of vectors of each set is only known once the whole drawing is computed
+    return StreamingResponse(stream_coeffs(key, {"x": xlim, "y": ylim}, calcs), media_type="application/x-ndjson")
+
+
+@app.post("/batch")
+async def process_batch(files: list[UploadFile]):
+    """
+    This function processes many image files through a pipeline of conversion, parsing and coefficient calculation,
+    and writes the drawing data of each image to the batch store. A file that fails does not stop the others.
+    @param files: image files
+    @return: json of the report, with the id of the drawing or the error of each file and the statistics of each stage
+    """
+    if len(files) > Config.MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"A batch can have at most {Config.MAX_BATCH_FILES} files")
+    jobs = [BatchJob(file.filename, content=await read_upload(file)) for file in files]
+    pipeline = BatchPipeline(batch_store, vectorizer, executor)
+    report = await pipeline.run(jobs)
+    return json.dumps(report)
+
+
+@app.get("/batch/{drawing_id}")
+async def get_batch_drawing(drawing_id: str):
+    """
+    This function returns the drawing data of an image processed by the /batch endpoint, in the binary format
+    @param drawing_id: The id of the drawing given in the report of the batch
+    @return: The drawing data in the binary format
+    """
+    if not batch_store.has(drawing_id):
+        raise HTTPException(status_code=404, detail="The drawing does not exist")
+    with open(batch_store.get_file_path(drawing_id), "rb") as f:
+        return Response(f.read(), media_type=wire.MEDIA_TYPE)
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(file: UploadFile):
+    """
+    This function queues the input image file to be processed in the background, so that the request returns at once.
+    If the same file has already been processed with the same settings, the job is done straight away.
+    @param file: image file
+    @return: json of the id and the state of the job
+    """
+    content = await read_upload(file)
+    cached = cache.get(get_key(content, get_extension(file.filename)))
+    if cached is not None:
+        job_id = job_store.create(file.filename, None, cached)
+    else:
+        try:
+            job_id = job_queue.submit(file.filename, content)
+        except QueueFullError as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    return json.dumps(job_store.get(job_id))
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    This function returns the state of a job and its progress, as the number of sets of coefficients computed out of
+    the total
+    @param job_id: The id returned when the job was submitted
+    @return: json of the status of the job
+    """
+    status = job_store.get(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="The job does not exist")
+    return json.dumps(status)
+
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, accept: str = Header(None)):
+    """
+    This function returns the drawing data of a finished job
+    @param job_id: The id returned when the job was submitted
+    @param accept: The Accept header of the request
+    @return: json of the drawing data, or the drawing data in the binary format
+    """
+    status = job_store.get(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="The job does not exist")
+    if status["state"] == "failed":
+        raise HTTPException(status_code=422, detail=status["error"])
+    if status["state"] != "done":
+        raise HTTPException(status_code=409, detail=f"The job is {status['state']}")
+    result = job_store.get_column(job_id, "result")
+    if wire.accepts_binary(accept):
+        return encode_response(json.loads(result), accept)
+    return result
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    This function returns the histograms of the durations and the counts of each stage in the Prometheus text format
+    @return: The metrics as plain text
+    """
+    return PlainTextResponse(metrics.export(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/cache")
+async def get_cache_stats():
+    """
+    This function returns the hit and miss counters and the sizes of the result cache
+    @return: A dictionary of the statistics
+    """
+    return cache.stats()
+
+
+@app.delete("/cache")
+async def clear_cache():
+    """
+    This function removes every result from the result cache
+    @return: A dictionary of the statistics
+    """
+    cache.invalidate()
+    return cache.stats()
+
+
+@app.delete("/cache/{key}")
+async def invalidate_cache(key: str):
+    """
+    This function removes the result of a single image from the result cache
+    @param key: The key of the result, which is also the id of the drawing
+    @return: A dictionary of the statistics
+    """
+    cache.invalidate(key)
+    drawings.invalidate(key)
+    return cache.stats()
+
+
+@app.post("/drawings/{drawing_id}/coeffs")
+async def extend_coeffs(drawing_id: str, num: int, accept: str = Header(None)):
+    """
+    This function adds vectors to a drawing that has already been processed, computing only the missing frequencies.
+    @param drawing_id: The id returned with the drawing data
+    @param num: The number of vectors the drawing should have
+    @param accept: The Accept header of the request
+    @return: json of the coefficients that were added to each set, or the same data in the binary format
+    """
+    calcs = get_drawing(drawing_id)
+    if not 0 < num <= Config.MAX_VECTORS:
+        raise HTTPException(status_code=400, detail=f"The number of vectors must be between 1 and {Config.MAX_VECTORS}")
+    async with get_drawing_lock(drawing_id):
+        sets_of_coeffs = await asyncio.to_thread(Coefficient_calculator.extend_batch, calcs, num, executor,
+                                                 Config.CHUNK_SEGMENTS)
+        if any(sets_of_coeffs):
+            await asyncio.to_thread(store_drawing, drawing_id, calcs)
+            # The drawing is written again with the new coefficients, so that other server processes have them
+    data = {
+        "id": drawing_id,
+        "sets_of_coeffs": sets_of_coeffs,
+    }
+    if wire.accepts_binary(accept):
+        return encode_response(data, accept)
+    return json.dumps(data)
+
+
+@app.get("/drawings/{drawing_id}/trace")
+async def trace_drawing(drawing_id: str, num: int = Config.NUM_VECTORS, samples: int = Config.TRACE_SAMPLES,
+                        accept: str = Header(None)):
+    """
+    This function samples the curve drawn by each set of coefficients of a drawing, so that the pen path can be drawn
+    without summing the vectors. The points are computed with an inverse FFT of the coefficients.
+    @param drawing_id: The id returned with the drawing data
+    @param num: The number of vectors used for each curve. Missing frequencies are computed first.
+    @param samples: The number of points sampled from each curve, at t = 0, 1/samples, 2/samples, ...
+    @param accept: The Accept header of the request
+    @return: json of the coefficients used and the points of each trace, or the same data in the binary format
+    """
+    calcs = get_drawing(drawing_id)
+    if not 0 < num <= Config.MAX_VECTORS:
+        raise HTTPException(status_code=400, detail=f"The number of vectors must be between 1 and {Config.MAX_VECTORS}")
+    if not 0 < samples <= Config.MAX_TRACE_SAMPLES:
+        raise HTTPException(status_code=400, detail=f"The number of samples must be between 1 and {Config.MAX_TRACE_SAMPLES}")
+    async with get_drawing_lock(drawing_id):
+        added = await asyncio.to_thread(Coefficient_calculator.extend_batch, calcs, num, executor,
+                                        Config.CHUNK_SEGMENTS)
+        if any(added):
+            await asyncio.to_thread(store_drawing, drawing_id, calcs)
+        sets_of_coeffs = [dict(islice(calc.coeffs.items(), num)) for calc in calcs]
+    traces = await asyncio.to_thread(get_traces, sets_of_coeffs, samples)
+    if wire.accepts_binary(accept):
+        content = wire.encode(drawing_id, None, sets_of_coeffs, wire.get_precision(accept), traces)
+        return Response(content, media_type=wire.MEDIA_TYPE)
+    data = {
+        "id": drawing_id,
+        "sets_of_coeffs": sets_of_coeffs,
+        "traces": [np.stack((trace.real, trace.imag), axis=1).tolist() for trace in traces],
+        # Each point is decomposed to its real and imaginary part as JavaScript does not support complex numbers
+    }
     return json.dumps(data)
 
 
-def save_image(file):
+def encode_response(data: dict, accept: str) -> Response:
+    """
+    This function encodes drawing data in the binary format, with the precision asked for in the Accept header
+    @param data: A dictionary of the id, the limits if any, and the sets of coefficients
+    @param accept: The Accept header of the request
+    @return: A response of the encoded drawing data
+    """
+    content = wire.encode(data["id"], data.get("lim"), data["sets_of_coeffs"], wire.get_precision(accept))
+    return Response(content, media_type=wire.MEDIA_TYPE)
+
+
+async def get_poly_beziers(filename: str, content: bytes) -> list:
+    """
+    This function converts the input file to an SVG image if needed, parses it and creates PolyBeziers. An unsupported
+    extension is refused with 415, and an SVG image that cannot be decoded or parsed with 400.
+    @param filename: The name of the uploaded file
+    @param content: The content of the uploaded file
+    @return: A list of PolyBezier curve objects
+    """
+    extension = get_extension(filename).lower()
+    if extension not in Config.ACCEPTABLE_EXTENSIONS:
+        raise HTTPException(status_code=415, detail="The input file is not an image file")
+    if extension != "svg":
+        svg_data = await convert_to_svg(content, extension)
+        # if the file is not an SVG image, convert to SVG
+    else:
+        try:
+            svg_data = content.decode()
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="The SVG image is not valid UTF-8")
+    try:
+        return await asyncio.to_thread(build_polybeziers, svg_data)
+    except SyntaxError as e:
+        raise HTTPException(status_code=400, detail=f"The SVG image could not be parsed: {e}")
+
+
+def build_polybeziers(svg_data: str) -> list:
+    """
+    This function parses an SVG image and creates PolyBeziers, simplifying and merging them if it's set in the Config
+    class. It's run in a thread, so that parsing a large image does not hold up the event loop.
+    @param svg_data: The content of the SVG image as a string
+    @return: A list of PolyBezier curve objects
+    """
+    paths = parse_svg(svg_data)
+    if Config.SIMPLIFY:
+        paths = simplify_polybeziers(paths)
+    if Config.NUM_TOURS > 0:
+        paths = merge_polybeziers(paths)
+    return compile_polybeziers(paths)
+
+
+async def compute_group(calcs: list, start: int, stop: int, ns: list):
+    """
+    This function computes the coefficients of a group of calculators in the worker processes, or in a thread if
+    there are none, so that the event loop keeps running
+    @param calcs: A list of Coefficient_calculator objects
+    @param start: The index of the first calculator of the group
+    @param stop: The index after the last calculator of the group
+    @param ns: A list of frequencies
+    @return: A tuple of start and the complex array of coefficients of the group
+    """
+    loop = asyncio.get_running_loop()
+    values = await loop.run_in_executor(executor, Coefficient_calculator.get_coefficients_batch, calcs[start:stop], ns)
+    return start, values
+
+
+async def stream_coeffs(key: str, lim: dict, calcs: list):
     """
-    This function saves the input file to the directory that is specified in the Config class
-    @param file: file to be saved
+    This function computes the coefficients in groups of PolyBeziers and yields each set as soon as its group is done.
+    The drawing is stored once the first set is computed, and stored again with every set once they are all done.
+    The lock of the drawing is held until then, so that it's not extended while its sets are still being computed.
+    Once every set is sent, the complete drawing data is cached.
+    @param key: The key of the drawing in the result cache, which is also its id
+    @param lim: A dictionary of xlim and ylim
+    @param calcs: A list of Coefficient_calculator objects
+    @return: An asynchronous generator of lines of JSON
     """
-    with open(os.path.join("images", file.filename), "wb") as f:
-        f.write(file.file.read())
+    yield json.dumps({"id": key, "lim": lim, "num_sets": len(calcs), "num_vec": Config.NUM_VECTORS}) + "\n"
+    ns = get_frequencies(Config.NUM_VECTORS)
+    groups = Coefficient_calculator.get_groups(calcs, Config.CHUNK_SEGMENTS)
+    async with get_drawing_lock(key):
+        stored = False
+        for job in asyncio.as_completed([compute_group(calcs, start, stop, ns) for start, stop, _ in groups]):
+            start, values = await job
+            added = Coefficient_calculator.store_coefficients(calcs[start:start + len(values)], ns, values)
+            if not stored:
+                store_drawing(key, calcs)
+                stored = True
+            for index, coeffs in enumerate(added, start):
+                yield json.dumps({"index": index, "coeffs": coeffs}) + "\n"
+        store_drawing(key, calcs)
+        # The copy on disk is written again, as it only had the first set
+    data = {
+        "id": key,
+        "lim": lim,
+        "sets_of_coeffs": [dict(calc.coeffs) for calc in calcs],
+    }
+    cache.put(key, json.dumps(data))
+
+
+def stream_cached(cached: str):
+    """
+    This function yields cached drawing data in the same lines as stream_coeffs
+    @param cached: The cached drawing data as a JSON string
+    @return: A generator of lines of JSON
+    """
+    data = json.loads(cached)
+    sets_of_coeffs = data["sets_of_coeffs"]
+    num_vec = max([len(coeffs) for coeffs in sets_of_coeffs], default=0)
+    yield json.dumps({"id": data["id"], "lim": data["lim"], "num_sets": len(sets_of_coeffs), "num_vec": num_vec}) + "\n"
+    for index, coeffs in enumerate(sets_of_coeffs):
+        yield json.dumps({"index": index, "coeffs": coeffs}) + "\n"
+
+
+async def read_upload(file: UploadFile) -> bytes:
+    """
+    This function reads an uploaded file in chunks, stopping with 413 as soon as it's larger than the size specified in
+    the Config class, so that a large upload is never read whole into memory
+    @param file: The uploaded file
+    @return: The content of the file
+    """
+    with metrics.span("read_upload") as span:
+        declared = getattr(file, "size", None)
+        # UploadFile only has the size the client declared from Starlette 0.24, and the byte count below is enough
+        # without it
+        if declared is not None and declared > Config.MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"The file is larger than {Config.MAX_UPLOAD_BYTES} bytes")
+        chunks = []
+        size = 0
+        while chunk := await file.read(Config.UPLOAD_CHUNK_BYTES):
+            size += len(chunk)
+            if size > Config.MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail=f"The file is larger than {Config.MAX_UPLOAD_BYTES} bytes")
+            chunks.append(chunk)
+        span.count(bytes=size)
+    return b"".join(chunks)
+
 
-def convert_to_svg(file_path: str) -> str:
+async def convert_to_svg(content: bytes, extension: str) -> str:
     """
-    This function converts the input file to an SVG image using Potrace
-    @param file_path: file_path as a string
-    @return: Path to the converted SVG image as a string
+    This function converts the input file to an SVG image using ImageMagick and Potrace.
+    The image is piped to the subprocesses, so it's never written to disk, and other requests are handled while they
+    run.
+    @param content: The content of the raster image
+    @param extension: The extension of the image
+    @return: The content of the SVG image as a string
     """
-    filename = get_filename(file_path)
-    pnm = f"{filename}.pnm"
-    if get_extension(filename) != "pnm":
-        os.system(f"convert {file_path} -background white -alpha remove -alpha off {pnm}")
-    svg = f"{filename}.svg"
-    os.system(f"potrace --flat {pnm} -s -o {svg}")
-    os.remove(pnm)
-    return svg
+    with metrics.span("convert_to_svg"):
+        try:
+            return await vectorizer.convert_content(content, extension)
+        except ConversionError as e:
+            raise HTTPException(status_code=422, detail=str(e))
 
 
-def parse_svg(file_path):
+def parse_svg(data: str):
     """
-    This function parses the SVG file specified by the input path using the SVG class
-    @param file_path: Path to the SVG file as a string
-    @return: A list of Bezier curve objects
+    This function parses the SVG image using the SVG class
+    @param data: The content of the SVG image as a string
+    @return: A list of PolyBezier curve objects
     """
-    data = get_file_content(file_path)
-    # svg file as a string
-    paths = SVG(data).parse_path()
+    with metrics.span("parse_svg") as span:
+        paths = SVG(data).parse_polybeziers()
+        span.count_polys(paths)
     return paths
 
 
+def simplify_polybeziers(polys: list) -> list:
+    """
+    This function drops tiny subpaths and merges short curves of the PolyBeziers with the Simplifier class, using the
+    tolerance and thresholds specified in the Config class
+    @param polys: A list of PolyBezier curve objects
+    @return: A list of simplified PolyBezier curve objects
+    """
+    with metrics.span("simplify_polybeziers") as span:
+        simplifier = Simplifier(polys, Config.SIMPLIFY_TOLERANCE, Config.SIMPLIFY_MIN_LENGTH, Config.SIMPLIFY_MIN_AREA)
+        polys = simplifier.main()
+        span.count_polys(polys)
+        span.count(dropped_paths=simplifier.report["paths"][0] - simplifier.report["paths"][1],
+                   merged_segments=simplifier.report["segments"][0] - simplifier.report["segments"][1])
+    return polys
+
+
+def merge_polybeziers(polys: list) -> list:
+    """
+    This function joins the PolyBeziers into the number of closed tours specified in the Config class with the Merger
+    class, so that far fewer sets of vectors draw the image
+    @param polys: A list of PolyBezier curve objects
+    @return: A list of PolyBezier curve objects, one for each tour
+    """
+    with metrics.span("merge_polybeziers") as span:
+        polys = Merger(polys, Config.NUM_TOURS).main()
+        span.count_polys(polys)
+    return polys
+
+
 def compile_polybeziers(paths: list) -> list:
     """
     This function creates PolyBezier(s) using the input list of Bezier curve objects
-    @param paths: A list of Bezier curve objects
+    @param paths: A list of lists of Bezier curve objects, or of PolyBezier objects
     @return: A list of PolyBezier curve objects
     """
-    polys = []
-    for path in paths:
-        poly = PolyBezier(path)
-        polys.append(poly)
+    with metrics.span("compile_polybeziers") as span:
+        polys = []
+        for path in paths:
+            poly = path if isinstance(path, PolyBezier) else PolyBezier(path)
+            # Paths that are already PolyBeziers, such as the ones from SVG.parse_polybeziers, are used as they are
+            polys.append(poly)
+        span.count_polys(polys)
     return polys
 
 
-def get_sets_coeffs(polys: list, num: int, by_dist: bool = False) -> list:
+def get_calculators(polys: list, num: int, by_dist: bool = False) -> list:
     """
-    This functoin gets a set of coefficients for each PolyBezier in the input polys list
+    This function creates a coefficient calculator for each PolyBezier in the input polys list
     @param polys: A list of PolyBezier curve objects
     @param num: The number of vectors
     @param by_dist: If the tip of the pe moves at a constant speed in the animation
-    @return: A list of set(s) of coefficeints
+    @return: A list of Coefficient_calculator objects
+    """
+    return [Coefficient_calculator(poly, num, by_dist) for poly in polys]
+
+
+def store_drawing(drawing_id: str, calcs: list):
+    """
+    This function keeps the coefficient calculators of a drawing, so that more vectors can be added to it later.
+    The drawings used most recently are kept in memory, up to the number specified in the Config class, and every
+    drawing is written to the drawing store on disk.
+    @param drawing_id: The id of the drawing
+    @param calcs: A list of Coefficient_calculator objects
+    """
+    with metrics.span("store_drawing"):
+        drawings.put(drawing_id, calcs)
+
+
+def get_drawing_lock(drawing_id: str) -> asyncio.Lock:
+    """
+    This function gets the lock of a drawing, which is held while its calculators are extended. The lock only orders
+    the requests of this server process.
+    @param drawing_id: The id of the drawing
+    @return: The lock of the drawing
+    """
+    lock = drawing_locks.get(drawing_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        drawing_locks[drawing_id] = lock
+    return lock
+
+
+def get_drawing(drawing_id: str) -> list:
+    """
+    This function gets the coefficient calculators of a drawing, with the coefficients stored with them. If a drawing
+    read from disk has no coefficients, such as one written before it was stored with them, the coefficients sent with
+    the drawing are taken from the result cache, so that only the missing frequencies are computed.
+    @param drawing_id: The id of the drawing
+    @return: A list of Coefficient_calculator objects
     """
-    sets_of_coeffs = []
-    for poly in polys:
-        calc = Coefficient_calculator(poly, num, by_dist)
-        sets_of_coeffs.append(calc.main())
-    return sets_of_coeffs
+    calcs = drawings.get(drawing_id)
+    if calcs is None:
+        raise HTTPException(status_code=404, detail="The drawing does not exist or has expired")
+    if all(len(calc.coeffs) == 0 for calc in calcs):
+        cached = cache.get(drawing_id)
+        if cached is not None:
+            for calc, coeffs in zip(calcs, json.loads(cached)["sets_of_coeffs"]):
+                calc.coeffs = {int(n): value for n, value in coeffs.items()}
+                # The keys of JSON objects are strings
+    return calcs
 
 
 def get_lims(polys: list):
@@ -129,14 +674,13 @@ def get_lims(polys: list):
     @param polys: A list of PolyBezier curve objects
     @return: A tuple of tuples, consisting of xlim and ylim
     """
-    lims = [poly.get_lims() for poly in polys]
-    xs = [lim[0] for lim in lims]
-    ys = [lim[1] for lim in lims]
-    xlim = (min(xs, key=lambda item: item[0])[0], max(xs, key=lambda item: item[1])[1])
-    ylim = (min(ys, key=lambda item: item[0])[0], max(ys, key=lambda item: item[1])[1])
-    return xlim, ylim
+    with metrics.span("get_lims") as span:
+        lims = PolyBezier.get_total_lims(polys)
+        # The extrema of the curves of all PolyBeziers are computed together
+        span.count(paths=len(polys))
+    return lims
 
 
 if __name__ == "__main__":
-    uvicorn.run("server:app", port=3000)
-    # This sets up a server on the machine on which this file is executed
+    uvicorn.run("server:app", host=Config.HOST, port=Config.PORT)
+    # This sets up a server on the machine on which this file is executed. serve.py runs it with several processes.
@@ -0,0 +1,200 @@
+from math import hypot
+
+import numpy as np
+
+from bezier import PolyBezier
+from config import Config
+
+
+class Simplifier:
+
+    """
+    Simplifies PolyBeziers before their coefficients are computed. Subpaths that are too short or enclose too small an
+    area are dropped, runs of nearly collinear linear Bezier curves are merged into one line, and chains of cubic
+    Bezier curves are replaced by a single cubic Bezier curve where it stays within the tolerance.
+    The tolerance and thresholds are relative to the diagonal of the bounding box of the whole drawing, and the error
+    introduced is reported in self.report.
+    """
+
+    SAMPLES = np.linspace(0, 1, 9)[1:-1]
+    # The values of t at which a merged cubic Bezier curve is compared with the curves it replaces
+    MAX_MERGE = 32
+    # The maximum number of curves merged into one
+
+    def __init__(self, polys: list, tolerance: float, min_length: float, min_area: float):
+        self.polys = polys
+        self.tolerance = tolerance
+        # The largest distance a merged curve can be from the curves it replaces, relative to the diagonal
+        self.min_length = min_length
+        # Subpaths shorter than this, relative to the diagonal, are dropped
+        self.min_area = min_area
+        # Closed subpaths enclosing less than this area, relative to the square of the diagonal, are dropped
+        self.max_error = 0.0
+        # The largest distance between a merged curve and the curves it replaced
+        self.report = {}
+
+    def main(self) -> list:
+        """
+        This function simplifies the PolyBeziers
+        @return: A list of simplified PolyBezier objects
+        """
+        if len(self.polys) == 0:
+            return []
+        xlim, ylim = PolyBezier.get_total_lims(self.polys)
+        diagonal = max(hypot(xlim[1] - xlim[0], ylim[1] - ylim[0]), np.finfo(np.float64).tiny)
+        PolyBezier.compute_dists(self.polys)
+        kept = [poly for poly in self.polys if not self._is_small(poly, diagonal)]
+        if len(kept) == 0:
+            kept = [max(self.polys, key=lambda poly: poly.dist)]
+            # The longest subpath is kept so that there is always something to draw
+        dropped = [poly for poly in self.polys if all(poly is not other for other in kept)]
+        simplified = [self._simplify(poly, self.tolerance * diagonal) for poly in kept]
+        self.report = {
+            "paths": [len(self.polys), len(simplified)],
+            "segments": [sum(len(poly) for poly in self.polys), sum(len(poly) for poly in simplified)],
+            "max_error": self.max_error,
+            "relative_error": self.max_error / diagonal,
+            "dropped_length": sum(poly.dist for poly in dropped) / diagonal,
+            # The total length of the dropped subpaths, relative to the diagonal
+        }
+        return simplified
+
+    def _is_small(self, poly, diagonal: float) -> bool:
+        """
+        This function checks if a PolyBezier is too short, or is closed and encloses too small an area
+        @param poly: A PolyBezier object
+        @param diagonal: The diagonal of the bounding box of the drawing
+        @return: True if the PolyBezier should be dropped
+        """
+        if poly.dist < self.min_length * diagonal:
+            return True
+        points = poly.points
+        ends = np.where(poly.degrees == 3, points[:, 3], points[:, 1])
+        if abs(ends[-1] - points[0, 0]) > self.tolerance * diagonal:
+            return False
+            # An open path encloses no area, so it is only checked by its length
+        middles = np.where(poly.degrees == 3, (points[:, 0] + 3 * points[:, 1] + 3 * points[:, 2] + points[:, 3]) / 8,
+                           (points[:, 0] + points[:, 1]) / 2)
+        polygon = np.stack((points[:, 0], middles), axis=1).ravel()
+        area = abs(np.sum(np.conj(polygon) * np.roll(polygon, -1)).imag) / 2
+        # The shoelace formula over the start and middle point of each curve
+        return area < self.min_area * diagonal ** 2
+
+    def _simplify(self, poly, tolerance: float):
+        """
+        This function merges runs of linear Bezier curves and chains of cubic Bezier curves of a PolyBezier
+        @param poly: A PolyBezier object
+        @param tolerance: The largest distance a merged curve can be from the curves it replaces
+        @return: A simplified PolyBezier object
+        """
+        points = poly.points.tolist()
+        degrees = poly.degrees.tolist()
+        dists = poly.dists.tolist()
+        new_points = []
+        new_degrees = []
+        start = 0
+        while start < len(degrees):
+            stop = start + 1
+            # The curves from start to stop are merged
+            if degrees[start] == 1:
+                while stop < len(degrees) and degrees[stop] == 1 and stop - start < self.MAX_MERGE:
+                    error = self._get_linear_error(points[start:stop + 1])
+                    if error > tolerance:
+                        break
+                    self.max_error = max(self.max_error, error)
+                    stop += 1
+                new_points.append([points[start][0], points[stop - 1][1], 0, 0])
+            else:
+                merged = points[start]
+                while stop < len(degrees) and degrees[stop] == 3 and stop - start < self.MAX_MERGE:
+                    fit, error = self._fit_cubic(points[start:stop + 1], dists[start:stop + 1])
+                    if error > tolerance:
+                        break
+                    self.max_error = max(self.max_error, error)
+                    merged = fit
+                    stop += 1
+                new_points.append(merged)
+            new_degrees.append(degrees[start])
+            start = stop
+        return PolyBezier.from_arrays(np.array(new_points, dtype=np.complex128), np.array(new_degrees))
+
+    @staticmethod
+    def _get_linear_error(points: list) -> float:
+        """
+        This function gets the largest distance between the line from the start of the first linear Bezier curve to
+        the end of the last one, and the points where the curves meet
+        @param points: A list of the points of consecutive linear Bezier curves
+        @return: The largest distance
+        """
+        start = points[0][0]
+        direction = points[-1][1] - start
+        length = abs(direction)
+        error = 0.0
+        for point in points[1:]:
+            offset = point[0] - start
+            if length == 0:
+                distance = abs(offset)
+            else:
+                t = min(max((offset * direction.conjugate()).real / length ** 2, 0), 1)
+                distance = abs(offset - t * direction)
+                # The distance to the nearest point of the line, so that a path turning back is not merged
+            error = max(error, distance)
+        return error
+
+    @staticmethod
+    def _fit_cubic(points: list, dists: list):
+        """
+        This function fits a single cubic Bezier curve to a chain of cubic Bezier curves. The chain is assumed to be
+        the fitted curve split at values of t proportional to the lengths of the curves, which is exactly the case
+        for a curve split at its middle by length. The tangents at both ends are kept, and the lengths of the control
+        handles are scaled by the share of t of the first and last curve.
+        @param points: A list of the points of the consecutive cubic Bezier curves
+        @param dists: A list of the lengths of the curves
+        @return: A tuple of the points of the fitted curve and the largest distance between it and the chain, which is
+        infinite if no curve can be fitted
+        """
+        points = np.array(points, dtype=np.complex128)
+        widths = np.array(dists) / sum(dists) if sum(dists) > 0 else np.zeros(len(dists))
+        if widths[0] == 0 or widths[-1] == 0:
+            return None, float("inf")
+        fit = np.array([points[0, 0], points[0, 0] + (points[0, 1] - points[0, 0]) / widths[0],
+                        points[-1, 3] + (points[-1, 2] - points[-1, 3]) / widths[-1], points[-1, 3]])
+        s = Simplifier.SAMPLES
+        original = Simplifier._evaluate(points, s)
+        # The sampled points of each curve of the chain
+        t = (np.cumsum(widths) - widths)[:, None] + widths[:, None] * s
+        fitted = Simplifier._evaluate(fit[None, :], t.ravel()).reshape(t.shape)
+        return fit.tolist(), float(np.abs(original - fitted).max())
+
+    @staticmethod
+    def _evaluate(points: np.ndarray, t: np.ndarray) -> np.ndarray:
+        """
+        This function evaluates cubic Bezier curves
+        @param points: A (num x 4) complex array of the points of the curves
+        @param t: An array of values of t
+        @return: A (num x len(t)) complex array of the points on the curves
+        """
+        p = points[:, :, None]
+        return (1 - t) ** 3 * p[:, 0] + 3 * (1 - t) ** 2 * t * p[:, 1] + 3 * (1 - t) * t ** 2 * p[:, 2] + t ** 3 * p[:, 3]
+
+
+def get_settings() -> tuple:
+    """
+    This function gets the settings of simplification specified in the Config class, which change the drawing data
+    and so are part of the key of a result in the result cache
+    @return: A tuple of the settings, which is empty if simplification is off
+    """
+    if not Config.SIMPLIFY:
+        return ()
+    return Config.SIMPLIFY_TOLERANCE, Config.SIMPLIFY_MIN_LENGTH, Config.SIMPLIFY_MIN_AREA
+
+
+def simplify(polys: list) -> list:
+    """
+    This function simplifies PolyBeziers with the settings specified in the Config class, if simplification is on
+    @param polys: A list of PolyBezier objects
+    @return: A list of PolyBezier objects
+    """
+    if not Config.SIMPLIFY:
+        return polys
+    return Simplifier(polys, Config.SIMPLIFY_TOLERANCE, Config.SIMPLIFY_MIN_LENGTH, Config.SIMPLIFY_MIN_AREA).main()
@@ -1,195 +1,411 @@
 from utils import *
-from bezier import CubicBezier, LinearBezier
+from bezier import CubicBezier, LinearBezier, PolyBezier
+from math import sin, cos, tan, atan2, radians, sqrt, ceil, pi
 import re
 
+import numpy as np
+
 
 class SVG:
 
+    PATH = re.compile(r"<path\b[^>]*?\bd\s*=\s*([\"'])(.*?)\1", flags=re.DOTALL)
+    # Matches the d attribute of every path element. The definition is in the second group.
+    NUMBER = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+    # Matches a number, including numbers such as -.5, 1e-3 and +2
+    NUMBERS = re.compile(NUMBER)
+    ARGUMENTS = re.compile(rf"[\s,]*(?:{NUMBER}[\s,]*)*")
+    # Matches a string of numbers separated by whitespace, commas or nothing, such as 1,2-3.5.5
+    COMMAND = re.compile(r"([MmZzLlHhVvCcSsQqTtAa])([^MmZzLlHhVvCcSsQqTtAa]*)")
+    # Matches a command letter and all the numbers that follow it, so that the definition is split in a single pass
+    CHARACTERS = re.compile(r"[MmZzLlHhVvCcSsQqTtAa\d\s,.eE+-]*")
+    # Matches a definition that only consists of the characters allowed in the path grammar
+
     def __init__(self, file_content: str):
         self.content = file_content
         self.funcs = []
         self.size = self.get_size()
-        self.path = self.get_path()
+        self.paths = self.get_paths()
 
     def get_size(self) -> tuple:
         """
-        This function gets the size of the SVG image
-        @return: A tuple of width and heigt
-        """
-        svg = re.findall("<svg.*>", self.content, flags=re.DOTALL)[0]
-        width = float(re.findall(r"width=\".*?pt", svg)[0][7:-2])
-        height = float(re.findall(r"height=\".*?pt", svg)[0][8:-2])
-        return width, height
-
-    def get_path(self) -> list:
-        """
-        This function extracts all coordinates in the SVG path element using regular expression
-        @return: A list of all coordinates in the SVG path element
-        """
-        path = re.findall("<path.*/>", self.content, flags=re.DOTALL)[0]
-        # Get a string inside the path element. The flag re.DOTALL is specified for the dot to cover the new line
-        # character as well
-        # <path matches the characters <path literally (case sensitive)
-        # . matches any character (except for line terminators)
-        # /> matches the characters /> literally (case sensitive)
-        with_space = re.sub(r"\n", " ", path)
-        # Replace each new line character with a space character in the path
-        definition = re.findall(r"\".*\"", with_space)[0][1:-1]
-        # Get the definition which is inside the <path> element, removing the
-        in_coordinates = re.findall(r"[a-zA-Z]?-?\d+\.?\d*\s-?\d+\.?\d*z?", definition)
-        # Get a list of coordinates
-        return in_coordinates
+        This function gets the size of the SVG image from the width and height attributes, or the viewBox if they are
+        not given
+        @return: A tuple of width and heigt, or None if the size is not specified
+        """
+        svg = re.search(r"<svg\b[^>]*>", self.content, flags=re.DOTALL)
+        if svg is None:
+            raise SyntaxError("There is no svg element")
+        width = re.search(r"\bwidth\s*=\s*[\"']\s*([-+.\deE]+)", svg.group())
+        height = re.search(r"\bheight\s*=\s*[\"']\s*([-+.\deE]+)", svg.group())
+        if width and height:
+            return float(width.group(1)), float(height.group(1))
+        view_box = re.search(r"\bviewBox\s*=\s*[\"']([^\"']*)", svg.group())
+        if view_box:
+            numbers = self.NUMBERS.findall(view_box.group(1))
+            if len(numbers) == 4:
+                return float(numbers[2]), float(numbers[3])
+        return None
+
+    def get_paths(self) -> list:
+        """
+        This function extracts the definition of every SVG path element
+        @return: A list of the definitions as strings
+        """
+        return [match.group(2) for match in self.PATH.finditer(self.content)]
 
     def parse_path(self) -> list:
         """
-        This function parses the SVG image and convert the Bezier curves in the SVG path element to Python objects
-        @return: A list of Bezier curve objects
+        This function parses the SVG image and convert the curves in all SVG path elements to Python objects.
+        Every command of the path grammar is supported. Quadratic Bezier curves and elliptical arcs are converted to
+        cubic Bezier curves, and horizontal and vertical lines to linear Bezier curves.
+        @return: A list of lists of Bezier curve objects, one list for each subpath
+        """
+        self._parse()
+        self.funcs = [[self._create_bezier(list(points)) for points in subpath] for subpath in self.segments]
+        return self.funcs
+
+    def parse_polybeziers(self) -> list:
+        """
+        This function parses the SVG image like parse_path, but writes the points of each subpath straight into the
+        arrays of a PolyBezier, without creating an object for each Bezier curve
+        @return: A list of PolyBezier curve objects, one for each subpath
+        """
+        self._parse()
+        return [self._create_polybezier(subpath) for subpath in self.segments]
+
+    def _parse(self):
         """
+        This function parses all SVG path elements into self.segments, which is a list of subpaths, each of which is a
+        list of tuples of the points of the Bezier curves
+        """
+        self.segments = []
+        for definition in self.paths:
+            self._parse_definition(definition)
+
+    def _parse_definition(self, definition: str):
+        """
+        This function splits a path definition into commands and runs each command with all of its numbers
+        @param definition: The d attribute of a path element
+        """
+        if self.CHARACTERS.fullmatch(definition) is None or definition.lstrip(" \t\r\n,")[:1] not in ("", "M", "m"):
+            raise SyntaxError("invalid SVG syntax")
+            # A path definition must start with a move to command
         self.current_point = complex(0, 0)
-        # Variable to store the current point.
         # In SVG path element, a current point is always stored when rendering the curves.
-        # For Cubic Bezier curves, control points cannot be currrent_point as they are not considered to be on the path.
         self.initial_point = complex(0, 0)
-        self.relative_coordinates = False
-        # Variable to store if the previous curve definition is relative or absolute
-        self.l_or_c = False
-        # Variable to store if the curve being defined is linear or cubic
-        # if it's True, it's linear and if it's False, it's cubic
-        self.points_list = []
-        # A list to store the coordinates of points that define Bezier curves
-        self.funcs_temp = []
-        # A list to temporarily store Bezier curve objects
-        for point in self.path:
-            self._process_point(point)
-        if len(self.funcs_temp) > 0:
-            self.funcs.append(self.funcs_temp)
-        return self.funcs
-
-    def _process_point(self, point: str):
-        """
-        This function processes the input point.
-        @param point: point a string
-        """
-        has_letter = re.search("[a-zA-z]", point)
-        # If the string has a letter, that means it's a starting point.
-        if has_letter:
-            letter = point[has_letter.start():has_letter.end()]
-            # has_letter.start() gives the starting index of the letter
-            # has_letter.end() gives the final index of the letter
-            self.point_in_int = convert_coordinates_to_int(pop_char(point, has_letter.start()))
-            # the coordinates as a string are converted to a complex number
-            if letter.upper() != "Z":
-                # Z means it's the end of the path element
-                # It does not matter if Z is uppercase or lowercase.
-                # To keep the information about the previous curve definition, self.relative_coordinates is unchanged for Z.
-                self.relative_coordinates = letter.islower()
-                # If the letter is lowercase, it's relative
-                # If the letter is uppercase, it's absolute
+        # The start point of the current subpath, to which z goes back
+        self.previous_control = None
+        # The second control point of the previous cubic Bezier curve, which is reflected by s
+        self.previous_quadratic = None
+        # The control point of the previous quadratic Bezier curve, which is reflected by t
+        self.segments_temp = []
+        # A list to temporarily store the points of the Bezier curves of the current subpath
+        for letter, arguments in self.COMMAND.findall(definition):
+            relative = letter.islower()
+            # If the letter is lowercase, it's relative
+            # If the letter is uppercase, it's absolute
             match letter:
                 case "M" | "m":
-                    self._process_m()
-                case "C" | "c":
-                    self._process_c()
+                    self._process_m(self._read_numbers(arguments, 2), relative)
                 case "L" | "l":
-                    self._process_l()
-                case "z" | "Z":
+                    self._process_l(self._read_numbers(arguments, 2), relative)
+                case "H" | "h":
+                    self._process_h(self._read_numbers(arguments, 1), relative)
+                case "V" | "v":
+                    self._process_v(self._read_numbers(arguments, 1), relative)
+                case "C" | "c":
+                    self._process_c(self._read_numbers(arguments, 6), relative)
+                case "S" | "s":
+                    self._process_s(self._read_numbers(arguments, 4), relative)
+                case "Q" | "q":
+                    self._process_q(self._read_numbers(arguments, 4), relative)
+                case "T" | "t":
+                    self._process_t(self._read_numbers(arguments, 2), relative)
+                case "A" | "a":
+                    self._process_a(self._split_numbers(arguments), relative)
+                case "Z" | "z":
+                    if arguments.strip(" \t\r\n,"):
+                        raise SyntaxError("invalid SVG syntax")
                     self._process_z()
-                case _:
-                    raise SyntaxError("invalid SVG syntax")
-        else:
-            # the input point does not have a letter; it calls the process_coordinates function
-            self.point_in_int = convert_coordinates_to_int(point)
-            self._process_coordinates()
+        self._end_subpath()
 
-    def _process_coordinates(self):
+    def _read_numbers(self, arguments: str, group: int) -> list:
         """
-        This function processes coordinates without a letter
-        It means it's coordinates of control points
+        This function converts the numbers following a command to floats.
+        A command can be repeated without its letter, so there can be any number of groups of numbers.
+        @param arguments: The string following the command letter
+        @param group: The number of numbers the command takes each time
+        @return: A list of the numbers as floats
         """
-        if self.l_or_c:
-            self._process_coordinates_linear()
-        else:
-            self._process_coordinates_cubic()
+        try:
+            numbers = list(map(float, arguments.replace(",", " ").split()))
+        except ValueError:
+            numbers = list(map(float, self._split_numbers(arguments)))
+            # Numbers that are not separated, such as 1-2 or 0.5.5, are split by the regular expression instead
+        if len(numbers) == 0 or len(numbers) % group != 0:
+            raise SyntaxError("invalid SVG syntax")
+        return numbers
 
-    def _process_coordinates_linear(self):
+    def _split_numbers(self, arguments: str) -> list:
         """
-        This function processes coordinates for a linear Bezier curve
-        A linear Bezier curve is defined only by two points, and this function is only called when the point has no leter.
-        Therefore, it's guranteed to be the last point of the curve definition
+        This function splits the string following a command into numbers, whether or not they are separated
+        @param arguments: The string following the command letter
+        @return: A list of the numbers as strings
         """
-        new_point = self.relative_coordinates * self.current_point + self.point_in_int
-        # If it's relative coordinates, the current point is added to the point to get the destination point
-        bez = self._create_bezier([self.current_point, new_point])
-        # This creates a Linear Bezier curve object
-        self.funcs_temp.append(bez)
-        self.current_point = new_point
-        # Update the current point
+        if self.ARGUMENTS.fullmatch(arguments) is None:
+            raise SyntaxError("invalid SVG syntax")
+        return self.NUMBERS.findall(arguments)
 
-
-    def _process_coordinates_cubic(self):
+    def _process_m(self, numbers: list, relative: bool):
         """
-        This function processes coordinates for a cubic Bezier curve
-        In this case, Bezier curve object is created only if there are four points.
-        @return:
+        This function processes coordinates for the start of definition of an edge in path element.
+        Any pair of coordinates following the first one is a line.
+        @param numbers: The coordinates as a list of floats
+        @param relative: If the coordinates are relative to the current point
         """
-        new_point = self.relative_coordinates * self.current_point + self.point_in_int
+        self.current_point = relative * self.current_point + complex(numbers[0], numbers[1])
         # If they are relative coordinates, the current point is added to the point to get the destination point
-        self.points_list.append(new_point)
-        if len(self.points_list) == 4:
-            self.current_point = new_point
-            self.funcs_temp.append(self._create_bezier(self.points_list))
-            self.points_list = [self.current_point]
-            # points_list is updated, as cubi Bezier curve can be defined straight after without calling the command c/C.
-            # In that case, the last point is recognized as the start point for the next cubic Bezier.
+        self._end_subpath()
+        # If there are already Bezier curves in self.segments_temp, they are stored as an edge
+        # This implies that there are multiple edges in the SVG path definition
+        self.initial_point = self.current_point
+        self.previous_control = self.previous_quadratic = None
+        self._process_l(numbers[2:], relative)
 
-    def _process_m(self):
+    def _process_l(self, numbers: list, relative: bool):
         """
-        This function processes coordinates for the start of definition of an edge in path element
+        This function processes coordinates for linear Bezier curves
+        @param numbers: The coordinates as a list of floats
+        @param relative: If the coordinates are relative to the current point
         """
-        self.current_point = self.relative_coordinates * self.current_point + self.point_in_int
-        # If they are relative coordinates, the current point is added to the point to get the destination point
-        if len(self.funcs_temp) > 0:
-            self.funcs.append(self.funcs_temp)
-            self.funcs_temp = []
-        # If there are already Bezier curves in self.funcs, rearrange it so that the pen tip doesn't have to "jump"
-        # This implies that there are multiple edges in the SVG path definition
-        self.initial_point = self.current_point
+        for i in range(0, len(numbers), 2):
+            self._add_linear(relative * self.current_point + complex(numbers[i], numbers[i + 1]))
 
-    def _process_c(self):
+    def _process_h(self, numbers: list, relative: bool):
         """
-        This function processes coordinates for the start of definition of a cubic Bezier curve
+        This function processes horizontal lines, which only have the x coordinate of the end point
+        @param numbers: The x coordinates as a list of floats
+        @param relative: If the coordinates are relative to the current point
         """
-        self.l_or_c = False
-        new_point = self.relative_coordinates * self.current_point + self.point_in_int
-        # If they are relative coordinates, the current point is added to the point to get the destination point
-        self.points_list = [self.current_point, new_point]
-        # The start point for a Cubic Bezier curve is the current point.
-        # Current point is only updated at the end of definition
+        for x in numbers:
+            self._add_linear(complex(relative * self.current_point.real + x, self.current_point.imag))
 
-    def _process_l(self):
+    def _process_v(self, numbers: list, relative: bool):
         """
-        This function processes coordinates for the start of definition of a linear Bezier curve
+        This function processes vertical lines, which only have the y coordinate of the end point
+        @param numbers: The y coordinates as a list of floats
+        @param relative: If the coordinates are relative to the current point
         """
-        self.l_or_c = True
-        new_point = self.relative_coordinates * self.current_point + self.point_in_int
-        # If they are relative coordinates, the current point is added to the point to get the destination point
-        self.funcs_temp.append(self._create_bezier([self.current_point, new_point]))
-        # The start point for a Linear Bezier curve is the current point, and end point is the new point
-        self.current_point = new_point
+        for y in numbers:
+            self._add_linear(complex(self.current_point.real, relative * self.current_point.imag + y))
+
+    def _process_c(self, numbers: list, relative: bool):
+        """
+        This function processes coordinates for cubic Bezier curves. This is the most common command, so the curves are
+        created in the loop rather than with self._add_cubic.
+        @param numbers: The coordinates as a list of floats
+        @param relative: If the coordinates are relative to the current point
+        """
+        current_point = self.current_point
+        segments_temp = self.segments_temp
+        points = list(map(complex, numbers[0::2], numbers[1::2]))
+        for i in range(0, len(points), 3):
+            control1, control2, end = points[i:i + 3]
+            if relative:
+                control1, control2, end = current_point + control1, current_point + control2, current_point + end
+                # All three points are relative to the start point, as the current point is only updated at the end
+            segments_temp.append((current_point, control1, control2, end))
+            current_point = end
+        self.current_point = current_point
+        self.previous_control = control2
+        self.previous_quadratic = None
+
+    def _process_s(self, numbers: list, relative: bool):
+        """
+        This function processes smooth cubic Bezier curves, of which first control point is the reflection of the
+        second control point of the previous cubic Bezier curve
+        @param numbers: The coordinates as a list of floats
+        @param relative: If the coordinates are relative to the current point
+        """
+        for i in range(0, len(numbers), 4):
+            offset = relative * self.current_point
+            control2 = offset + complex(numbers[i], numbers[i + 1])
+            end = offset + complex(numbers[i + 2], numbers[i + 3])
+            self._add_cubic(self._reflect(self.previous_control), control2, end)
+
+    def _process_q(self, numbers: list, relative: bool):
+        """
+        This function processes quadratic Bezier curves
+        @param numbers: The coordinates as a list of floats
+        @param relative: If the coordinates are relative to the current point
+        """
+        for i in range(0, len(numbers), 4):
+            offset = relative * self.current_point
+            control = offset + complex(numbers[i], numbers[i + 1])
+            self._add_quadratic(control, offset + complex(numbers[i + 2], numbers[i + 3]))
+
+    def _process_t(self, numbers: list, relative: bool):
+        """
+        This function processes smooth quadratic Bezier curves, of which control point is the reflection of the
+        control point of the previous quadratic Bezier curve
+        @param numbers: The coordinates as a list of floats
+        @param relative: If the coordinates are relative to the current point
+        """
+        for i in range(0, len(numbers), 2):
+            end = relative * self.current_point + complex(numbers[i], numbers[i + 1])
+            self._add_quadratic(self._reflect(self.previous_quadratic), end)
+
+    def _process_a(self, tokens: list, relative: bool):
+        """
+        This function processes elliptical arcs. Flags can be written without a separator, such as 01, so a flag is
+        only the first character of a token, and the rest of the token is read as the next number.
+        @param tokens: The numbers following the command as strings
+        @param relative: If the coordinates are relative to the current point
+        """
+        index = 0
+        if len(tokens) == 0:
+            raise SyntaxError("invalid SVG syntax")
+        while index < len(tokens):
+            if index + 4 > len(tokens):
+                raise SyntaxError("invalid SVG syntax")
+            rx, ry, angle = (float(token) for token in tokens[index:index + 3])
+            index += 3
+            flags = []
+            while len(flags) < 2:
+                if index >= len(tokens) or tokens[index][0] not in "01":
+                    raise SyntaxError("invalid SVG syntax")
+                flags.append(tokens[index][0] == "1")
+                if len(tokens[index]) > 1:
+                    tokens[index] = tokens[index][1:]
+                else:
+                    index += 1
+            if index + 2 > len(tokens):
+                raise SyntaxError("invalid SVG syntax")
+            end = relative * self.current_point + complex(float(tokens[index]), float(tokens[index + 1]))
+            index += 2
+            self._add_arc(abs(rx), abs(ry), angle, flags[0], flags[1], end)
+
+    def _add_arc(self, rx: float, ry: float, angle: float, large_arc: bool, sweep: bool, end: complex):
+        """
+        This function adds an elliptical arc from the current point to the end point, converted to cubic Bezier curves
+        of at most a quarter turn each. The centre of the ellipse is found from the end points as described in the
+        implementation notes of SVG.
+        @param rx: The radius along the x axis of the ellipse
+        @param ry: The radius along the y axis of the ellipse
+        @param angle: The rotation of the ellipse in degrees
+        @param large_arc: If the arc should be the longer of the two
+        @param sweep: If the arc goes in the direction of increasing angles
+        @param end: The end point
+        """
+        start = self.current_point
+        if start == end:
+            self.previous_control = self.previous_quadratic = None
+            return
+            # An arc that ends where it starts is not drawn
+        if rx == 0 or ry == 0:
+            self._add_linear(end)
+            return
+            # An arc with no radius is a straight line
+        rotation = complex(cos(radians(angle)), sin(radians(angle)))
+        half = (start - end) / 2 / rotation
+        # The half of the chord, in the coordinates of the ellipse before it's rotated
+        scale = (half.real / rx) ** 2 + (half.imag / ry) ** 2
+        if scale > 1:
+            rx, ry = rx * sqrt(scale), ry * sqrt(scale)
+            # If the radii are too small to reach the end point, they are scaled up
+        numerator = (rx * ry) ** 2 - (rx * half.imag) ** 2 - (ry * half.real) ** 2
+        denominator = (rx * half.imag) ** 2 + (ry * half.real) ** 2
+        root = sqrt(max(0, numerator / denominator))
+        if large_arc == sweep:
+            root = -root
+        centre = complex(root * rx * half.imag / ry, -root * ry * half.real / rx)
+        # The centre of the ellipse before it's rotated and moved
+        start_angle = atan2((half.imag - centre.imag) / ry, (half.real - centre.real) / rx)
+        end_angle = atan2((-half.imag - centre.imag) / ry, (-half.real - centre.real) / rx)
+        delta = end_angle - start_angle
+        if sweep and delta < 0:
+            delta += 2 * pi
+        elif not sweep and delta > 0:
+            delta -= 2 * pi
+        num_segments = max(1, ceil(abs(delta) / (pi / 2) - 1e-9))
+        step = delta / num_segments
+        k = 4 / 3 * tan(step / 4)
+        # The distance of the control points from the end points of an arc of a unit circle, along the tangent
+        origin = centre * rotation + (start + end) / 2
+
+        def transform(point: complex) -> complex:
+            return origin + rotation * complex(rx * point.real, ry * point.imag)
+            # This maps a point on the unit circle to the ellipse
+
+        for i in range(num_segments):
+            p0 = complex(cos(start_angle + i * step), sin(start_angle + i * step))
+            p1 = complex(cos(start_angle + (i + 1) * step), sin(start_angle + (i + 1) * step))
+            segment_end = end if i == num_segments - 1 else transform(p1)
+            self._add_cubic(transform(p0 + 1j * k * p0), transform(p1 - 1j * k * p1), segment_end)
 
     def _process_z(self):
         """
-        This function processes coordinates for the end of path definition
+        This function processes the end of a subpath
         """
-        self._process_coordinates()
         if self.current_point != self.initial_point:
             # If the path is not enclosed, a Linear Bezier curve (a straight line) is added between the initial point
             # and the last point
-            self.funcs_temp.append(self._create_bezier([self.current_point, self.initial_point]))
+            self.segments_temp.append((self.current_point, self.initial_point))
         self.current_point = self.initial_point
-        self.funcs.append(self.funcs_temp)
-        self.funcs_temp = []
-        # self.funcs_temp is made empty as there might be another path definition
+        self.previous_control = self.previous_quadratic = None
+        self._end_subpath()
+
+    def _end_subpath(self):
+        """
+        This function stores the Bezier curves of the current subpath as an edge, if it has any
+        """
+        if len(self.segments_temp) > 0:
+            self.segments.append(self.segments_temp)
+            self.segments_temp = []
+            # self.segments_temp is made empty as there might be another path definition
+
+    def _reflect(self, control) -> complex:
+        """
+        This function reflects a control point of the previous curve about the current point
+        @param control: The control point, or None if the previous curve is of another type
+        @return: The reflected point, or the current point if there is no control point to reflect
+        """
+        if control is None:
+            return self.current_point
+        return 2 * self.current_point - control
+
+    def _add_linear(self, end: complex):
+        """
+        This function adds a Linear Bezier curve from the current point to the end point
+        @param end: The end point
+        """
+        self.segments_temp.append((self.current_point, end))
+        self.current_point = end
+        self.previous_control = self.previous_quadratic = None
+
+    def _add_cubic(self, control1: complex, control2: complex, end: complex):
+        """
+        This function adds a Cubic Bezier curve from the current point to the end point
+        @param control1: The first control point
+        @param control2: The second control point
+        @param end: The end point
+        """
+        self.segments_temp.append((self.current_point, control1, control2, end))
+        self.current_point = end
+        self.previous_control = control2
+        self.previous_quadratic = None
+
+    def _add_quadratic(self, control: complex, end: complex):
+        """
+        This function adds a quadratic Bezier curve from the current point to the end point, elevated to a Cubic
+        Bezier curve that traces the same curve
+        @param control: The control point
+        @param end: The end point
+        """
+        start = self.current_point
+        self._add_cubic(start + 2 / 3 * (control - start), end + 2 / 3 * (control - end), end)
+        self.previous_control = None
+        self.previous_quadratic = control
 
     def _create_bezier(self, points: list):
         """
@@ -204,6 +420,22 @@ class SVG:
         else:
             raise ValueError("Only Linear and Cubic bezier is supported")
 
+    @staticmethod
+    def _create_polybezier(subpath: list) -> PolyBezier:
+        """
+        This function creates a PolyBezier from the points of the Bezier curves of a subpath
+        @param subpath: A list of tuples of two or four points
+        @return: A PolyBezier object
+        """
+        degrees = np.array([len(points) - 1 for points in subpath], dtype=np.int8)
+        points = np.zeros((len(subpath), 4), dtype=np.complex128)
+        cubic = degrees == 3
+        if cubic.any():
+            points[cubic] = [points for points in subpath if len(points) == 4]
+        if not cubic.all():
+            points[~cubic, :2] = [points for points in subpath if len(points) == 2]
+        return PolyBezier.from_arrays(points, degrees)
+
 
 if __name__ == "__main__":
     with open("example_pictures/apple.svg", "r") as f:
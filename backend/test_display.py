@@ -3,12 +3,14 @@ Standard Library
 """
 import sys
 import os
+import asyncio
 from random import choice
 
 """
 Third Party
 """
 from itertools import chain
+import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 
@@ -20,11 +22,14 @@ from svg import SVG
 from utils import *
 from config import Config
 from bezier import PolyBezier
-from complex_vector import ComplexVector
+from complex_vector import ComplexVector, RotatingVectors
+from raster import Vectorizer
+from tracer import get_traces
+from merger import Merger
 
 
 
-def animate(sets, xlim, ylim, output=False, show_vectors=True):
+def animate(sets, xlim, ylim, output=False, show_vectors=True, traces=None):
     plt.style.use(Config.STYLE)
     fig = plt.figure(figsize=Config.FIG_SIZE)
     x_range = xlim[1] - xlim[0]
@@ -40,35 +45,34 @@ def animate(sets, xlim, ylim, output=False, show_vectors=True):
                         sets]
     xdatas = [[] for _ in range(len(sets))]
     ydatas = [[] for _ in range(len(sets))]
+    rotating = RotatingVectors(sets, 1 / Config.NUM_FRAME)
+    # The vectors of every set are turned together, one frame at a time, without computing an exponential for each
     def update(i):
-        t = i * (1 / Config.NUM_FRAME)
         if show_vectors:
             counter = 0
-            for compVectors, line, vecs, xdata, ydata in zip(sets, lines, sets_of_vecs, xdatas, ydatas):
-                x = 0
-                y = 0
-                for vector, plot in zip(compVectors, vecs):
-                    z = vector.func(t)
-                    x_updated = x + z.real
-                    y_updated = y + z.imag
-                    plot.set_data([x, x_updated], [y, y_updated])
-                    x = x_updated
-                    y = y_updated
-                xdata.append(x)
-                ydata.append(y)
-                line.set_data(xdata, ydata)
+            for row, compVectors, line, vecs, xdata, ydata in zip(rotating.at(i), sets, lines, sets_of_vecs, xdatas,
+                                                                   ydatas):
+                points = np.concatenate(([0], np.cumsum(row[:len(compVectors)])))
+                # The start of each vector is the sum of the vectors before it
+                for start, end, plot in zip(points[:-1], points[1:], vecs):
+                    plot.set_data([start.real, end.real], [start.imag, end.imag])
+                if traces is not None:
+                    line.set_data(traces[counter].real[:i + 1], traces[counter].imag[:i + 1])
+                else:
+                    xdata.append(points[-1].real)
+                    ydata.append(points[-1].imag)
+                    line.set_data(xdata, ydata)
                 counter += 1
             return *lines, *chain.from_iterable(sets_of_vecs)
+        elif traces is not None:
+            for trace, line in zip(traces, lines):
+                line.set_data(trace.real[:i + 1], trace.imag[:i + 1])
+                # The path up to frame i is read from the trace, without summing the vectors
+            return *lines,
         else:
-            for compVectors, line, xdata, ydata in zip(sets, lines, xdatas, ydatas):
-                x = 0
-                y = 0
-                for vector in compVectors:
-                    z = vector.func(t)
-                    x += z.real
-                    y += z.imag
-                xdata.append(x)
-                ydata.append(y)
+            for tip, line, xdata, ydata in zip(rotating.tips(i), lines, xdatas, ydatas):
+                xdata.append(tip.real)
+                ydata.append(tip.imag)
                 line.set_data(xdata, ydata)
             return *lines,
     ani = animation.FuncAnimation(fig, update, frames=Config.NUM_FRAME, interval=1, repeat=True, blit=True)
@@ -87,29 +91,23 @@ def create_compVectors(coefficients):
 
 
 def convert_to_svg(file_path: str) -> str:
-    filename = get_filename(file_path)
-    pnm = f"{filename}.pnm"
-    os.system(f"convert {file_path} -background white -alpha remove -alpha off {pnm}")
-    filename = get_filename(file_path)
-    svg = f"{filename}.svg"
-    os.system(f"potrace --flat {pnm} -s -o {svg}")
-    os.remove(pnm)
-    return svg
+    vectorizer = Vectorizer(1, Config.CONVERSION_TIMEOUT)
+    return asyncio.run(vectorizer.convert(file_path))
 
 
 def compile_polybeziers(paths: list) -> list:
     polys = []
     for path in paths:
-        poly = PolyBezier(path)
+        poly = path if isinstance(path, PolyBezier) else PolyBezier(path)
+        # Paths that are already PolyBeziers, such as the ones from SVG.parse_polybeziers, are used as they are
         polys.append(poly)
     return polys
 
 
 def get_sets_coeffs(polys: list, num: int, by_dist: bool = False) -> list:
-    sets_of_coeffs = []
-    for poly in polys:
-        calc = Coefficient_calculator(poly, num, by_dist)
-        sets_of_coeffs.append(calc.main())
+    calcs = [Coefficient_calculator(poly, num, by_dist) for poly in polys]
+    sets_of_coeffs = Coefficient_calculator.main_batch(calcs)
+    # All PolyBeziers are packed together, so that their coefficients are computed in one batch
     return sets_of_coeffs
 
 
@@ -121,24 +119,22 @@ def get_sets_compVec(sets_of_coeffs: list) -> list:
 
 
 def get_lims(polys: list):
-    lims = [poly.get_lims() for poly in polys]
-    xs = [lim[0] for lim in lims]
-    ys = [lim[1] for lim in lims]
-    xlim = (min(xs, key=lambda item: item[0])[0], max(xs, key=lambda item: item[1])[1])
-    ylim = (min(ys, key=lambda item: item[0])[0], max(ys, key=lambda item: item[1])[1])
-    return xlim, ylim
+    return PolyBezier.get_total_lims(polys)
+    # The extrema of the curves of all PolyBeziers are computed together
 
 
-def main(file_path, output=False, num_set=0):
+def main(file_path, output=False, num_set=Config.NUM_TOURS):
     initial = time()
     # Convert to svg
     if get_extension(file_path) != "svg":
-        file_path = convert_to_svg(file_path)
+        data = convert_to_svg(file_path)
+    else:
+        data = get_file_content(file_path)
     # Get polybezier from the svg file
-    data = get_file_content(file_path)
-
     paths = SVG(data).parse_path()
-    #paths = Merger(paths, num_set).main()
+    if num_set > 0:
+        paths = Merger(paths, num_set).main()
+        # The subpaths are joined into num_set closed tours, each drawn by one set of vectors
     polybeziers = compile_polybeziers(paths)
     sets_of_coeffs = get_sets_coeffs(polybeziers, Config.NUM_VECTORS, Config.BY_DIST)
     # Create compVector objects
@@ -148,7 +144,9 @@ def main(file_path, output=False, num_set=0):
     final = time()
     print(f"Time taken: {final - initial}")
     show_vectors = len(paths) < Config.VEC_DISPLAY_THRESHOLD
-    animate(sets_of_compVectors, *get_lims(polybeziers), output=output, show_vectors=show_vectors)
+    traces = get_traces(sets_of_coeffs, Config.NUM_FRAME)
+    # The pen path of each set is sampled once for every frame with an inverse FFT
+    animate(sets_of_compVectors, *get_lims(polybeziers), output=output, show_vectors=show_vectors, traces=traces)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,25 @@
+import numpy as np
+
+
+def get_traces(sets_of_coeffs: list, num_samples: int, num_vectors: int = None) -> np.ndarray:
+    """
+    This function samples the curve drawn by each set of coefficients at num_samples evenly spaced values of t,
+    using a single inverse FFT instead of summing every vector at every t.
+    The point at t = k / K is the sum of c_n * e^(2*pi*i*n*k/K), which is K times the inverse DFT of the coefficients
+    placed at index n mod K. Frequencies that share an index are added together, so the samples are exact for any K.
+    @param sets_of_coeffs: A list of dictionaries of coefficients, keyed by frequency, in the order 0, 1, -1, 2, -2, ...
+    The coefficients are pairs of real and imaginary parts.
+    @param num_samples: The number of points sampled from each curve
+    @param num_vectors: The number of vectors used for each curve. If it's None, every coefficient is used.
+    @return: A (number of sets x num_samples) complex array of the sampled points
+    """
+    spectra = np.zeros((len(sets_of_coeffs), num_samples), dtype=np.complex128)
+    for row, coeffs in enumerate(sets_of_coeffs):
+        items = list(coeffs.items())[:num_vectors]
+        if len(items) == 0:
+            continue
+        ns = np.array([int(n) for n, _ in items])
+        # The keys are strings if the coefficients were loaded from JSON
+        values = np.array([value for _, value in items], dtype=np.float64).reshape(-1, 2)
+        np.add.at(spectra[row], ns % num_samples, values[:, 0] + 1j * values[:, 1])
+    return np.fft.ifft(spectra, axis=1) * num_samples
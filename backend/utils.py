@@ -123,3 +123,13 @@ def get_output_name():
     @return:
     """
     return str(int(time())) + ".mp4"
+
+
+def get_frequencies(num: int, start: int = 0) -> list:
+    """
+    This function generates the frequencies in the order 0, 1, -1, 2, -2, 3, -3, ....
+    @param num: The number of frequencies in total
+    @param start: The index of the first frequency to be generated, so that the sequence can be resumed
+    @return: A list of frequencies from index start up to index num
+    """
+    return [(i + 1) // 2 if i % 2 else -((i + 1) // 2) for i in range(start, num)]
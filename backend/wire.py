@@ -0,0 +1,87 @@
+import struct
+
+import numpy as np
+
+
+MEDIA_TYPE = "application/x-fourier-coeffs"
+# The media type of the binary format. Clients ask for it with the Accept header.
+MAGIC = b"FDRW"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHII4d")
+# magic, version, bytes per float, length of the id, number of sets, number of trace samples, xlim and ylim
+
+"""
+Layout of the binary format. All numbers are little-endian.
+    0   magic "FDRW"
+    4   version (uint8)
+    5   bytes per float, 4 or 8 (uint8)
+    6   length of the id in bytes (uint16)
+    8   number of sets (uint32)
+    12  number of samples in each trace, 0 if there are no traces (uint32)
+    16  xlim and ylim (4 x float64)
+    48  id (utf-8), padded to a multiple of 4 bytes
+    ..  number of vectors in each set (uint32 per set), padded to a multiple of 8 bytes
+    ..  coefficients as [set][frequency][real, imaginary] floats
+    ..  traces as [set][sample][real, imaginary] floats, if the number of samples is not 0
+The frequencies of each set are in the order 0, 1, -1, 2, -2, 3, -3, ..., so they are not sent.
+"""
+
+
+def accepts_binary(accept: str) -> bool:
+    """
+    This function checks if the Accept header of a request asks for the binary format
+    @param accept: The value of the Accept header
+    @return: True if the binary format is accepted
+    """
+    return MEDIA_TYPE in (accept or "")
+
+
+def get_precision(accept: str) -> int:
+    """
+    This function gets the number of bytes per float asked for in the Accept header, such as
+    "application/x-fourier-coeffs; precision=32". The default is 64 bit floats.
+    @param accept: The value of the Accept header
+    @return: 4 or 8
+    """
+    for media_range in (accept or "").split(","):
+        parts = [part.strip() for part in media_range.split(";")]
+        if parts[0] == MEDIA_TYPE and "precision=32" in parts[1:]:
+            return 4
+    return 8
+
+
+def _pad(size: int, alignment: int) -> int:
+    """
+    This function gets the number of bytes needed to pad size to a multiple of alignment
+    @param size: The number of bytes
+    @param alignment: The alignment in bytes
+    @return: The number of padding bytes
+    """
+    return -size % alignment
+
+
+def encode(drawing_id: str, lim: dict, sets_of_coeffs: list, float_size: int = 8, traces=None) -> bytes:
+    """
+    This function encodes drawing data in the binary format
+    @param drawing_id: The id of the drawing
+    @param lim: A dictionary of xlim and ylim. It can be None when only coefficients are sent.
+    @param sets_of_coeffs: A list of dictionaries of coefficients in the order 0, 1, -1, 2, -2, ...
+    @param float_size: The number of bytes per float, 4 or 8
+    @param traces: A (number of sets x number of samples) complex array of the points sampled from each set, or None
+    @return: The encoded drawing data
+    """
+    dtype = "<f4" if float_size == 4 else "<f8"
+    id_bytes = drawing_id.encode()
+    xlim, ylim = (lim["x"], lim["y"]) if lim is not None else ((0, 0), (0, 0))
+    num_samples = traces.shape[1] if traces is not None else 0
+    header = HEADER.pack(MAGIC, VERSION, float_size, len(id_bytes), len(sets_of_coeffs), num_samples, *xlim, *ylim)
+    counts = np.array([len(coeffs) for coeffs in sets_of_coeffs], dtype="<u4")
+    values = np.array([value for coeffs in sets_of_coeffs for value in coeffs.values()], dtype=dtype).reshape(-1)
+    parts = [header, id_bytes, bytes(_pad(len(id_bytes), 4)), counts.tobytes()]
+    size = sum(len(part) for part in parts)
+    parts.append(bytes(_pad(size, 8)))
+    # The coefficients start at a multiple of 8 bytes, so that the client can read them as a typed array
+    parts.append(values.tobytes())
+    if traces is not None:
+        parts.append(np.ascontiguousarray(traces, dtype=np.complex128).view(np.float64).astype(dtype).tobytes())
+    return b"".join(parts)
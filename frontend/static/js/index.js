@@ -1,21 +1,45 @@
 const api_url = "http://127.0.0.1:3000/image";
+const stream_url = "http://127.0.0.1:3000/image/stream";
+const drawings_url = "http://127.0.0.1:3000/drawings";
+const max_vectors = 1000;
+// The maximum number of vectors the backend API computes for a drawing
+const binary_type = "application/x-fourier-coeffs";
+// The media type of the binary format of the drawing data, which is decoded straight into typed arrays
+const streaming = true;
+// If the drawing data is streamed set by set. Otherwise it is fetched at once in the binary format.
+const trace_samples = 1000;
+// The number of points of the pen path fetched for each edge, one for each time step of the animation
+const offscreen_rendering = typeof Worker != "undefined" && typeof OffscreenCanvas != "undefined" && "transferControlToOffscreen" in HTMLCanvasElement.prototype;
+// If the frames are drawn by a Web Worker on OffscreenCanvases. Otherwise they are drawn on the main thread.
+const render_worker_url = "static/js/render_worker.js";
 
 async function upload() {
   // This function is called when the upload button on html is pressed.
   // It uploads the input image to the backend API and receives the drawing data of the image. If there is no file selected, it gives an error.
+  // The drawing data is streamed as lines of JSON, so the animation starts as soon as the first line arrives and each set of coefficients is added as it arrives.
   let formData = new FormData();
   if (fileupload.files.length > 0) {
     formData.append("file", fileupload.files[0]);
+    if (!streaming) {
+      return upload_binary(formData);
+    }
     try {
-      await fetch(api_url, { method: "POST", body: formData })
-        .then((response) => {
-          return response.json().then((data) => {
-            const drawing_data = JSON.parse(data);
-            if (response.ok) {
-              main(drawing_data);
-            }
-          })
-        })
+      const response = await fetch(stream_url, { method: "POST", body: formData });
+      if (!response.ok) {
+        throw new Error(response.statusText);
+      }
+      let anim = null;
+      for await (const line of read_lines(response)) {
+        const data = JSON.parse(line);
+        if (anim == null) {
+          anim = main_stream(data);
+          // The first line holds the id, the limits and the number of sets
+        } else {
+          anim.add_set(data["index"], data["coeffs"]);
+        }
+      }
+      anim.load_trace();
+      // Once every set has arrived, the pen path is fetched from the backend API
     } catch (err) {
       alert("Invalid File!");
     }
@@ -25,19 +49,140 @@ async function upload() {
   }
 }
 
+async function upload_binary(formData) {
+  // This function uploads the input image to the backend API and receives the whole drawing data in the binary format.
+  try {
+    const response = await fetch(api_url, { method: "POST", body: formData, headers: { "Accept": binary_type } });
+    if (!response.ok) {
+      throw new Error(response.statusText);
+    }
+    main(decode_drawing(await response.arrayBuffer())).load_trace();
+  } catch (err) {
+    alert("Invalid File!");
+  }
+}
+
+function decode_drawing(buffer) {
+  // This function decodes drawing data in the binary format of the backend API. All numbers are little-endian.
+  // The header holds the magic "FDRW", the version, the bytes per float, the length of the id, the number of sets and the limits.
+  // It is followed by the id, the number of vectors in each set and the coefficients as [set][frequency][real, imaginary].
+  // If the number of trace samples is not 0, the points of the pen path follow as [set][sample][real, imaginary].
+  const view = new DataView(buffer);
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+  if (magic != "FDRW" || view.getUint8(4) != 1) {
+    throw new Error("Unknown drawing data format");
+  }
+  const float_size = view.getUint8(5);
+  const id_length = view.getUint16(6, true);
+  const num_sets = view.getUint32(8, true);
+  const num_samples = view.getUint32(12, true);
+  const lims = {
+    x: [view.getFloat64(16, true), view.getFloat64(24, true)],
+    y: [view.getFloat64(32, true), view.getFloat64(40, true)]
+  };
+  const id = new TextDecoder().decode(new Uint8Array(buffer, 48, id_length));
+  let offset = 48 + id_length + (-id_length & 3);
+  const counts = Array.from({ length: num_sets }, (_, i) => view.getUint32(offset + i * 4, true));
+  offset += num_sets * 4;
+  offset += -offset & 7;
+  // The coefficients start at a multiple of 8 bytes, so that they can be viewed as a typed array without copying
+  const total = counts.reduce((sum, count) => sum + count, 0);
+  const FloatArray = float_size == 4 ? Float32Array : Float64Array;
+  const values = new FloatArray(buffer, offset, total * 2);
+  let sets_of_coeffs = [];
+  let start = 0;
+  for (const count of counts) {
+    sets_of_coeffs.push(values.subarray(start, start + count * 2));
+    // Each set is a view of real and imaginary pairs in the order 0, 1, -1, 2, -2, ...
+    start += count * 2;
+  }
+  const points = new FloatArray(buffer, offset + total * 2 * float_size, num_sets * num_samples * 2);
+  const traces = Array.from({ length: num_samples > 0 ? num_sets : 0 }, (_, i) => points.subarray(i * num_samples * 2, (i + 1) * num_samples * 2));
+  return { id: id, lim: lims, sets_of_coeffs: sets_of_coeffs, traces: traces };
+}
+
+function count_coeffs(coeffs) {
+  // This function returns the number of coefficients in a set, which is either a typed array of pairs or a dictionary keyed by frequency.
+  return ArrayBuffer.isView(coeffs) ? coeffs.length / 2 : Object.keys(coeffs).length;
+}
+
+function to_pairs(coeffs, num) {
+  // This function returns the first num coefficients of a set as a new Float64Array of real and imaginary pairs in the order 0, 1, -1, 2, -2, ..., so that it can be sent to the render worker.
+  if (ArrayBuffer.isView(coeffs)) {
+    return Float64Array.from(coeffs.subarray(0, num * 2));
+  }
+  let pairs = [];
+  for (let i = 0; i < num; i++) {
+    let n = i % 2 == 1 ? (i + 1) / 2 : -i / 2;
+    // The frequency of the index i
+    if (coeffs[n] == undefined) {
+      break;
+    }
+    pairs.push(coeffs[n][0], coeffs[n][1]);
+  }
+  return Float64Array.from(pairs);
+}
+
+function merge_coeffs(coeffs, added) {
+  // This function appends a typed array of coefficients, continuing the order 0, 1, -1, 2, -2, ..., to a set of coefficients and returns the set.
+  if (ArrayBuffer.isView(coeffs)) {
+    let merged = new Float64Array(coeffs.length + added.length);
+    merged.set(coeffs);
+    merged.set(added, coeffs.length);
+    return merged;
+  }
+  let i = count_coeffs(coeffs);
+  for (let k = 0; k < added.length; k += 2, i++) {
+    let n = i % 2 == 1 ? (i + 1) / 2 : -i / 2;
+    // The frequency of the index i
+    coeffs[n] = [added[k], added[k + 1]];
+  }
+  return coeffs;
+}
+
+async function* read_lines(response) {
+  // This function reads the body of the response as it arrives and yields each complete line.
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) {
+      break;
+    }
+    buffer += decoder.decode(value, { stream: true });
+    let lines = buffer.split("\n");
+    buffer = lines.pop();
+    // The last element is an incomplete line, which is kept until the rest of it arrives
+    for (const line of lines) {
+      if (line.length > 0) {
+        yield line;
+      }
+    }
+  }
+  if (buffer.length > 0) {
+    yield buffer;
+  }
+}
+
 class Animation {
 
   // This class holds all the variables, constants and methods required to run the animation on html.
 
-  constructor(lims, sets_of_coeffs) {
+  constructor(lims, sets_of_coeffs, id, num_loaded) {
     this.sets_of_coeffs = sets_of_coeffs;
+    // Sets that have not been received yet are undefined
+    this.id = id;
+    // The id of the drawing on the backend API, used to load more vectors
+    this.num_loaded = num_loaded;
+    // The number of coefficients received from the backend API for each edge
     this.init_constants_and_variables();
     this.factor = this.get_zoom_factor(lims);
     // this.factor is multiplies to the coordinates for the drawing to fit the screen
     this.init_canvas();
     this.init_control_panel();
     this.init_comp_vectors();
-    this.sets_of_previous = Array(Object.keys(sets_of_coeffs).length);
+    this.sets_of_previous = Array(sets_of_coeffs.length);
     // This arrays stores the coordinates in the previous frame for each edge(set of coefficient), so that the path can be drawn.
     this.init_html();
     this.draw();
@@ -65,15 +210,39 @@ class Animation {
 
 
     this.interval = 10;
-    // The interval between each frame
-    this.num_vec = 200;
+    // The number of milliseconds, minus one, that time takes to advance by this.DT
+    this.worker = null;
+    // The Web Worker that draws the frames, if offscreen_rendering is true
+    this.frame_pending = false;
+    // If a frame has been sent to the worker and not drawn yet
+    this.frame_dirty = false;
+    // If the state changed while a frame was pending, so that another frame has to be drawn after it
+    this.drawn_t = null;
+    // The time of the last frame sent to the worker
+    this.num_vec = this.num_loaded;
     // The number of vectors used for each edge
+    this.loading = false;
+    // If more vectors are being loaded from the backend API
+    this.redraw_pending = false;
+    // If the frame is going to be drawn again to show newly arrived sets
+    this.traces = null;
+    // The points of the pen path of each edge, sampled by the backend API. Until they arrive, the vectors are summed.
+    this.trace_num_vec = 0;
+    // The number of vectors the traces were computed with
+    this.trace_loading = false;
+    // If the traces are being loaded from the backend API
     // How much the original coordinates are multiplied by,  in order for the animation to fit the canvas
     this.show_circle = true;
     this.show_vector = true;
     this.pause = true;
     this.quit = false;
     this.t = 0;
+    this.step = 0;
+    // The number of time steps taken. this.t is always this.step * this.DT, so that the phasors can be advanced by whole steps.
+    this.step_fraction = 0;
+    // The part of a time step that has elapsed but not been taken yet
+    this.phasors = new Phasors(this.DT);
+    // cos and sin of 2*pi*n*t for each frequency n, shared by every edge when the frames are drawn on the main thread
   }
 
   get_zoom_factor(lims) {
@@ -92,8 +261,62 @@ class Animation {
 
   init_canvas() {
     // This method initilalizes the two canvases.
-    this.anim = new Canvas(this.width, this.height, "anim");
-    this.path = new Canvas(this.width, this.height, "path");
+    this.anim = new Canvas(this.width, this.height, "anim", offscreen_rendering);
+    this.path = new Canvas(this.width, this.height, "path", offscreen_rendering);
+    if (offscreen_rendering) {
+      this.init_worker();
+    }
+  }
+
+  init_worker() {
+    // This method starts the render worker and transfers the control of both canvases to it.
+    this.worker = new Worker(render_worker_url);
+    this.worker.onmessage = (e) => {
+      if (e.data.type == "drawn") {
+        this.frame_pending = false;
+        if (this.frame_dirty) {
+          this.frame_dirty = false;
+          this.post_frame();
+        }
+      }
+    };
+    this.worker.postMessage({
+      type: "init",
+      anim: this.anim.offscreen,
+      path: this.path.offscreen,
+      width: this.width,
+      height: this.height,
+      factor: this.factor,
+      dt: this.DT,
+      colours: { path: this.path_colour, vector: this.vector_colour, circle: this.circle_colour }
+    }, [this.anim.offscreen, this.path.offscreen]);
+  }
+
+  post_coeffs(index, coeffs) {
+    // This method sends a set of coefficients to the render worker as a typed array.
+    if (this.worker != null && coeffs != undefined) {
+      const values = to_pairs(coeffs, this.num_loaded);
+      this.worker.postMessage({ type: "coeffs", index: index, values: values }, [values.buffer]);
+    }
+  }
+
+  post_frame() {
+    // This method asks the render worker to draw the frame at this.t. If it's still drawing the last frame, this frame is sent once it's done, so frames never queue up.
+    if (this.frame_pending) {
+      this.frame_dirty = true;
+      return;
+    }
+    this.frame_pending = true;
+    this.worker.postMessage({
+      type: "frame",
+      t: this.t,
+      step: this.step,
+      previous_t: this.drawn_t,
+      num_vec: this.num_vec,
+      show_circle: this.show_circle,
+      show_vector: this.show_vector
+    });
+    this.drawn_t = this.t;
   }
 
   init_control_panel() {
@@ -115,8 +338,8 @@ class Animation {
 
   init_num_vec_slider() {
     // This method initializes the num_vec_slider
-    this.control_panel.num_vec_slider.max = this.num_vec;
-    // Sets the maximum value of the slider to this.num_vec
+    this.control_panel.num_vec_slider.max = max_vectors;
+    // Sets the maximum value of the slider to the maximum number of vectors the backend API can compute
     this.control_panel.num_vec_slider.value = this.num_vec;
     // Sets the  value of the slider to this.num_vec
     this.control_panel.num_vec_label.innerText = this.num_vec;
@@ -158,23 +381,50 @@ class Animation {
 
   init_comp_vectors() {
     // This method initializes the ComplexVector objects for each coefficient
-    this.sets_of_comp_vectors = [];
-    for (let coeffs of this.sets_of_coeffs) {
-      var n = 0;
-      // n is the frequency. It should be in the order 0, 1, -1, 2, -2, 3, -3, ....
-      let comp_vectors = [];
-      for (let i = 0; i < this.num_vec; i++) {
-        let comp_vector = new ComplexVector(coeffs[n], n);
-        comp_vectors.push(comp_vector);
-        if (i % 2 == 0) {
-          n += i + 1;
-          // When the index is even, the difference between the current n and the next n is i + 1.
-        } else {
-          n *= -1;
-          // When the index is odd, the next n should be minus the current index.
-        }
+    this.sets_of_comp_vectors = Array.from(this.sets_of_coeffs, (coeffs) => this.create_comp_vectors(coeffs));
+    this.sets_of_coeffs.forEach((coeffs, index) => this.post_coeffs(index, coeffs));
+  }
+
+  create_comp_vectors(coeffs) {
+    // This method creates the ComplexVector objects for a set of coefficients. A set that has not been received yet has no vectors.
+    let comp_vectors = [];
+    if (coeffs == undefined) {
+      return comp_vectors;
+    }
+    var n = 0;
+    // n is the frequency. It should be in the order 0, 1, -1, 2, -2, 3, -3, ....
+    const binary = ArrayBuffer.isView(coeffs);
+    // A set decoded from the binary format is a typed array of real and imaginary pairs instead of a dictionary
+    for (let i = 0; i < this.num_loaded; i++) {
+      let coefficient = binary ? coeffs.subarray(i * 2, i * 2 + 2) : coeffs[n];
+      if (coefficient == undefined || coefficient.length < 2) {
+        break;
       }
-      this.sets_of_comp_vectors.push(comp_vectors);
+      let comp_vector = new ComplexVector(coefficient, n);
+      comp_vectors.push(comp_vector);
+      if (i % 2 == 0) {
+        n += i + 1;
+        // When the index is even, the difference between the current n and the next n is i + 1.
+      } else {
+        n *= -1;
+        // When the index is odd, the next n should be minus the current index.
+      }
+    }
+    return comp_vectors;
+  }
+
+  add_set(index, coeffs) {
+    // This method adds a set of coefficients that has arrived from the backend API, so that its edge is drawn from the next frame.
+    this.sets_of_coeffs[index] = coeffs;
+    this.sets_of_comp_vectors[index] = this.create_comp_vectors(coeffs);
+    this.post_coeffs(index, coeffs);
+    if (this.pause && !this.redraw_pending) {
+      this.redraw_pending = true;
+      requestAnimationFrame(() => {
+        this.redraw_pending = false;
+        this.update_canvas();
+      });
+      // If the animation is not running, the frame is drawn again to show the new edges, at most once per screen refresh
     }
   }
 
@@ -192,6 +442,10 @@ class Animation {
 
   erase_path() {
     // This method clears the entire path canvas to erase the path
+    if (this.worker != null) {
+      this.worker.postMessage({ type: "clear_path" });
+      return;
+    }
     this.path.ctx.clearRect(0, 0, this.width, this.height);
   }
 
@@ -208,6 +462,10 @@ class Animation {
 
   update_canvas() {
     // This method clears the entire canvas and draws the next frame to account for any change made to this.show_circle or this.show_vector
+    if (this.worker != null) {
+      this.post_frame();
+      return;
+    }
     this.anim.ctx.clearRect(0, 0, this.width, this.height);
     this.draw();
   }
@@ -230,15 +488,92 @@ class Animation {
     // The value of the slider is converted to a Number object, as it is a string
     this.control_panel.num_vec_label.innerText = this.num_vec;
     // The label is changed to the value held by this.num_vec
+    this.load_vectors();
+    this.load_trace();
+  }
+
+  async load_vectors() {
+    // This method loads the vectors that have not been received yet from the backend API, when this.num_vec exceeds this.num_loaded.
+    // Only the missing frequencies are computed by the backend API, and they are added to the existing sets of coefficients.
+    if (this.num_vec <= this.num_loaded || this.loading) {
+      return;
+    }
+    this.loading = true;
+    const num = this.num_vec;
+    try {
+      const response = await fetch(`${drawings_url}/${this.id}/coeffs?num=${num}`, { method: "POST", headers: { "Accept": binary_type } });
+      if (response.ok) {
+        const data = decode_drawing(await response.arrayBuffer());
+        data["sets_of_coeffs"].forEach((coeffs, index) => {
+          if (this.sets_of_coeffs[index] != undefined) {
+            this.sets_of_coeffs[index] = merge_coeffs(this.sets_of_coeffs[index], coeffs);
+          }
+        });
+        this.num_loaded = num;
+        this.init_comp_vectors();
+      }
+    } catch (err) {
+      alert("Could not load more vectors!");
+    } finally {
+      this.loading = false;
+    }
+    this.load_vectors();
+    // this.num_vec may have been increased while the vectors were being loaded
+  }
+
+
+  async load_trace() {
+    // This method loads the pen path of each edge for the current number of vectors from the backend API.
+    // The backend API samples each path with an inverse FFT, so the pen tip does not have to be found by summing the vectors.
+    if (this.trace_loading || (this.traces != null && this.trace_num_vec == this.num_vec)) {
+      return;
+    }
+    this.trace_loading = true;
+    const num = this.num_vec;
+    try {
+      const response = await fetch(`${drawings_url}/${this.id}/trace?num=${num}&samples=${trace_samples}`, { headers: { "Accept": binary_type } });
+      if (response.ok) {
+        this.traces = decode_drawing(await response.arrayBuffer())["traces"];
+        this.trace_num_vec = num;
+        if (this.worker != null) {
+          this.worker.postMessage({ type: "traces", traces: this.traces, num_vec: num });
+        }
+      }
+    } catch (err) {
+      this.traces = null;
+      // Without the traces, the pen tip is found by summing the vectors
+    } finally {
+      this.trace_loading = false;
+    }
+    if (this.traces != null && this.trace_num_vec != this.num_vec) {
+      this.load_trace();
+      // this.num_vec may have been changed while the traces were being loaded
+    }
   }
 
+  get_trace_point(index) {
+    // This method returns the point of the pen path of an edge at this.t, interpolating between the two nearest samples.
+    // It returns null if the traces are not available for the current number of vectors.
+    if (this.traces == null || this.trace_num_vec != this.num_vec || this.traces[index] == undefined) {
+      return null;
+    }
+    const trace = this.traces[index];
+    const num_samples = trace.length / 2;
+    const position = (((this.t % 1) + 1) % 1) * num_samples;
+    const i = Math.floor(position) % num_samples;
+    const j = (i + 1) % num_samples;
+    const fraction = position - Math.floor(position);
+    const real = trace[i * 2] + (trace[j * 2] - trace[i * 2]) * fraction;
+    const imag = trace[i * 2 + 1] + (trace[j * 2 + 1] - trace[i * 2 + 1]) * fraction;
+    return [real * this.factor, imag * this.factor];
+  }
 
   change_speed() {
     // This method changes the speed of the animation by changing the value of interval between frames, when the value of the slider changes
     let speed = this.control_panel.speed_slider.value;
     this.interval = 11 - speed;
     // The speed ranges from 1 to 11, and the interval ranges from 0 to 10
-    // The maximum speed is when there is no interval between frames, and when the speed is 1, the interval is at its maximum, 10.
+    // At the maximum speed, time advances by this.DT every millisecond, and when the speed is 1, every 11 milliseconds.
     if (speed != 11) {
       this.control_panel.speed_label.innerText = speed;
     } else {
@@ -253,26 +588,46 @@ class Animation {
     // Changes the value of the slider on html.
     this.control_panel.num_vec_label.innerText = this.num_vec;
     // Changes the text of the label
+    this.load_trace();
   }
 
   increment_num_vec() {
     // This method increments the number of vectors. It's executed when the right arrow key is pressed.
+    if (this.num_vec >= max_vectors) {
+      return;
+    }
     this.num_vec += 1;
     this.control_panel.num_vec_slider.value = this.num_vec;
     // Changes the value of the slider on html.
     this.control_panel.num_vec_label.innerText = this.num_vec;
     // Changes the text of the label
+    this.load_vectors();
+    this.load_trace();
   }
 
 
-  async animate() {
-    while (!(this.pause | this.quit)) {
-      this.anim.ctx.clearRect(0, 0, this.width, this.height);
-      this.draw();
-      await new Promise(r => setTimeout(r, this.interval));
-      // this is equivalent of time.sleep() in Python. It waits for this.interval amount of time.
-      this.t += this.DT;
-    }
+  animate() {
+    // This method runs the animation, drawing a frame each time the screen refreshes.
+    // Time advances by the time elapsed since the last frame, so the speed of the drawing does not depend on the refresh rate of the screen.
+    // It advances by whole time steps, so that the phasors of each frame are the ones of the last frame turned by a rotor.
+    let last = null;
+    const frame = (now) => {
+      if (this.pause || this.quit) {
+        return;
+      }
+      if (last != null) {
+        this.step_fraction += Math.min(now - last, 100) / (this.interval + 1);
+        // A long gap, such as when the tab was hidden, is counted as 100 milliseconds
+        const steps = Math.floor(this.step_fraction);
+        this.step_fraction -= steps;
+        this.step += steps;
+        this.t = this.step * this.DT;
+      }
+      last = now;
+      this.update_canvas();
+      requestAnimationFrame(frame);
+    };
+    requestAnimationFrame(frame);
   }
 
 
@@ -311,18 +666,34 @@ class Animation {
   }
 
   draw() {
-    // This method draws out a frame on canvases
+    // This method draws out a frame on canvases. If there is a render worker, the frame is drawn by it instead.
+    if (this.worker != null) {
+      this.post_frame();
+      return;
+    }
+    let num = 0;
+    for (const comp_vectors of this.sets_of_comp_vectors) {
+      num = Math.max(num, Math.min(comp_vectors.length, this.num_vec));
+    }
+    const phasors = this.phasors.at(this.step, num);
+    // cos and sin of 2*pi*n*t are the same for every edge, so they are advanced once per frame
     var index = 0;
     for (let comp_vectors of this.sets_of_comp_vectors) {
       // for each edge, it draws vectors, circles and path
       this.anim.ctx.moveTo(origin[0], origin[1]);
       let current_real = 0;
       let current_imag = 0;
-      for (let comp_vector of comp_vectors.slice(0, this.num_vec)) {
+      const trace_point = this.get_trace_point(index);
+      if (trace_point != null && !this.show_circle && !this.show_vector) {
+        comp_vectors = [];
+        // If neither circles nor vectors are shown, the pen tip is read from the trace without summing the vectors
+      }
+      const count = Math.min(comp_vectors.length, this.num_vec);
+      for (let k = 0; k < count; k++) {
         // for each vector in the edge, it draws a circle and a vector on the anim canvas
-        let vector = comp_vector.func(this.t);
-        let real = vector[0] * this.factor;
-        let imag = vector[1] * this.factor;
+        const comp_vector = comp_vectors[k];
+        let real = (comp_vector.coeff_real * phasors[k * 2] - comp_vector.coeff_imag * phasors[k * 2 + 1]) * this.factor;
+        let imag = (comp_vector.coeff_imag * phasors[k * 2] + comp_vector.coeff_real * phasors[k * 2 + 1]) * this.factor;
         let mag = comp_vector.mag * this.factor;
         // the coordinates and magnitude are multiplied by this.factor to fit user's screen
         if (this.show_circle) {
@@ -337,6 +708,9 @@ class Animation {
           this.draw_vector(this.anim.ctx, previous_real, this.transform_y(previous_imag), current_real, this.transform_y(current_imag), this.vector_colour);
         }
       }
+      if (trace_point != null) {
+        [current_real, current_imag] = trace_point;
+      }
       this.draw_path(current_real, this.transform_y(current_imag), index);
       this.sets_of_previous[index] = [current_real, this.transform_y(current_imag)];
       // This updates the previous sum.
@@ -351,11 +725,13 @@ class Canvas {
 
   // Canvas holds data of the canvas element on html
 
-  constructor(width, height, id) {
+  constructor(width, height, id, offscreen = false) {
     this.elem = document.getElementById(id);
     this.elem.width = width;
     this.elem.height = height;
-    this.ctx = this.elem.getContext("2d");
+    this.offscreen = offscreen ? this.elem.transferControlToOffscreen() : null;
+    // If offscreen is true, the canvas is drawn by the render worker, and this page cannot get its context
+    this.ctx = offscreen ? null : this.elem.getContext("2d");
   }
 }
 
@@ -399,5 +775,15 @@ function main(drawing_data) {
   // This function is run once the drawing data from the backend API is fetched. It unpacks the drawing data and creates an Animation object using the data.
   const lims = drawing_data["lim"];
   sets_of_coeffs = drawing_data["sets_of_coeffs"];
-  anim_instance = new Animation(lims, sets_of_coeffs);
+  const num_loaded = sets_of_coeffs.reduce((num, coeffs) => Math.max(num, count_coeffs(coeffs)), 0);
+  // The sets can have different numbers of vectors when the backend truncates them
+  anim_instance = new Animation(lims, sets_of_coeffs, drawing_data["id"], num_loaded);
+  return anim_instance;
+}
+
+function main_stream(header) {
+  // This function is run once the first line of the streamed drawing data arrives. It creates an Animation object with no sets yet, and the sets are added as they arrive.
+  sets_of_coeffs = Array(header["num_sets"]);
+  anim_instance = new Animation(header["lim"], sets_of_coeffs, header["id"], header["num_vec"]);
+  return anim_instance;
 }
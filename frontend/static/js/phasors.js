@@ -0,0 +1,91 @@
+// This script is loaded by the page and by the render worker. It evaluates cos and sin of 2*pi*n*t for the vectors of every frame without computing them from scratch.
+
+const phasor_renormalize = 64;
+// The number of times the phasors are advanced before they are scaled back to a magnitude of 1
+const max_stride = 128;
+// The largest number of time steps the phasors are advanced by at once. Any larger jump is computed directly.
+
+class Phasors {
+
+  // Phasors holds cos and sin of 2*pi*n*t for the frequencies 0, 1, -1, 2, -2, ... as pairs at t = step * dt.
+  // Moving on to a later step multiplies each phasor by its rotor, cos and sin of 2*pi*n*dt*stride, where stride is the number of steps moved. The rotors of a stride are only computed once, so no cos or sin is computed for a frame.
+  // The rounding errors of the multiplications slowly change the magnitudes of the phasors, so they are scaled back to 1 every phasor_renormalize frames.
+
+  constructor(dt) {
+    this.dt = dt;
+    this.num = 0;
+    // The number of frequencies held
+    this.values = new Float64Array(0);
+    this.step = null;
+    // The step the phasors are at
+    this.rotors = new Map();
+    // The rotors of each stride, keyed by the stride
+    this.since_renormalized = 0;
+  }
+
+  static compute(values, num, t) {
+    // This method computes cos and sin of 2*pi*n*t for the first num frequencies into values.
+    for (let k = 0; k < num; k++) {
+      const n = k % 2 == 1 ? (k + 1) / 2 : -k / 2;
+      const angle = 2 * Math.PI * n * t;
+      values[k * 2] = Math.cos(angle);
+      values[k * 2 + 1] = Math.sin(angle);
+    }
+    return values;
+  }
+
+  at(step, num) {
+    // This method returns the phasors at the input step for at least the first num frequencies.
+    const stride = step - this.step;
+    if (this.step == null || num > this.num || stride < 0 || stride > max_stride) {
+      this.seek(step, num);
+    } else if (stride > 0) {
+      this.advance(stride);
+    }
+    return this.values;
+  }
+
+  seek(step, num) {
+    // This method computes the phasors at the input step directly.
+    if (num > this.num) {
+      this.num = num;
+      this.values = new Float64Array(num * 2);
+      this.rotors.clear();
+      // The rotors are computed again for the new number of frequencies
+    }
+    Phasors.compute(this.values, this.num, step * this.dt);
+    this.step = step;
+    this.since_renormalized = 0;
+  }
+
+  get_rotors(stride) {
+    // This method returns the rotors that move the phasors on by the input number of steps.
+    let rotors = this.rotors.get(stride);
+    if (rotors == undefined) {
+      rotors = Phasors.compute(new Float64Array(this.num * 2), this.num, stride * this.dt);
+      this.rotors.set(stride, rotors);
+    }
+    return rotors;
+  }
+
+  advance(stride) {
+    // This method moves the phasors on by the input number of steps with one complex multiplication each.
+    const rotors = this.get_rotors(stride);
+    const values = this.values;
+    for (let k = 0; k < this.num * 2; k += 2) {
+      const real = values[k] * rotors[k] - values[k + 1] * rotors[k + 1];
+      values[k + 1] = values[k] * rotors[k + 1] + values[k + 1] * rotors[k];
+      values[k] = real;
+    }
+    this.step += stride;
+    this.since_renormalized++;
+    if (this.since_renormalized >= phasor_renormalize) {
+      for (let k = 0; k < this.num * 2; k += 2) {
+        const scale = 1 / Math.hypot(values[k], values[k + 1]);
+        values[k] *= scale;
+        values[k + 1] *= scale;
+      }
+      this.since_renormalized = 0;
+    }
+  }
+}
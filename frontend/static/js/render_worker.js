@@ -0,0 +1,162 @@
+// This script runs in a Web Worker. It sums the vectors of every edge and draws each frame on the OffscreenCanvases transferred from the page, so that the main thread only handles the controls and the network.
+// The page sends the coefficients, the traces and the state of each frame as messages, and this worker answers "drawn" once a frame is on the canvases.
+
+importScripts("phasors.js");
+
+class Renderer {
+
+  // Renderer holds the coefficients of every edge as typed arrays and draws the circles, vectors and path of a frame, each as a single path.
+
+  constructor(data) {
+    this.anim = data["anim"].getContext("2d");
+    this.path = data["path"].getContext("2d");
+    this.width = data["width"];
+    this.height = data["height"];
+    this.factor = data["factor"];
+    // The coordinates are multiplied by this.factor for the drawing to fit the canvas
+    this.colours = data["colours"];
+    this.sets = [];
+    // The coefficients of each edge as real and imaginary pairs in the order 0, 1, -1, 2, -2, ...
+    this.sets_of_mags = [];
+    // The radius of the circle of each vector of each edge on the canvas
+    this.previous = [];
+    // The tip of each edge in the previous frame, in canvas coordinates
+    this.traces = null;
+    // The points of the pen path of each edge, sampled by the backend API
+    this.trace_num_vec = 0;
+    // The number of vectors the traces were computed with
+    this.phasors = new Phasors(data["dt"]);
+    // cos and sin of 2*pi*n*t for each frequency n. They are the same for every edge, so they are advanced once per frame.
+  }
+
+  set_coeffs(index, values) {
+    // This method stores the coefficients of an edge and the radii of its circles.
+    this.sets[index] = values;
+    let mags = new Float64Array(values.length / 2);
+    for (let k = 0; k < mags.length; k++) {
+      mags[k] = Math.hypot(values[k * 2], values[k * 2 + 1]) * this.factor;
+    }
+    this.sets_of_mags[index] = mags;
+  }
+
+  set_traces(traces, num_vec) {
+    // This method stores the traces of every edge, computed with num_vec vectors.
+    this.traces = traces;
+    this.trace_num_vec = num_vec;
+  }
+
+  clear_path() {
+    // This method clears the entire path canvas to erase the path
+    this.path.clearRect(0, 0, this.width, this.height);
+  }
+
+  get_trace_point(index, position) {
+    // This method returns the point of the pen path of an edge at the input sample position, interpolating between the two nearest samples, in canvas coordinates.
+    const trace = this.traces[index];
+    const num_samples = trace.length / 2;
+    position = ((position % num_samples) + num_samples) % num_samples;
+    const i = Math.floor(position) % num_samples;
+    const j = (i + 1) % num_samples;
+    const fraction = position - Math.floor(position);
+    const real = trace[i * 2] + (trace[j * 2] - trace[i * 2]) * fraction;
+    const imag = trace[i * 2 + 1] + (trace[j * 2 + 1] - trace[i * 2 + 1]) * fraction;
+    return [real * this.factor, this.height - imag * this.factor];
+  }
+
+  draw(frame) {
+    // This method draws a frame. The circles of every edge are added to one path, and so are the vectors and the new parts of the pen path, so each is stroked once.
+    this.anim.clearRect(0, 0, this.width, this.height);
+    let num = 0;
+    for (const values of this.sets) {
+      if (values != undefined) {
+        num = Math.max(num, Math.min(frame.num_vec, values.length / 2));
+      }
+    }
+    // The number of frequencies used by the longest edge
+    const use_trace = this.traces != null && this.trace_num_vec == frame.num_vec;
+    const sum = frame.show_circle || frame.show_vector || !use_trace;
+    // If neither circles nor vectors are shown, the pen tip is read from the trace without summing the vectors
+    const phasors = sum ? this.phasors.at(frame.step, num) : null;
+    const circles = new Path2D();
+    const vectors = new Path2D();
+    const pen = new Path2D();
+    const height = this.height;
+    const factor = this.factor;
+    this.sets.forEach((values, index) => {
+      if (values == undefined) {
+        return;
+      }
+      let tip;
+      if (sum) {
+        const mags = this.sets_of_mags[index];
+        const count = Math.min(num, values.length / 2);
+        let real = 0;
+        let imag = 0;
+        vectors.moveTo(0, height);
+        for (let k = 0; k < count; k++) {
+          const x = real * factor;
+          const y = height - imag * factor;
+          if (frame.show_circle) {
+            circles.moveTo(x + mags[k], y);
+            circles.arc(x, y, mags[k], 0, Math.PI * 2);
+            // The pen is moved to the start of the arc first, so that no line joins it to the previous circle
+          }
+          const coeff_real = values[k * 2];
+          const coeff_imag = values[k * 2 + 1];
+          real += coeff_real * phasors[k * 2] - coeff_imag * phasors[k * 2 + 1];
+          imag += coeff_imag * phasors[k * 2] + coeff_real * phasors[k * 2 + 1];
+          if (frame.show_vector) {
+            vectors.lineTo(real * factor, height - imag * factor);
+          }
+        }
+        tip = [real * factor, height - imag * factor];
+      }
+      if (use_trace && this.traces[index] != undefined) {
+        const num_samples = this.traces[index].length / 2;
+        tip = this.get_trace_point(index, frame.t * num_samples);
+      }
+      if (tip == undefined) {
+        return;
+      }
+      const previous = this.previous[index];
+      if (previous != undefined) {
+        pen.moveTo(previous[0], previous[1]);
+        if (use_trace && this.traces[index] != undefined && frame.previous_t != null) {
+          const num_samples = this.traces[index].length / 2;
+          const last = Math.min(Math.floor(frame.t * num_samples), Math.floor(frame.previous_t * num_samples) + num_samples);
+          for (let k = Math.floor(frame.previous_t * num_samples) + 1; k <= last; k++) {
+            pen.lineTo(...this.get_trace_point(index, k));
+            // The samples passed since the previous frame are joined, so the path stays smooth when time moves fast
+          }
+        }
+        pen.lineTo(tip[0], tip[1]);
+      }
+      this.previous[index] = tip;
+    });
+    this.anim.strokeStyle = this.colours["circle"];
+    this.anim.stroke(circles);
+    this.anim.strokeStyle = this.colours["vector"];
+    this.anim.stroke(vectors);
+    this.path.strokeStyle = this.colours["path"];
+    this.path.stroke(pen);
+  }
+}
+
+let renderer = null;
+
+onmessage = (e) => {
+  // This function handles the messages from the page.
+  const data = e.data;
+  if (data.type == "init") {
+    renderer = new Renderer(data);
+  } else if (data.type == "coeffs") {
+    renderer.set_coeffs(data.index, data.values);
+  } else if (data.type == "traces") {
+    renderer.set_traces(data.traces, data.num_vec);
+  } else if (data.type == "clear_path") {
+    renderer.clear_path();
+  } else if (data.type == "frame") {
+    renderer.draw(data);
+    postMessage({ type: "drawn" });
+  }
+};